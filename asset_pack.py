@@ -0,0 +1,188 @@
+"""Memory-mapped asset pack: every image the desktop game draws, already decoded.
+
+Starting the game used to mean decoding and rescaling the 1.1 MB
+background.jpg and decoding every sprite. `python asset_pack.py` does that
+once and writes assets.pack: a JSON index followed by raw pixels at display
+size, with both facings of every sprite frame. At startup the pack is mapped
+with mmap and each frame is wrapped with pygame.image.frombuffer(), so nothing
+is decoded, scaled, flipped or copied. The background is the exception: it is
+copied once into a display-format surface, because frombuffer() has no opaque
+format in the display's byte order and a per-pixel-alpha background would
+double the cost of the biggest blit of every frame.
+
+The index holds a hash of the source images and of the sizes they were packed
+at; open_pack() returns None when the pack is missing or stale, and the game
+decodes the sources as before.
+
+    python asset_pack.py            # (re)build assets.pack
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import pygame
+
+import simulation
+from sprite_cache import ANIMATIONS, SpriteCache
+
+PACK_FILE = 'assets.pack'
+BACKGROUND_FILE = 'background.jpg'
+PACK_VERSION = 1
+MAGIC = b'FGASSETS'
+HEADER = struct.Struct('<8sI')  # magic, index length
+ALIGN = 64  # Every pixel block starts on a cache line
+
+
+def _aligned(size):
+    return (size + ALIGN - 1) // ALIGN * ALIGN
+
+
+def decode_background(path=BACKGROUND_FILE):
+    """The background decoded and scaled to the window, the slow way"""
+    return pygame.transform.scale(pygame.image.load(path).convert(), (simulation.WIDTH, simulation.HEIGHT))
+
+
+def source_files():
+    files = [BACKGROUND_FILE]
+    for folder in simulation.CHARACTER_NAMES:
+        if os.path.isdir(folder):
+            files.extend(os.path.join(folder, name) for name in sorted(os.listdir(folder)))
+    return files
+
+
+def content_hash():
+    """Hash of the source images and of everything that decides how they are packed"""
+    digest = hashlib.sha256()
+    layout = [PACK_VERSION, simulation.WIDTH, simulation.HEIGHT, sorted(ANIMATIONS.items())]
+    digest.update(json.dumps(layout).encode())
+    for path in source_files():
+        digest.update(path.replace(os.sep, '/').encode())
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _display_format():
+    display = pygame.display.get_surface()
+    return [display.get_bitsize()] + list(display.get_masks())
+
+
+def build(path=PACK_FILE):
+    """Decode every source image and write the pack; a display mode must be set"""
+    blobs = []
+    size = 0
+
+    def add(data):
+        nonlocal size
+        offset = size
+        blobs.append(data)
+        blobs.append(bytes(_aligned(len(data)) - len(data)))
+        size += _aligned(len(data))
+        return offset
+
+    background = decode_background()
+    index = {
+        'version': PACK_VERSION,
+        'hash': content_hash(),
+        'display_format': _display_format(),
+        'background': {'offset': add(bytes(background.get_buffer())), 'size': background.get_size()},
+        'characters': {}
+    }
+
+    # Frames exactly as SpriteCache loads them, from the atlas or the PNGs
+    cache = SpriteCache()
+    for character, name in enumerate(simulation.CHARACTER_NAMES):
+        actions = index['characters'][name] = {}
+        for action in ANIMATIONS:
+            facings = actions[simulation.ACTION_NAMES[action]] = {}
+            for facing, facing_right in (('right', True), ('left', False)):
+                facings[facing] = [
+                    {'offset': add(pygame.image.tobytes(frame, 'BGRA')), 'size': frame.get_size(), 'pivot': pivot}
+                    for frame, pivot in zip(cache.frames(character, action, facing_right),
+                                            cache.pivots(character, action, facing_right))
+                ]
+
+    encoded = json.dumps(index).encode()
+    header = HEADER.pack(MAGIC, len(encoded)) + encoded
+    header += bytes(_aligned(len(header)) - len(header))
+    # Write next to the old pack and swap, so a half-written pack is never opened
+    with open(path + '.tmp', 'wb') as f:
+        f.write(header)
+        f.writelines(blobs)
+    os.replace(path + '.tmp', path)
+    print(f"Wrote {path} ({(len(header) + size) / 1e6:.1f} MB)")
+
+
+def open_pack(path=PACK_FILE, check_sources=True):
+    """The pack at path, or None if it is missing, stale or made for another display format"""
+    try:
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        magic, length = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            return None
+        index = json.loads(data[HEADER.size:HEADER.size + length])
+    except (OSError, ValueError, struct.error):
+        return None
+    if index.get('version') != PACK_VERSION or index['display_format'] != _display_format():
+        return None
+    try:
+        if check_sources and index['hash'] != content_hash():
+            print(f"{path} is out of date; rebuild it with python asset_pack.py")
+            return None
+    except OSError:
+        return None
+    return AssetPack(data, index, _aligned(HEADER.size + length))
+
+
+class AssetPack:
+    def __init__(self, data, index, base):
+        # Surfaces made by frombuffer() keep views into the map, so it stays open
+        self._data = data
+        self._view = memoryview(data)
+        self.index = index
+        self._base = base
+        self.surfaces_created = 0
+
+    def _pixels(self, offset, length):
+        start = self._base + offset
+        return self._view[start:start + length]
+
+    def background(self):
+        """The background in the display's format; one copy out of the map"""
+        entry = self.index['background']
+        surface = pygame.Surface(entry['size'], 0, pygame.display.get_surface())
+        pixels = memoryview(surface.get_buffer())
+        pixels[:] = self._pixels(entry['offset'], pixels.nbytes)
+        pixels.release()
+        self.surfaces_created += 1
+        return surface
+
+    def _frame(self, entry):
+        width, height = entry['size']
+        self.surfaces_created += 1
+        return pygame.image.frombuffer(self._pixels(entry['offset'], width * height * 4), (width, height), 'BGRA')
+
+    def animations(self, name):
+        """{action: (right frames, left frames, right pivots, left pivots)} of a character, or None"""
+        actions = self.index['characters'].get(name)
+        if actions is None:
+            return None
+        animations = {}
+        for action, action_name in enumerate(simulation.ACTION_NAMES):
+            facings = actions[action_name]
+            animations[action] = (
+                tuple(self._frame(entry) for entry in facings['right']),
+                tuple(self._frame(entry) for entry in facings['left']),
+                tuple(tuple(entry['pivot']) for entry in facings['right']),
+                tuple(tuple(entry['pivot']) for entry in facings['left'])
+            )
+        return animations
+
+
+if __name__ == "__main__":
+    pygame.init()
+    pygame.display.set_mode((simulation.WIDTH, simulation.HEIGHT))
+    build()
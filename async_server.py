@@ -0,0 +1,360 @@
+"""Many matches on one asyncio event loop instead of a thread per client.
+
+Same match rules, wire protocol and command line as server.py, but each
+pair of connections gets a room of its own rather than a third being
+turned away:
+
+    python async_server.py --host 0.0.0.0 --port 5555
+
+sharded_server.py spreads the rooms over one process per core. With
+--udp-port, clients that ask for it get their inputs and snapshots over
+UDP instead (see udp_transport.py).
+
+Connections are asyncio.BufferedProtocols that receive straight into their
+protocol.MessageReader's buffer, and the tick loop is a task on the same
+loop, so nothing needs a lock. Writes never wait: each transport buffers at
+most WRITE_BUFFER_LIMIT bytes before the client counts as behind, and while
+it is behind its snapshots are coalesced down to the newest one and other
+messages queue up to MAX_QUEUED, past which the client is dropped. One slow
+client therefore can't hold up the tick or anyone else's snapshots.
+"""
+import asyncio
+import time
+from collections import deque
+
+import protocol
+import udp_transport
+from protocol import PLAYER_IDS
+from server import MAX_CATCH_UP_TICKS, TICK_RATE, Match
+
+WRITE_BUFFER_LIMIT = 8192  # Unsent bytes a transport holds before the client counts as behind
+MAX_QUEUED = 256  # Non-snapshot messages held for a client that is behind, before dropping it
+
+
+class Connection(asyncio.BufferedProtocol):
+    """One client connection"""
+
+    def __init__(self, server):
+        self.server = server
+        self.reader = protocol.MessageReader()
+        self.version = protocol.PROTOCOL_JSON  # What the client is sent in
+        self.room = None
+        self.player_id = None
+        self.transport = None
+        self.peer = None
+        self.paused = False
+        self.queued = deque()  # Messages waiting for the transport to drain, in order
+        self.snapshot = None  # Newest snapshot waiting for the transport; replaced, not queued
+        self.dropped_snapshots = 0
+        self.udp = None  # udp_transport.UdpPeer, if the client asked for UDP
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.peer = transport.get_extra_info('peername')
+        transport.set_write_buffer_limits(high=WRITE_BUFFER_LIMIT)
+        self.server.connect(self)
+
+    def get_buffer(self, sizehint):
+        return self.reader.receive_buffer()
+
+    def buffer_updated(self, nbytes):
+        self.reader.received(nbytes)
+        try:
+            for message in self.reader.messages():
+                self.server.handle_message(self, message)
+        except protocol.ProtocolError as e:
+            print(f"Invalid message from {self.peer}: {e}")
+            self.transport.close()
+
+    def connection_lost(self, exc):
+        self.server.disconnect(self)
+
+    def pause_writing(self):
+        self.paused = True
+
+    def resume_writing(self):
+        self.paused = False
+        while self.queued and not self.paused:
+            self.write(self.queued.popleft())
+        if self.snapshot is not None and not self.queued and not self.paused:
+            snapshot, self.snapshot = self.snapshot, None
+            self.write(snapshot)
+
+    def write(self, data):
+        self.transport.write(data)
+        self.server.bytes_sent += len(data)
+
+    def send(self, data):
+        """Send a message that must arrive, after anything still waiting"""
+        if not self.paused and not self.queued:
+            self.write(data)
+        elif len(self.queued) < MAX_QUEUED:
+            self.queued.append(data)
+        else:
+            print(f"Client {self.peer} is too far behind, dropping it")
+            self.transport.abort()
+
+    def udp_ready(self):
+        """Whether the client asked for UDP and its first packet has arrived"""
+        return self.udp is not None and self.udp.address is not None
+
+    def send_datagram(self, records=b''):
+        packet = self.udp.packet(records)
+        self.server.datagrams.sendto(packet, self.udp.address)
+        self.server.bytes_sent += len(packet)
+
+    def send_snapshot(self, data):
+        """Send a snapshot, or keep it in place of an older one while the client is behind"""
+        if self.udp_ready():
+            self.send_datagram(data)
+            return
+        if not self.paused and not self.queued:
+            self.write(data)
+            return
+        if self.snapshot is not None:
+            self.dropped_snapshots += 1
+        self.snapshot = data
+
+
+class DatagramEndpoint(asyncio.DatagramProtocol):
+    """The server's UDP socket"""
+
+    def __init__(self, server):
+        self.server = server
+
+    def datagram_received(self, data, address):
+        self.server.datagram_received(data, address)
+
+    def error_received(self, exc):
+        pass  # E.g. a client that has gone away; the TCP connection notices
+
+
+class Room:
+    """One match and the connections playing it"""
+
+    def __init__(self, room_id):
+        self.id = room_id
+        self.match = Match()
+        self.players = {}  # player_id -> Connection
+        self.connections = []
+
+    def is_open(self):
+        """Still waiting for players to join"""
+        return not self.match.started and len(self.players) < len(PLAYER_IDS)
+
+    def join(self, conn):
+        """Seat conn in the first free player slot; returns its player_id"""
+        player_id = next(player_id for player_id in PLAYER_IDS if player_id not in self.players)
+        self.players[player_id] = conn
+        self.connections.append(conn)
+        return player_id
+
+    def leave(self, conn):
+        self.connections.remove(conn)
+        del self.players[conn.player_id]
+
+    def broadcast(self, data, snapshot=False):
+        """Send data to every client in the room, encoding it once per protocol in use"""
+        encoded = {}
+        for conn in self.connections:
+            if conn.version not in encoded:
+                encoded[conn.version] = protocol.encode(data, conn.version)
+            if snapshot:
+                conn.send_snapshot(encoded[conn.version])
+            else:
+                conn.send(encoded[conn.version])
+
+
+class AsyncGameServer:
+    """Authoritative server for any number of two-player rooms; see Match for the rules.
+
+    The lobby seats each new connection in the room waiting for a second
+    player, opening a new room when there is none, and the room starts once
+    it is full. A room is closed when its last player leaves. One tick task
+    steps every room, so the timer cost doesn't grow with the room count.
+    """
+
+    def __init__(self, host='0.0.0.0', port=5555, tick_rate=TICK_RATE, udp_port=None):
+        self.host = host
+        self.port = port
+        self.tick_rate = tick_rate
+        self.udp_port = udp_port  # None: TCP only; 0 picks a free port
+        self.server = None
+        self.datagrams = None
+        self.udp_peers = {}  # token -> Connection
+        self.tick_task = None
+        self.rooms = {}  # room id -> Room
+        self.lobby = None  # The room new connections join, if one is waiting
+        self.next_room_id = 1
+        self.ticks = 0  # Room ticks, summed over rooms
+        self.inputs_received = 0
+        self.bytes_sent = 0
+        self.tick_time = 0.0
+        self.dropped_snapshots = 0
+
+    async def start_serving(self):
+        """Listen and start ticking; returns once the port is bound (port 0 picks a free one)"""
+        loop = asyncio.get_running_loop()
+        self.server = await loop.create_server(lambda: Connection(self), self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        await self.open_udp()
+        self.tick_task = asyncio.create_task(self.run_ticks())
+        print(f"Server started on {self.host}:{self.port} ({self.tick_rate} ticks/s)")
+
+    async def open_udp(self):
+        if self.udp_port is None:
+            return
+        loop = asyncio.get_running_loop()
+        self.datagrams, _ = await loop.create_datagram_endpoint(lambda: DatagramEndpoint(self),
+                                                                local_addr=(self.host, self.udp_port))
+        self.udp_port = self.datagrams.get_extra_info('sockname')[1]
+        print(f"UDP on {self.host}:{self.udp_port}")
+
+    async def serve_forever(self):
+        await self.start_serving()
+        print("Waiting for connections...")
+        try:
+            await self.server.serve_forever()
+        finally:
+            self.tick_task.cancel()
+            if self.datagrams is not None:
+                self.datagrams.close()
+            print(f"Server stats: {self.stats()}")
+
+    def connect(self, conn):
+        room = self.lobby
+        if room is None:
+            room = self.lobby = self.rooms[self.next_room_id] = Room(self.next_room_id)
+            self.next_room_id += 1
+        conn.room = room
+        conn.player_id = room.join(conn)
+        print(f"New connection from {conn.peer} in room {room.id}")
+
+        # Initial game state and player ID, always as JSON
+        conn.send(protocol.encode({
+            'type': 'init',
+            'player_id': conn.player_id,
+            'room': room.id,
+            'game_state': room.match.game_state(),
+            'server_time': time.perf_counter(),
+            'protocols': list(protocol.SUPPORTED_PROTOCOLS)
+        }))
+        if not room.is_open():
+            self.lobby = None
+            room.broadcast({'type': 'game_start'})
+            room.match.started = True
+
+    def handle_message(self, conn, message):
+        if message.get('type') == 'hello':
+            # The client sends in its chosen version from here on, and so do we after answering
+            version = protocol.negotiate((message.get('protocol', protocol.PROTOCOL_JSON),))
+            reply = {'type': 'protocol', 'version': version}
+            if (message.get('transport') == 'udp' and version == protocol.PROTOCOL_BINARY
+                    and self.datagrams is not None and conn.udp is None):
+                conn.udp = udp_transport.UdpPeer(udp_transport.new_token())
+                self.udp_peers[conn.udp.token] = conn
+                reply.update(udp_port=self.udp_port, token=conn.udp.token)
+            conn.send(protocol.encode(reply))
+            conn.version = conn.reader.version = version
+        elif message.get('type') == 'input':
+            # Rollback clients simulate locally, just pass the input on
+            self.relay_input(conn, message['frame'], message['input'])
+        else:
+            # Applied on the next tick
+            conn.room.match.queue_input(conn.player_id, message)
+            self.inputs_received += 1
+
+    def datagram_received(self, data, address):
+        conn = self.udp_peers.get(udp_transport.packet_token(data))
+        if conn is None:
+            return
+        for frame, mask, relay, late in conn.udp.receive(data, address):
+            if relay:
+                self.relay_input(conn, frame, mask, udp=True)
+            else:
+                # Applied on the next tick, in frame order
+                conn.room.match.queue_mask(conn.player_id, mask, late)
+                self.inputs_received += 1
+
+    def relay_input(self, conn, frame, mask, udp=False):
+        """Pass a rollback input on to the rest of the room the way it came:
+        UDP rollback clients send each input over both, and the TCP copies
+        fill any gap the datagrams' redundancy couldn't"""
+        for other in conn.room.connections:
+            if other is conn:
+                continue
+            if udp:
+                if other.udp_ready():
+                    other.udp.relay.add(frame, mask, conn.player_id)
+                    other.send_datagram()
+            else:
+                other.send(protocol.encode({'type': 'input', 'player_id': conn.player_id,
+                                            'frame': frame, 'input': mask}, other.version))
+
+    def disconnect(self, conn):
+        room = conn.room
+        if room is None or conn not in room.connections:
+            return
+        print(f"Client {conn.peer} disconnected")
+        if conn.udp is not None:
+            del self.udp_peers[conn.udp.token]
+        self.dropped_snapshots += conn.dropped_snapshots
+        room.leave(conn)
+        if room.connections:
+            room.match.drop_player(conn.player_id)
+            room.broadcast({'type': 'player_disconnected', 'player_id': conn.player_id})
+        else:
+            del self.rooms[room.id]
+            if room is self.lobby:
+                self.lobby = None
+
+    def tick(self):
+        """Step every room once and send each its snapshot"""
+        start = time.perf_counter()
+        for room in self.rooms.values():
+            room.broadcast(room.match.step(start), snapshot=True)
+        self.ticks += len(self.rooms)
+        self.tick_time += time.perf_counter() - start
+
+    async def run_ticks(self):
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / self.tick_rate
+        next_tick = loop.time()
+        while True:
+            self.tick()
+            next_tick += interval
+            delay = next_tick - loop.time()
+            if delay < -interval * MAX_CATCH_UP_TICKS:
+                next_tick = loop.time()
+            # Even when behind, let the connections run between ticks
+            await asyncio.sleep(max(0.0, delay))
+
+    def stats(self):
+        connections = [conn for room in self.rooms.values() for conn in room.connections]
+        return {
+            'ticks': self.ticks,
+            'inputs_received': self.inputs_received,
+            'bytes_sent': self.bytes_sent,
+            'tick_us': self.tick_time / max(1, self.ticks) * 1e6,
+            'rooms': len(self.rooms),
+            'players': len(connections),
+            'dropped_snapshots': self.dropped_snapshots + sum(conn.dropped_snapshots for conn in connections)
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Game Server (asyncio)')
+    parser.add_argument('--host', type=str, default='0.0.0.0', help='Host IP to bind to')
+    parser.add_argument('--port', type=int, default=5555, help='Port to listen on')
+    parser.add_argument('--tick-rate', type=int, default=TICK_RATE, help=f'Simulation ticks per second (default {TICK_RATE})')
+    parser.add_argument('--udp-port', type=int, default=None,
+                        help='Also serve inputs and snapshots over UDP on this port, for clients run with --transport udp')
+    args = parser.parse_args()
+
+    server = AsyncGameServer(host=args.host, port=args.port, tick_rate=args.tick_rate, udp_port=args.udp_port)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("\nShutting down server...")
@@ -0,0 +1,195 @@
+"""Vectorized batch simulator: N independent matches advanced in lock-step.
+
+State is kept as struct-of-arrays, one NumPy array per field with shape
+(2, N): row 0 is player 1 and row 1 is player 2 of every match. The rules are
+the same as simulation.step(), including player 1 moving before player 2, so
+a batch of one match produces exactly the same states as the scalar path.
+
+Used for balance sweeps and bot evaluation; the game itself never imports it.
+"""
+import numpy as np
+
+import simulation
+from simulation import (
+    WIDTH, GROUND_Y, GRAVITY, JUMP_STRENGTH, PLAYER_SPEED,
+    FIGHTER_WIDTH, FIGHTER_HEIGHT, P1_SPAWN, P2_SPAWN,
+    ANIMATION_SPEED, ACTION_IDLE, ACTION_PUNCH, ACTION_KICK,
+    INPUT_LEFT, INPUT_RIGHT, INPUT_UP, INPUT_PUNCH, INPUT_KICK
+)
+
+# Frame data as (characters, actions) lookup tables; -1 active frames never match
+_table_shape = (len(simulation.CHARACTER_NAMES), len(simulation.ACTION_NAMES))
+ACTION_FRAMES = np.array(simulation.ACTION_FRAMES, dtype=np.int32)
+ACTIVE_START = np.full(_table_shape, -1, dtype=np.int32)
+ACTIVE_END = np.full(_table_shape, -1, dtype=np.int32)
+HITBOX_X = np.zeros(_table_shape, dtype=np.int32)
+HITBOX_Y = np.zeros(_table_shape, dtype=np.int32)
+HITBOX_W = np.zeros(_table_shape, dtype=np.int32)
+HITBOX_H = np.zeros(_table_shape, dtype=np.int32)
+DAMAGE = np.zeros(_table_shape, dtype=np.int32)
+HITSTOP = np.zeros(_table_shape, dtype=np.int32)
+for _c, _moves in enumerate(simulation.MOVES):
+    for _a, _move in enumerate(_moves):
+        if _move is not None:
+            (ACTIVE_START[_c, _a], ACTIVE_END[_c, _a], HITBOX_X[_c, _a], HITBOX_Y[_c, _a],
+             HITBOX_W[_c, _a], HITBOX_H[_c, _a], DAMAGE[_c, _a], HITSTOP[_c, _a]) = _move
+
+# Scalar FighterState attribute -> BatchMatch array name
+_FIELDS = (
+    ('x', 'x'), ('y', 'y'), ('vel_y', 'vel_y'), ('health', 'health'),
+    ('action', 'current_action'), ('animation_frame', 'animation_frame'),
+    ('animation_cooldown', 'animation_cooldown'), ('facing_right', 'facing'),
+    ('jumping', 'jumping'), ('is_attacking', 'is_attacking'),
+    ('attack_frame_active', 'attack_frame_active'), ('character', 'character')
+)
+
+
+class BatchMatch:
+    """N concurrent matches stored as (2, N) NumPy arrays"""
+
+    def __init__(self, n):
+        self.n = n
+        shape = (2, n)
+        self.x = np.empty(shape, dtype=np.int32)
+        self.y = np.empty(shape, dtype=np.int32)
+        self.vel_y = np.empty(shape, dtype=np.float64)
+        self.health = np.empty(shape, dtype=np.int32)
+        self.current_action = np.empty(shape, dtype=np.int32)
+        self.animation_frame = np.empty(shape, dtype=np.int32)
+        self.animation_cooldown = np.empty(shape, dtype=np.float64)
+        self.facing = np.empty(shape, dtype=bool)
+        self.jumping = np.empty(shape, dtype=bool)
+        self.is_attacking = np.empty(shape, dtype=bool)
+        self.attack_frame_active = np.empty(shape, dtype=bool)
+        self.character = np.empty(shape, dtype=np.int32)
+        self.slow_mo_timer = np.empty(n, dtype=np.int32)
+        self.frame = 0
+        self.reset()
+
+    def reset(self):
+        """Put every match back at the start: spawn points, full health, idle"""
+        for row, (x, y) in enumerate((P1_SPAWN, P2_SPAWN)):
+            self.x[row] = x
+            self.y[row] = y
+            self.facing[row] = x < WIDTH // 2
+            self.character[row] = row
+        self.vel_y.fill(0)
+        self.health.fill(100)
+        self.current_action.fill(ACTION_IDLE)
+        self.animation_frame.fill(0)
+        self.animation_cooldown.fill(0)
+        self.jumping.fill(False)
+        self.is_attacking.fill(False)
+        self.attack_frame_active.fill(False)
+        self.slow_mo_timer.fill(0)
+        self.frame = 0
+
+    def set_match(self, i, state):
+        """Load match i from a scalar simulation.MatchState"""
+        for row, fighter in enumerate((state.p1, state.p2)):
+            for attr, name in _FIELDS:
+                getattr(self, name)[row, i] = getattr(fighter, attr)
+        self.slow_mo_timer[i] = state.slow_mo_timer
+
+    def get_match(self, i):
+        """Return match i as a scalar simulation.MatchState"""
+        state = simulation.new_match()
+        for row, fighter in enumerate((state.p1, state.p2)):
+            for attr, name in _FIELDS:
+                setattr(fighter, attr, getattr(self, name)[row, i].item())
+        state.slow_mo_timer = int(self.slow_mo_timer[i])
+        state.frame = self.frame
+        return state
+
+    def winners(self):
+        """0 while a match is running, 1 or 2 once that player has won"""
+        return np.where(self.health[0] <= 0, 2, np.where(self.health[1] <= 0, 1, 0))
+
+    def step(self, p1_input, p2_input):
+        """Advance all N matches by one tick.
+
+        Inputs are INPUT_* bitmasks: either one int for every match or an
+        integer array of shape (N,).
+        """
+        np.subtract(self.slow_mo_timer, 1, out=self.slow_mo_timer, where=self.slow_mo_timer > 0)
+        self._step_fighter(0, np.broadcast_to(p1_input, (self.n,)))
+        self._step_fighter(1, np.broadcast_to(p2_input, (self.n,)))
+        self.frame += 1
+        return self
+
+    def _step_fighter(self, row, keys):
+        other = 1 - row
+        x = self.x[row]
+        y = self.y[row]
+        vel_y = self.vel_y[row]
+        action = self.current_action[row]
+        frame = self.animation_frame[row]
+        cooldown = self.animation_cooldown[row]
+        facing = self.facing[row]
+        jumping = self.jumping[row]
+        is_attacking = self.is_attacking[row]
+
+        # Movement, jumping and attack starts only happen while idle
+        idle = action == ACTION_IDLE
+        left = idle & ((keys & INPUT_LEFT) != 0)
+        right = idle & ((keys & INPUT_RIGHT) != 0)
+        dx = np.where(right, PLAYER_SPEED, np.where(left, -PLAYER_SPEED, 0))
+        facing[left] = False
+        facing[right] = True
+
+        jump = idle & ((keys & INPUT_UP) != 0) & ~jumping
+        vel_y[jump] = JUMP_STRENGTH
+        jumping |= jump
+
+        # Apply gravity
+        vel_y += GRAVITY
+
+        punch = idle & ((keys & INPUT_PUNCH) != 0)
+        kick = idle & ~punch & ((keys & INPUT_KICK) != 0)
+        action[punch] = ACTION_PUNCH
+        action[kick] = ACTION_KICK
+        started = punch | kick
+        frame[started] = 0
+        is_attacking |= started
+
+        # Horizontal move only when it stays inside the arena
+        new_x = x + dx
+        np.copyto(x, new_x, where=(new_x >= 0) & (new_x <= WIDTH - FIGHTER_WIDTH))
+
+        # Ground collision, otherwise round like pygame.Rect does
+        new_y = y + vel_y
+        grounded = new_y + FIGHTER_HEIGHT > GROUND_Y
+        new_y = np.trunc(new_y + np.copysign(0.5, new_y))
+        y[:] = np.where(grounded, GROUND_Y - FIGHTER_HEIGHT, new_y)
+        vel_y[grounded] = 0
+        jumping[grounded] = False
+
+        # Animation and attack frames
+        cooldown += ANIMATION_SPEED
+        character = self.character[row]
+        active = (frame >= ACTIVE_START[character, action]) & (frame <= ACTIVE_END[character, action])
+        self.attack_frame_active[row] = active
+
+        offset_x = HITBOX_X[character, action]
+        width = HITBOX_W[character, action]
+        height = HITBOX_H[character, action]
+        hit_left = np.where(facing, x + FIGHTER_WIDTH + offset_x, x - offset_x - width)
+        hit_top = y + FIGHTER_HEIGHT // 2 + HITBOX_Y[character, action]
+        other_x = self.x[other]
+        other_y = self.y[other]
+        hit = (active &
+               (hit_left < other_x + FIGHTER_WIDTH) & (other_x < hit_left + width) &
+               (hit_top < other_y + FIGHTER_HEIGHT) & (other_y < hit_top + height) &
+               ~self.is_attacking[other])
+        if hit.any():
+            other_health = self.health[other]
+            np.copyto(other_health, np.maximum(0, other_health - DAMAGE[character, action]), where=hit)
+            self.slow_mo_timer[hit] = HITSTOP[character, action][hit]
+
+        advance = cooldown >= 1
+        cooldown[advance] = 0
+        frame += advance
+        done = advance & (action != ACTION_IDLE) & (frame >= ACTION_FRAMES[character, action])
+        action[done] = ACTION_IDLE
+        frame[done] = 0
+        is_attacking[done] = False
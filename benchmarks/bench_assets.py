@@ -0,0 +1,98 @@
+"""Startup asset loading: decoding the sources vs. mapping the asset pack.
+
+Every sample is a fresh process, timed from just after the window opens until
+the background and every sprite frame are ready. "Cold" samples first ask the
+OS to drop the files from the page cache (posix_fadvise, where available), as
+on the first launch after a reboot or a PyInstaller extraction.
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from common import REPO_ROOT, metric, skipped
+
+
+def _evict(paths):
+    """Drop files from the page cache; False where the OS can't be asked to"""
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return True
+
+
+def _child(mode, pack_path):
+    """Runs in the sample process; prints the load time in milliseconds"""
+    import time
+    import pygame
+    import simulation
+    pygame.init()
+    pygame.display.set_mode((simulation.WIDTH, simulation.HEIGHT))
+    import asset_pack
+    from sprite_cache import SpriteCache
+
+    if mode == 'build':
+        asset_pack.build(pack_path)
+        return
+    start = time.perf_counter()
+    cache = SpriteCache()
+    if mode == 'pack':
+        cache.pack = asset_pack.open_pack(pack_path)
+        assert cache.pack is not None, "asset pack is missing or stale"
+        cache.pack.background()
+    else:
+        asset_pack.decode_background()
+    for character in range(len(simulation.CHARACTER_NAMES)):
+        cache.load(character)
+    print((time.perf_counter() - start) * 1000)
+
+
+def _sample(mode, pack_path):
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode, pack_path],
+                            cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    return float(result.stdout.split()[-1])
+
+
+def run(quick=False):
+    try:
+        import pygame  # noqa: F401
+    except ImportError:
+        return skipped("pygame is not installed")
+    import asset_pack
+
+    samples = 3 if quick else 9
+    with tempfile.TemporaryDirectory() as tmp:
+        pack_path = os.path.join(tmp, asset_pack.PACK_FILE)
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--child', 'build', pack_path],
+                       cwd=REPO_ROOT, capture_output=True, check=True)
+        sources = [os.path.join(REPO_ROOT, path) for path in asset_pack.source_files()]
+
+        results = {}
+        can_evict = True
+        for mode, files in (('decode', sources), ('pack', sources + [pack_path])):
+            _sample(mode, pack_path)  # Warm the page cache and the interpreter's own files
+            warm = [_sample(mode, pack_path) for _ in range(samples)]
+            cold = []
+            for _ in range(samples):
+                can_evict = _evict(files) and can_evict
+                cold.append(_sample(mode, pack_path))
+            results[f'{mode}_warm_ms'] = metric(statistics.median(warm), 'ms', False)
+            if can_evict:
+                results[f'{mode}_cold_ms'] = metric(statistics.median(cold), 'ms', False)
+        results['pack_bytes'] = metric(os.path.getsize(pack_path), 'bytes', False)
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == '--child':
+        _child(sys.argv[2], sys.argv[3])
+    else:
+        for name, result in run().items():
+            print(f"{name}: {result['value']:,.2f} {result['unit']}")
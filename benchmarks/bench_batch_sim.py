@@ -0,0 +1,110 @@
+"""Parity check and steps/sec benchmark for batch_sim.BatchMatch.
+
+Run from the repository root:
+
+    python benchmarks/bench_batch_sim.py
+
+The parity check replays the same random inputs through simulation.step() and
+through a BatchMatch, and stops with an error on the first field that differs.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import simulation
+from batch_sim import BatchMatch
+
+
+def random_inputs(rng, n):
+    """Random input masks, with attacks masked out half the time so fighters also walk and jump"""
+    keys = rng.integers(0, 32, size=n, dtype=np.int32)
+    calm = rng.random(n) < 0.5
+    keys[calm] &= ~(simulation.INPUT_PUNCH | simulation.INPUT_KICK)
+    return keys
+
+
+def check_parity(matches=64, steps=3000, seed=1):
+    """Step `matches` scalar matches and one batch side by side and compare every tick"""
+    rng = np.random.default_rng(seed)
+    batch = BatchMatch(matches)
+    scalar = [simulation.new_match() for _ in range(matches)]
+
+    for tick in range(steps):
+        p1 = random_inputs(rng, matches)
+        p2 = random_inputs(rng, matches)
+        batch.step(p1, p2)
+        for i, state in enumerate(scalar):
+            simulation.step(state, int(p1[i]), int(p2[i]))
+            got = batch.get_match(i)
+            # The frame counter is batch-wide, so compare fighters and timers only
+            if (state.p1.pack() != got.p1.pack() or state.p2.pack() != got.p2.pack() or
+                    state.slow_mo_timer != got.slow_mo_timer):
+                raise AssertionError(
+                    f"tick {tick}, match {i}: scalar {state.to_dict()} != batch {got.to_dict()}")
+            # Restart finished matches the same way on both sides
+            if simulation.check_winner(state):
+                simulation.reset_match(state)
+                batch.set_match(i, state)
+
+    print(f"parity ok: {matches} matches x {steps} ticks")
+
+
+def bench(n, seconds=1.0, seed=2):
+    """Return fighter-match ticks per second for a batch of n matches"""
+    rng = np.random.default_rng(seed)
+    inputs = [(random_inputs(rng, n), random_inputs(rng, n)) for _ in range(16)]
+    batch = BatchMatch(n)
+
+    steps = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        p1, p2 = inputs[steps % len(inputs)]
+        batch.step(p1, p2)
+        steps += 1
+    elapsed = time.perf_counter() - start
+    return steps / elapsed, steps * n / elapsed
+
+
+def bench_scalar(seconds=1.0, seed=2):
+    """Ticks per second of the scalar simulation.step() for comparison"""
+    rng = random.Random(seed)
+    inputs = [(rng.randrange(32), rng.randrange(32)) for _ in range(1024)]
+    state = simulation.new_match()
+
+    steps = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        p1, p2 = inputs[steps % len(inputs)]
+        simulation.step(state, p1, p2)
+        if state.p1.health <= 0 or state.p2.health <= 0:
+            simulation.reset_match(state)
+        steps += 1
+    return steps / (time.perf_counter() - start)
+
+
+def run(quick=False):
+    """Parity check plus throughput, in the run.py report format"""
+    from common import metric
+    seconds = 0.3 if quick else 1.0
+    check_parity(matches=16 if quick else 64, steps=500 if quick else 3000)
+    results = {'scalar_match_steps_per_sec': metric(bench_scalar(seconds), 'steps/s')}
+    for n in (1, 1_000, 100_000):
+        results[f'batch_{n}_match_steps_per_sec'] = metric(bench(n, seconds)[1], 'steps/s')
+    return results
+
+
+def main():
+    check_parity()
+    print(f"scalar        : {bench_scalar():>14,.0f} match-steps/sec")
+    for n in (1, 1_000, 100_000):
+        ticks, match_steps = bench(n)
+        print(f"batch N={n:<7}: {match_steps:>14,.0f} match-steps/sec ({ticks:,.0f} ticks/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Headless render run: scripted frames through Game.draw_game() under the SDL dummy driver.
+
+Each frame steps the simulation with the next scripted input (a seeded
+sparring script that closes in and trades blows, so matches end and the game
+over screen is drawn too, or a recorded replay) and draws it; only the
+draw_game() call is timed. The report has the per-frame render time
+percentiles and histogram, and checksums of selected frames, so a rendering
+optimisation can be checked for pixel-identical output:
+
+    python benchmarks/bench_frames.py --write-golden golden.json                # on the old code
+    python benchmarks/bench_frames.py --golden golden.json --dirty-rects        # exit 1 if a frame differs
+
+Text is drawn with whatever fonts the machine has, so golden files are only
+comparable between runs on the same machine or CI image.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+# common chdirs to the repository root; paths on the command line stay relative to here
+START_DIR = os.getcwd()
+
+from common import metric, percentile, skipped
+
+import simulation
+
+HISTOGRAM_BOUNDS_US = (100, 200, 400, 800, 1600, 3200, 6400, 12800)  # Upper bounds; the last bucket is open
+GAME_OVER_FRAMES = 60  # Frames the game over screen stays up before the next match
+DEFAULT_CHECKSUM_EVERY = 60
+SPARRING_ATTACK_CHANCE = (0.15, 0.05)  # Per frame; a defender that is attacking can't be hit
+
+
+def sparring(seed=1):
+    """Input source: both players close in and attack at random, player 1 more often"""
+    rng = random.Random(seed)
+
+    def inputs(state):
+        masks = []
+        for player, (me, other) in enumerate(((state.p1, state.p2), (state.p2, state.p1))):
+            gap = other.x - me.x
+            mask = 0
+            if abs(gap) > simulation.FIGHTER_WIDTH + 30 or rng.random() < 0.2:
+                mask |= simulation.INPUT_RIGHT if gap > 0 else simulation.INPUT_LEFT
+            if rng.random() < SPARRING_ATTACK_CHANCE[player]:
+                mask |= rng.choice((simulation.INPUT_PUNCH, simulation.INPUT_KICK))
+            if rng.random() < 0.01:
+                mask |= simulation.INPUT_UP
+            masks.append(mask)
+        return masks
+    return inputs
+
+
+def replay_inputs(frames):
+    """Input source playing back recorded (p1, p2) frames, then no input"""
+    frames = iter(frames)
+    return lambda state: next(frames, (0, 0))
+
+
+def render_frames(frames, inputs, dirty_rects=False, checksum_frames=()):
+    """Render frames, stepping with inputs(state) -> (p1, p2);
+    returns (render times in ns, {frame: checksum})"""
+    import pygame
+    import game
+
+    app = game.Game()
+    app.open_window()
+    app.load_assets()
+    if dirty_rects:
+        app.dirty_renderer = game.DirtyRenderer(app)
+    checksum_frames = set(checksum_frames)
+
+    times = []
+    checksums = {}
+    game_over_frames = 0
+    for frame in range(frames):
+        winner = app.check_winner()
+        if winner:
+            game_over_frames += 1
+            if game_over_frames > GAME_OVER_FRAMES:
+                app.reset_game()
+                game_over_frames = 0
+                winner = None
+        else:
+            app.player1.save_position()
+            app.player2.save_position()
+            simulation.step(app.match, *inputs(app.match))
+            winner = app.check_winner()
+        pygame.event.pump()
+
+        start = time.perf_counter_ns()
+        app.draw_game(winner, winner is not None)
+        times.append(time.perf_counter_ns() - start)
+        if frame in checksum_frames:
+            checksums[frame] = hashlib.sha256(pygame.image.tobytes(app.screen, 'RGB')).hexdigest()
+    return times, checksums
+
+
+def summarize(times):
+    """Percentiles and a histogram of render times, in microseconds"""
+    samples = [t / 1000.0 for t in times]
+    counts = [0] * (len(HISTOGRAM_BOUNDS_US) + 1)
+    for sample in samples:
+        bucket = 0
+        while bucket < len(HISTOGRAM_BOUNDS_US) and sample > HISTOGRAM_BOUNDS_US[bucket]:
+            bucket += 1
+        counts[bucket] += 1
+    return {
+        'mean': sum(samples) / max(1, len(samples)),
+        'p50': percentile(samples, 50),
+        'p95': percentile(samples, 95),
+        'p99': percentile(samples, 99),
+        'max': max(samples, default=0.0),
+        'histogram': {'upper_bounds_us': list(HISTOGRAM_BOUNDS_US) + [None], 'counts': counts}
+    }
+
+
+def run(quick=False):
+    try:
+        import pygame  # noqa: F401
+    except ImportError:
+        return skipped("pygame is not installed")
+    frames = 300 if quick else 1200
+    results = {}
+    checksums = {}
+    for mode, dirty_rects in (('full', False), ('dirty', True)):
+        times, checksums[mode] = render_frames(frames, sparring(), dirty_rects, range(frames))
+        summary = summarize(times)
+        for key in ('p50', 'p95', 'p99'):
+            results[f'{mode}_{key}_us'] = metric(summary[key], 'us', False)
+    # The golden check, dirty rects against the full redraw on every frame; must stay 0
+    mismatched = [frame for frame in range(frames) if checksums['dirty'][frame] != checksums['full'][frame]]
+    if mismatched:
+        print(f"Dirty-rect frames differing from the full redraw: {mismatched[:10]}")
+    results['dirty_mismatched_frames'] = metric(len(mismatched), 'frames', False)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render scripted frames headless and report timings and checksums')
+    parser.add_argument('--frames', type=int, default=1200, help='Frames to render (default 1200)')
+    parser.add_argument('--seed', type=int, default=1, help='Seed of the sparring script')
+    parser.add_argument('--replay', type=str, default=None, help='Take the inputs from a replay file instead')
+    parser.add_argument('--dirty-rects', action='store_true', help='Render with the dirty-rect renderer')
+    parser.add_argument('--checksum-every', type=int, default=DEFAULT_CHECKSUM_EVERY,
+                        help=f'Checksum every Nth frame (default {DEFAULT_CHECKSUM_EVERY}, 0 for none)')
+    parser.add_argument('--golden', type=str, default=None, help='Compare checksums against this golden file; exit 1 on a mismatch')
+    parser.add_argument('--write-golden', type=str, default=None, help='Save the checksums as a golden file')
+    parser.add_argument('--output', type=str, default='render_frames.json', help='Where to write the report')
+    args = parser.parse_args()
+
+    golden = None
+    if args.golden:
+        with open(os.path.join(START_DIR, args.golden)) as f:
+            golden = json.load(f)
+        # Render exactly what the golden file was made from
+        args.frames, args.seed, args.replay = golden['frames'], golden['seed'], golden['replay']
+        checksum_frames = [int(frame) for frame in golden['checksums']]
+    else:
+        checksum_frames = range(0, args.frames, args.checksum_every) if args.checksum_every > 0 else ()
+
+    if args.replay:
+        import replay
+        recorded = replay.load(os.path.join(START_DIR, args.replay))
+        if not recorded.matches_config():
+            print("Warning: the replay was recorded with different frame data or physics")
+        inputs = replay_inputs(recorded.frames())
+    else:
+        inputs = sparring(args.seed)
+
+    times, checksums = render_frames(args.frames, inputs, args.dirty_rects, checksum_frames)
+    summary = summarize(times)
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'frames': args.frames,
+        'seed': args.seed,
+        'replay': args.replay,
+        'renderer': 'dirty_rects' if args.dirty_rects else 'full',
+        'render_us': summary,
+        'checksums': {str(frame): checksum for frame, checksum in sorted(checksums.items())}
+    }
+    print(f"{args.frames} frames ({report['renderer']}): mean {summary['mean']:.1f} us, "
+          f"p50 {summary['p50']:.1f}, p95 {summary['p95']:.1f}, p99 {summary['p99']:.1f}, max {summary['max']:.1f}")
+
+    output = os.path.join(START_DIR, args.output)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+    if args.write_golden:
+        path = os.path.join(START_DIR, args.write_golden)
+        with open(path, 'w') as f:
+            json.dump({key: report[key] for key in ('frames', 'seed', 'replay', 'checksums')}, f, indent=2)
+        print(f"Wrote {len(checksums)} golden checksums to {path}")
+
+    if golden is not None:
+        mismatched = [frame for frame, checksum in golden['checksums'].items() if report['checksums'].get(frame) != checksum]
+        for frame in mismatched:
+            print(f"MISMATCH frame {frame}")
+        if mismatched:
+            sys.exit(1)
+        print(f"All {len(golden['checksums'])} golden frames match")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Wire protocol microbenchmark: JSON lines vs. the binary records, per message type.
+
+Each message is encoded and decoded back as the server and client would, so
+the times cover both ends of the connection. The stream metrics push a run of
+snapshots through MessageReader in TCP-segment-sized pieces, as received.
+"""
+import json
+import random
+import time
+
+from common import metric, per_call_us
+
+import protocol
+import simulation
+
+
+def sample_messages():
+    """A mid-match snapshot and one of each input message, as the game sends them"""
+    rng = random.Random(1)
+    state = simulation.new_match()
+    for _ in range(200):
+        simulation.step(state, rng.randrange(32), rng.randrange(32))
+    game_state = state.to_dict()
+    game_state['game_started'] = True
+    return {
+        'game_state': {'type': 'game_state', 'game_state': game_state, 'tick': 200, 'server_time': 12.5},
+        'keys': {'move': 5, 'action': 'punch'},
+        'input': {'type': 'input', 'player_id': 'player2', 'frame': 200, 'input': 9}
+    }
+
+
+def stream_rate(message, version, count, segment=1460):
+    """Messages per second MessageReader decodes from count copies of message, split into segments"""
+    stream = protocol.encode(message, version) * count
+    pieces = [stream[i:i + segment] for i in range(0, len(stream), segment)]
+    reader = protocol.MessageReader(version)
+    decoded = 0
+    start = time.perf_counter()
+    for piece in pieces:
+        reader.feed(piece)
+        for _ in reader.messages():
+            decoded += 1
+    elapsed = time.perf_counter() - start
+    assert decoded == count
+    return count / elapsed
+
+
+def run(quick=False):
+    seconds = 0.2 if quick else 1.0
+    results = {}
+    for name, message in sample_messages().items():
+        for label, version in (('json', protocol.PROTOCOL_JSON), ('binary', protocol.PROTOCOL_BINARY)):
+            data = protocol.encode(message, version)
+            if version == protocol.PROTOCOL_JSON:
+                def round_trip(message=message):
+                    return json.loads(protocol.encode(message))
+            else:
+                def round_trip(message=message):
+                    return protocol.decode(protocol.encode(message, protocol.PROTOCOL_BINARY)[2:])
+            results[f'{name}_{label}_bytes'] = metric(len(data), 'bytes', False)
+            results[f'{name}_{label}_ns'] = metric(per_call_us(round_trip, seconds) * 1000, 'ns', False)
+
+    count = 2000 if quick else 20000
+    game_state = sample_messages()['game_state']
+    for label, version in (('json', protocol.PROTOCOL_JSON), ('binary', protocol.PROTOCOL_BINARY)):
+        results[f'stream_{label}_msgs_per_sec'] = metric(stream_rate(game_state, version, count), 'msg/s')
+    return results
+
+
+if __name__ == "__main__":
+    for name, result in run().items():
+        print(f"{name}: {result['value']:,.1f} {result['unit']}")
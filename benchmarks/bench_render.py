@@ -0,0 +1,96 @@
+"""Per-frame cost of the desktop renderer, under the SDL dummy video driver."""
+import sys
+
+from common import metric, per_call_us, skipped
+
+SURFACE_METHODS = ('copy', 'convert', 'convert_alpha', 'subsurface')  # Each returns a new Surface
+
+
+def count_surfaces(function):
+    """Call function; returns how many Surfaces it made with pygame.Surface(),
+    a SURFACE_METHODS method or pygame.transform. Surface's methods can't be
+    patched, so the calls are seen with a profile hook."""
+    import pygame
+    count = [0]
+    surface_type = pygame.Surface
+
+    def counting_surface(*args, **kwargs):
+        count[0] += 1
+        return surface_type(*args, **kwargs)
+
+    def profile(frame, event, arg):
+        if event != 'c_call':
+            return
+        owner = getattr(arg, '__self__', None)
+        if owner is pygame.transform or (isinstance(owner, surface_type) and arg.__name__ in SURFACE_METHODS):
+            count[0] += 1
+
+    pygame.Surface = counting_surface
+    sys.setprofile(profile)
+    try:
+        function()
+    finally:
+        sys.setprofile(None)
+        pygame.Surface = surface_type
+    return count[0]
+
+
+def run(quick=False):
+    try:
+        import pygame
+    except ImportError:
+        return skipped("pygame is not installed")
+    import game
+    app = game.Game()
+    app.open_window()
+    app.load_assets()
+
+    seconds = 0.5 if quick else 2.0
+    # Mid-fight state: one fighter hurt and facing left so the flip path is exercised
+    app.player1.health = 60
+    app.player2.health = 35
+    app.player2.facing_right = False
+
+    # Drawing must only blit cached sprites; count every Surface made meanwhile
+    def draw_every_sprite():
+        for facing_right in (True, False):
+            app.player2.facing_right = facing_right
+            for action in range(len(game.ACTION_NAMES)):
+                app.player2.state.action = action
+                for frame in range(3):
+                    app.player2.state.animation_frame = frame
+                    app.draw_game(None, False)
+    draw_every_sprite()  # Load the sprites and fill the text cache first
+    frames = 2 * len(game.ACTION_NAMES) * 3
+    sprite_allocations = count_surfaces(draw_every_sprite) / frames
+    app.player2.state.action = 0
+    app.player2.state.animation_frame = 0
+    app.player2.facing_right = False
+
+    # Dirty-rect mode with one fighter walking back and forth, so a little changes every frame
+    def walk():
+        app.player1.state.x += step[0]
+        if not 100 <= app.player1.state.x <= 400:
+            step[0] = -step[0]
+        app.draw_game(None, False)
+    step = [5]
+    app.dirty_renderer = game.DirtyRenderer(app)
+    dirty_us = per_call_us(walk, seconds)
+    dirty_fraction = app.dirty_renderer.stats()['dirty_fraction']
+    app.dirty_renderer = None
+
+    return {
+        'draw_game_dirty_us': metric(dirty_us, 'us', False),
+        'dirty_screen_fraction': metric(dirty_fraction, 'ratio', False),
+        'sprite_surfaces_per_frame': metric(sprite_allocations, 'surfaces', False),
+        'draw_game_us': metric(per_call_us(lambda: app.draw_game(None, False), seconds), 'us', False),
+        'draw_game_over_us': metric(
+            per_call_us(lambda: app.draw_game("Player 1 Wins!", True), seconds), 'us', False),
+        'draw_health_bars_us': metric(per_call_us(app.draw_health_bars, seconds), 'us', False),
+        'fighter_draw_us': metric(per_call_us(lambda: app.player2.draw(app.screen), seconds), 'us', False),
+    }
+
+
+if __name__ == "__main__":
+    for name, result in run().items():
+        print(f"{name}: {result['value']:,.2f} {result['unit']}")
@@ -0,0 +1,160 @@
+"""The threaded, asyncio and sharded game servers side by side.
+
+For the threaded and asyncio servers, in-process with two loopback clients:
+input latency, the tick rate while both clients flood inputs, and the
+snapshot rate a client still gets while its opponent has stopped reading.
+(The sharded server runs the asyncio one in its workers, so these would be
+the same.) Then load_harness.py serves many matches with each
+implementation to see how it holds up.
+"""
+import contextlib
+import io
+import random
+import socket
+import threading
+import time
+
+from common import metric, percentile
+
+import load_harness
+from client import NetworkClient
+from server import TICK_RATE
+
+
+class TimedClient(NetworkClient):
+    """NetworkClient that counts game_state snapshots and tracks player 1's movement"""
+
+    def __init__(self, host, port):
+        super().__init__(host, port)
+        self.received = 0
+        self.x = None
+        self.dx = 0
+
+    def handle_message(self, message):
+        super().handle_message(message)
+        if message.get('type') == 'game_state':
+            x = message['game_state']['players']['player1']['x']
+            if self.x is not None:
+                self.dx = x - self.x
+            self.x = x
+            self.received += 1
+
+
+def wait_until(condition, timeout):
+    deadline = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < deadline:
+        time.sleep(0.001)
+    return condition()
+
+
+def close(client):
+    client.connected = False
+    client.client.close()
+
+
+def measure_latency(server, pings, flood_seconds):
+    clients = [TimedClient('127.0.0.1', server.port) for _ in range(2)]
+    for client in clients:
+        client.connect()
+    wait_until(lambda: all(c.game_started for c in clients), 2)
+    sender = clients[0]
+
+    # Latency: from pressing a direction to the first snapshot moving that
+    # way, then release and wait for the fighter to stop. Presses land at
+    # random points of the tick, like a player's would.
+    latencies = []
+    for ping in range(pings):
+        move = 5 if ping % 2 else -5
+        time.sleep(random.uniform(0, 1.0 / TICK_RATE))
+        start = time.perf_counter_ns()
+        sender.send_data({'move': move})
+        if not wait_until(lambda: sender.dx * move > 0, 1.0):
+            break
+        latencies.append((time.perf_counter_ns() - start) / 1e6)
+        sender.send_data({'move': 0})
+        wait_until(lambda: sender.dx == 0, 1.0)
+
+    # Load: both clients send inputs as fast as they can; output should
+    # stay at one snapshot per tick per client
+    before_received = [c.received for c in clients]
+    before = server.stats()
+    start = time.perf_counter()
+    while time.perf_counter() - start < flood_seconds:
+        for client in clients:
+            client.send_data({'move': 0})
+    elapsed = time.perf_counter() - start
+    after = server.stats()
+    received = [c.received - count for c, count in zip(clients, before_received)]
+    ticks = after['ticks'] - before['ticks']
+
+    for client in clients:
+        close(client)
+    return {
+        'latency_p50_ms': metric(percentile(latencies, 50), 'ms', False),
+        'latency_p99_ms': metric(percentile(latencies, 99), 'ms', False),
+        'inputs_per_sec': metric((after['inputs_received'] - before['inputs_received']) / elapsed, 'msg/s'),
+        'tick_rate_under_load': metric(ticks / elapsed, 'Hz'),
+        'snapshots_per_tick': metric(min(received) / max(1, ticks), 'ratio'),
+        'snapshot_bytes': metric((after['bytes_sent'] - before['bytes_sent']) / max(1, sum(received)), 'bytes', False),
+        'tick_us': metric(after['tick_us'], 'us', False),
+    }
+
+
+def measure_slow_peer(server, window):
+    """Snapshots/s player 1 gets while player 2 has stopped reading and
+    player 1's rollback inputs are being relayed to it"""
+    player = TimedClient('127.0.0.1', server.port)
+    player.connect()
+    stalled = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    stalled.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    stalled.connect(('127.0.0.1', server.port))
+    wait_until(lambda: player.game_started, 2)
+
+    def flood():
+        for frame in range(50000):
+            player.send_input(frame, 0)
+
+    # The relayed inputs fill the stalled client's socket buffers quickly
+    flooder = threading.Thread(target=flood, daemon=True)
+    flooder.start()
+    time.sleep(0.3)
+    before = player.received
+    time.sleep(window)
+    rate = (player.received - before) / window
+
+    # Closing the stalled client unblocks a server stuck writing to it
+    stalled.close()
+    flooder.join(5)
+    close(player)
+    return {'slow_peer_snapshot_rate': metric(rate, 'Hz')}
+
+
+def run(quick=False):
+    pings = 40 if quick else 200
+    flood_seconds = 0.5 if quick else 2.0
+    matches = 20 if quick else 200
+
+    results = {}
+    for impl in load_harness.IMPLEMENTATIONS:
+        measured = {}
+        if impl != 'sharded':
+            # The servers and clients log every connection; keep the report readable
+            with contextlib.redirect_stdout(io.StringIO()):
+                latency_server, slow_peer_server = load_harness.start_servers(impl, 2)
+                measured.update(measure_latency(latency_server, pings, flood_seconds))
+                measured.update(measure_slow_peer(slow_peer_server, 0.5 if quick else 1.0))
+
+        scale = load_harness.measure(impl, matches, seconds=1.0 if quick else 3.0)
+        measured[f'{matches}_matches_snapshot_rate'] = metric(scale['snapshot_rate'], 'Hz')
+        measured[f'{matches}_matches_slowest_client_rate'] = metric(scale['slowest_client_rate'], 'Hz')
+        measured[f'{matches}_matches_unmatched_clients'] = metric(scale['unmatched'], 'clients', False)
+        measured[f'{matches}_matches_server_cpu'] = metric(scale['server_cpu'] * 100, '%', False)
+        measured[f'{matches}_matches_cpu_us_per_tick'] = metric(scale['cpu_us_per_tick'], 'us', False)
+        for name, value in measured.items():
+            results[f'{impl}_{name}'] = value
+    return results
+
+
+if __name__ == "__main__":
+    for name, result in run().items():
+        print(f"{name}: {result['value']:,.3f} {result['unit']}")
@@ -0,0 +1,33 @@
+"""Steps/sec of the scalar simulation and the cost of state snapshots."""
+import random
+
+from common import metric, per_call_us, rate
+
+import simulation
+
+
+def run(quick=False):
+    seconds = 0.3 if quick else 1.0
+    rng = random.Random(1)
+    inputs = [(rng.randrange(32), rng.randrange(32)) for _ in range(1024)]
+    state = simulation.new_match()
+    tick = [0]
+
+    def step():
+        p1, p2 = inputs[tick[0] & 1023]
+        tick[0] += 1
+        simulation.step(state, p1, p2)
+        if state.p1.health <= 0 or state.p2.health <= 0:
+            simulation.reset_match(state)
+
+    buffer = bytearray(simulation.MatchState.SIZE)
+    return {
+        'steps_per_sec': metric(rate(step, seconds), 'steps/s'),
+        'snapshot_pack_us': metric(per_call_us(lambda: state.pack_into(buffer), seconds), 'us', False),
+        'snapshot_restore_us': metric(per_call_us(lambda: state.unpack_from(buffer), seconds), 'us', False),
+    }
+
+
+if __name__ == "__main__":
+    for name, result in run().items():
+        print(f"{name}: {result['value']:,.2f} {result['unit']}")
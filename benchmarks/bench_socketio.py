@@ -0,0 +1,110 @@
+"""Socket.IO event throughput of fighting-game-web/server.py.
+
+Starts the web server as a subprocess, pairs two python-socketio clients
+through matchmaking, then has one flood 'player_input' events and measures
+how fast the other receives 'opponent_input'. Needs the web server's
+requirements plus `python-socketio[client]`; skipped otherwise.
+"""
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from common import REPO_ROOT, metric, percentile, skipped
+
+WEB_DIR = os.path.join(REPO_ROOT, 'fighting-game-web')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def measure(url, sender, receiver, events):
+    matched = threading.Event()
+    match = {}
+    received = []
+    done = threading.Event()
+
+    @sender.on('match_found')
+    def on_match(data):
+        match['id'] = data['match_id']
+        matched.set()
+
+    @receiver.on('opponent_input')
+    def on_input(data):
+        received.append(time.perf_counter_ns() - data['input']['sent'])
+        if len(received) >= events:
+            done.set()
+
+    for client in (sender, receiver):
+        client.connect(url, transports=['websocket'], wait_timeout=5)
+        client.emit('player_online', {'username': 'bench'})
+    sender.emit('join_matchmaking')
+    time.sleep(0.1)
+    receiver.emit('join_matchmaking')
+    if not matched.wait(5):
+        return skipped("matchmaking did not pair the benchmark clients")
+
+    start = time.perf_counter()
+    for _ in range(events):
+        sender.emit('player_input', {'match_id': match['id'], 'input': {'sent': time.perf_counter_ns()}})
+    done.wait(30)
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = [ns / 1e6 for ns in received]
+    return {
+        'events_per_sec': metric(len(received) / elapsed, 'events/s'),
+        'delivered_ratio': metric(len(received) / events, 'ratio'),
+        'latency_p50_ms': metric(percentile(latencies_ms, 50), 'ms', False),
+        'latency_p99_ms': metric(percentile(latencies_ms, 99), 'ms', False),
+    }
+
+
+def run(quick=False, python=None):
+    try:
+        import socketio
+    except ImportError:
+        return skipped("python-socketio client is not installed")
+
+    events = 200 if quick else 2000
+    port = free_port()
+    env = dict(os.environ, PORT=str(port))
+    server = subprocess.Popen([python or sys.executable, 'server.py'], cwd=WEB_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_for_port(port, 15):
+            return skipped("web server did not start (are its requirements installed?)")
+
+        url = f'http://127.0.0.1:{port}'
+        sender = socketio.Client()
+        receiver = socketio.Client()
+        try:
+            return measure(url, sender, receiver, events)
+        finally:
+            # Connected clients run reconnect threads that would keep the process alive
+            for client in (sender, receiver):
+                if client.connected:
+                    client.disconnect()
+    finally:
+        server.terminate()
+        server.wait(5)
+
+
+if __name__ == "__main__":
+    for name, result in run().items():
+        print(name, result)
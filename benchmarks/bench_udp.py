@@ -0,0 +1,103 @@
+"""The UDP transport on a simulated lossy link.
+
+A state-sync client plays over UDP through udp_transport.LinkSimulator
+(loss both ways, LATENCY_MS +- JITTER_MS each way) against an in-process
+AsyncGameServer, sending an input every frame. Reported per loss rate: the
+share of those inputs the server applied when each is sent once
+(redundancy 1) and when unacknowledged ones are repeated (the default
+REDUNDANCY), and the longest gap between the snapshots the client got.
+The jitter reorders datagrams as well; a reordered input is still applied
+(see udp_transport.FRAME_WINDOW), so without loss both come to 100%.
+Over TCP the same loss would stall the stream for a retransmission
+timeout instead, which the simulator can't reproduce.
+"""
+import contextlib
+import io
+import time
+
+from common import metric, percentile
+
+import load_harness
+import udp_transport
+from async_server import AsyncGameServer
+from client import NetworkClient
+from server import TICK_RATE
+
+LOSS_RATES = (0.0, 0.05, 0.2)
+LATENCY_MS = 30
+JITTER_MS = 10
+
+
+class SnapshotClock(NetworkClient):
+    """NetworkClient noting when each snapshot arrives"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.arrivals = []
+
+    def handle_message(self, message):
+        super().handle_message(message)
+        if message.get('type') == 'game_state':
+            self.arrivals.append(time.perf_counter())
+
+
+def close(client):
+    client.connected = False
+    client.client.close()
+    if client.udp is not None:
+        client.udp.close()
+
+
+def measure(server, loss, redundancy, seconds):
+    """(share of inputs applied, snapshot gaps in ms) for one lossy client"""
+    link = udp_transport.LinkSimulator(loss, LATENCY_MS / 1000, JITTER_MS / 1000, seed=1)
+    lossy = SnapshotClock('127.0.0.1', server.port, transport='udp', link=link, redundancy=redundancy)
+    opponent = NetworkClient('127.0.0.1', server.port, transport='udp')
+    lossy.connect()
+    opponent.connect()
+    # The first datagram can be lost too; knock like the game loop would until the server answers
+    deadline = time.perf_counter() + 2
+    while not lossy.channel.received:
+        if time.perf_counter() > deadline:
+            raise RuntimeError("no UDP traffic from the server")
+        lossy.send_packet()
+        time.sleep(1.0 / TICK_RATE)
+
+    before = server.stats()['inputs_received']
+    start = time.perf_counter()
+    lossy.arrivals.clear()
+    sent = 0
+    while time.perf_counter() - start < seconds:
+        lossy.send_data({'move': 5 if (sent // TICK_RATE) % 2 else -5, 'action': 'idle'})
+        sent += 1
+        time.sleep(max(0.0, start + sent / TICK_RATE - time.perf_counter()))
+    arrivals = list(lossy.arrivals)
+    # Inputs still on the simulated link, or waiting for the next packet to repeat them
+    time.sleep(0.3)
+    applied = server.stats()['inputs_received'] - before
+
+    close(lossy)
+    close(opponent)
+    gaps = [(b - a) * 1000 for a, b in zip(arrivals, arrivals[1:])]
+    return applied / sent, gaps
+
+
+def run(quick=False):
+    seconds = 1.0 if quick else 4.0
+    results = {}
+    # The server and clients log every connection; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        server = load_harness.serve_in_thread([AsyncGameServer('127.0.0.1', 0, udp_port=0)])[0]
+        for loss in LOSS_RATES:
+            name = f'loss{round(loss * 100)}'
+            for redundancy in (1, udp_transport.REDUNDANCY):
+                delivered, gaps = measure(server, loss, redundancy, seconds)
+                results[f'{name}_r{redundancy}_inputs_applied'] = metric(delivered * 100, '%')
+            results[f'{name}_snapshot_gap_p99_ms'] = metric(percentile(gaps, 99), 'ms', False)
+            results[f'{name}_snapshot_gap_max_ms'] = metric(max(gaps), 'ms', False)
+    return results
+
+
+if __name__ == "__main__":
+    for name, result in run().items():
+        print(f"{name}: {result['value']:,.1f} {result['unit']}")
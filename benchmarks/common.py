@@ -0,0 +1,53 @@
+"""Helpers shared by the benchmark modules.
+
+Every benchmark module exposes run(quick=False) returning a dict of
+metric name -> metric(); run.py collects them into one JSON report.
+"""
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The game modules load assets by relative path and must never open a real window here
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+os.chdir(REPO_ROOT)
+
+
+def metric(value, unit, higher_is_better=True):
+    return {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+
+
+def skipped(reason):
+    return {'skipped': reason}
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of an unsorted list"""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def rate(fn, seconds):
+    """Call fn repeatedly for about `seconds` and return calls per second"""
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while True:
+        for _ in range(100):
+            fn()
+        calls += 100
+        now = time.perf_counter()
+        if now >= deadline:
+            return calls / (now - start)
+
+
+def per_call_us(fn, seconds):
+    """Average cost of one fn() call in microseconds"""
+    return 1e6 / rate(fn, seconds)
@@ -0,0 +1,163 @@
+"""Fuzz protocol.MessageReader with randomly split and coalesced streams.
+
+Each round builds a connection's worth of traffic (the JSON handshake lines,
+then random framed messages including JSON frames, unknown record types
+and malformed records) and feeds it to a reader in random-sized pieces, from
+single bytes to several messages at once. Every message must come out
+exactly once, in order, whatever the split. One round in each batch goes
+through a real socket pair and recv_into() instead of feed().
+
+    python benchmarks/fuzz_framing.py --rounds 2000 --seed 7
+
+Exits 1 on the first mismatch, printing the seed and round to reproduce it.
+"""
+import argparse
+import random
+import socket
+import struct
+import sys
+import threading
+
+import common  # noqa: F401  (puts the repository root on the import path)
+
+import protocol
+import simulation
+
+MALFORMED = object()  # Expected in place of a record that must raise ProtocolError
+
+
+def random_message(rng):
+    """(message, expected result) for a random message the game could send"""
+    kind = rng.randrange(8)
+    if kind == 0:
+        players = {}
+        for player_id in protocol.PLAYER_IDS:
+            players[player_id] = {
+                'x': rng.randint(-32768, 32767), 'y': rng.randint(-32768, 32767),
+                'health': rng.randint(0, 255),
+                'action': rng.choice(simulation.ACTION_NAMES),
+                'facing_right': rng.random() < 0.5,
+                'is_attacking': rng.random() < 0.5,
+                'animation_frame': rng.randint(0, 65535)
+            }
+        message = {'type': 'game_state', 'game_state': {'players': players, 'game_started': rng.random() < 0.5},
+                   'tick': rng.randint(0, 2 ** 32 - 1), 'server_time': rng.uniform(0, 1e6)}
+        return protocol.encode(message, protocol.PROTOCOL_BINARY), message
+    if kind == 1:
+        message = protocol._input_message(rng.randrange(32))
+        return protocol.encode(message, protocol.PROTOCOL_BINARY), message
+    if kind == 2:
+        message = {'type': 'input', 'player_id': rng.choice(protocol.PLAYER_IDS),
+                   'frame': rng.randint(0, 2 ** 32 - 1), 'input': rng.randrange(32)}
+        return protocol.encode(message, protocol.PROTOCOL_BINARY), message
+    if kind == 3:
+        message = rng.choice(({'type': 'game_start'},
+                              {'type': 'player_disconnected', 'player_id': rng.choice(protocol.PLAYER_IDS)}))
+        return protocol.encode(message, protocol.PROTOCOL_BINARY), message
+    if kind == 4:
+        # No record layout, so it travels as a JSON frame; sometimes a big one
+        message = {'type': 'chat', 'text': 'x' * rng.choice((0, 10, 1000, 60000))}
+        return protocol.encode(message, protocol.PROTOCOL_BINARY), message
+    if kind == 7:
+        message = {'type': 'inputs', 'player_id': rng.choice(protocol.PLAYER_IDS), 'relay': rng.random() < 0.5,
+                   'frame': rng.randint(0, 2 ** 32 - 1), 'inputs': [rng.randrange(32) for _ in range(rng.randint(1, 8))]}
+        return protocol.encode(message, protocol.PROTOCOL_BINARY), message
+    payload = bytes([rng.randint(100, 120)]) + rng.randbytes(rng.randrange(20))
+    if kind == 5:
+        # A record type from a newer peer: skipped
+        return struct.pack('<H', len(payload)) + payload, None
+    # A game_state record cut short
+    payload = bytes([protocol.MSG_GAME_STATE]) + rng.randbytes(rng.randrange(1, 20))
+    return struct.pack('<H', len(payload)) + payload, MALFORMED
+
+
+def build_stream(rng, count):
+    """(bytes, expected messages) for a handshake followed by count framed messages"""
+    handshake = {'type': 'protocol', 'version': protocol.PROTOCOL_BINARY}
+    parts = [protocol.encode({'type': 'init', 'player_id': 'player1', 'game_state': {}}), protocol.encode(handshake)]
+    expected = [{'type': 'init', 'player_id': 'player1', 'game_state': {}}, handshake]
+    for _ in range(count):
+        data, message = random_message(rng)
+        parts.append(data)
+        if message is not None:
+            expected.append(message)
+    return b''.join(parts), expected
+
+
+def read_all(reader, received):
+    """Drain reader into received, switching version on 'protocol' like the client does"""
+    while True:
+        try:
+            for message in reader.messages():
+                received.append(message)
+                if message.get('type') == 'protocol':
+                    reader.version = message['version']
+            return
+        except protocol.ProtocolError:
+            received.append(MALFORMED)
+
+
+def split(rng, stream):
+    """Random pieces of stream: mostly small, sometimes single bytes or large coalesced runs"""
+    pieces = []
+    offset = 0
+    while offset < len(stream):
+        size = rng.choice((1, rng.randint(1, 8), rng.randint(1, 1500), rng.randint(1, 20000)))
+        pieces.append(stream[offset:offset + size])
+        offset += size
+    return pieces
+
+
+def fuzz_feed(rng, stream):
+    reader = protocol.MessageReader()
+    received = []
+    for piece in split(rng, stream):
+        reader.feed(piece)
+        read_all(reader, received)
+    return received
+
+
+def fuzz_socket(rng, stream):
+    reader = protocol.MessageReader()
+    received = []
+    ours, theirs = socket.socketpair()
+    pieces = split(rng, stream)
+
+    def send():
+        for piece in pieces:
+            theirs.sendall(piece)
+        theirs.close()
+
+    sender = threading.Thread(target=send, daemon=True)
+    sender.start()
+    while reader.recv_into(ours, rng.randint(1, protocol.RECV_SIZE)):
+        read_all(reader, received)
+    sender.join()
+    ours.close()
+    return received
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fuzz the framed protocol reader with random segmentation')
+    parser.add_argument('--rounds', type=int, default=500, help='Streams to try (default 500)')
+    parser.add_argument('--messages', type=int, default=200, help='Messages per stream (default 200)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    total = 0
+    for round_number in range(args.rounds):
+        stream, expected = build_stream(rng, rng.randint(0, args.messages))
+        fuzz = fuzz_socket if round_number % 10 == 0 else fuzz_feed
+        received = fuzz(rng, stream)
+        if received != expected:
+            index = next((i for i, (a, b) in enumerate(zip(received, expected)) if a != b), min(len(received), len(expected)))
+            print(f"MISMATCH seed {args.seed} round {round_number} ({fuzz.__name__}) at message {index}: "
+                  f"got {len(received)} messages, expected {len(expected)}")
+            sys.exit(1)
+        total += len(expected)
+    print(f"{args.rounds} streams, {total} messages: all decoded exactly once and in order")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""Load harness: many matches served by one server, driven from another process.
+
+    python benchmarks/load_harness.py --impl async --matches 200 --seconds 5
+    python benchmarks/load_harness.py --impl all --matches 50
+    python benchmarks/load_harness.py --impl sharded --workers 4 --matches 800
+
+The server process hosts --matches two-player matches: threaded
+server.GameServers on one port each, or rooms of one AsyncGameServer, or
+rooms of a sharded_server.ShardedServer with --workers processes, both on a
+single port. The client process connects 2 * --matches binary-protocol
+clients; each sends an input every tick and counts the snapshots that come
+back. Reported per implementation: the snapshot rate clients actually got
+(the tick rate when the server keeps up), the slowest client's rate, any
+clients never paired into a match, and the server's CPU time (all its
+processes) per second of wall time and per match tick. On a machine with
+fewer cores than processes the load competes with the server, so compare
+CPU per tick rather than how many matches fit.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import common  # noqa: F401  (puts the repository root on the import path)
+
+import protocol
+from server import TICK_RATE
+
+IMPLEMENTATIONS = ('threaded', 'async', 'sharded')
+QUERY_TIMEOUT = 30
+CONCURRENT_CONNECTS = 64
+
+
+def serve_in_thread(servers):
+    """Run AsyncGameServers on one event loop in a background thread; returns once all are listening"""
+    ready = threading.Event()
+
+    async def main():
+        for server in servers:
+            await server.start_serving()
+        ready.set()
+        await asyncio.Event().wait()
+
+    threading.Thread(target=asyncio.run, args=(main(),), daemon=True).start()
+    ready.wait()
+    return servers
+
+
+def start_servers(impl, count, tick_rate=TICK_RATE, workers=None):
+    """Start count servers of the given implementation on free loopback ports"""
+    if impl == 'async':
+        from async_server import AsyncGameServer
+        return serve_in_thread([AsyncGameServer('127.0.0.1', 0, tick_rate) for _ in range(count)])
+    if impl == 'sharded':
+        from sharded_server import ShardedServer
+        return serve_in_thread([ShardedServer('127.0.0.1', 0, tick_rate, workers) for _ in range(count)])
+    from server import GameServer
+    servers = [GameServer('127.0.0.1', 0, tick_rate) for _ in range(count)]
+    for server in servers:
+        server.port = server.server.getsockname()[1]
+        threading.Thread(target=server.start, daemon=True).start()
+    return servers
+
+
+def serve_matches(impl, matches, tick_rate=TICK_RATE, workers=None):
+    """(servers, port per match) for matches two-player matches; the
+    threaded server hosts one match per server, the others any number"""
+    if impl == 'threaded':
+        servers = start_servers(impl, matches, tick_rate)
+        return servers, [server.port for server in servers]
+    servers = start_servers(impl, 1, tick_rate, workers)
+    return servers, [servers[0].port] * matches
+
+
+def _serve(impl, matches, tick_rate, workers):
+    """Server process: print the ports, then answer each stdin line with CPU time and ticks"""
+    # The servers log every connection, worker processes included; only reports go to the pipe
+    out = os.fdopen(os.dup(1), 'w')
+    os.dup2(os.open(os.devnull, os.O_WRONLY), 1)
+    servers, ports = serve_matches(impl, matches, tick_rate, workers)
+    print(json.dumps({'ports': ports}), file=out, flush=True)
+    for _ in sys.stdin:
+        stats = [server.stats() for server in servers]
+        cpu = time.process_time() + sum(server_stats.get('worker_cpu', 0.0) for server_stats in stats)
+        ticks = sum(server_stats['ticks'] for server_stats in stats)
+        print(json.dumps({'cpu': cpu, 'ticks': ticks}), file=out, flush=True)
+
+
+class LoadClient(asyncio.BufferedProtocol):
+    """A binary-protocol client that only counts the snapshots it gets"""
+
+    def __init__(self, connected):
+        self.connected = connected
+        self.reader = protocol.MessageReader()
+        self.transport = None
+        self.ready = False
+        self.started = False
+        self.snapshots = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def get_buffer(self, sizehint):
+        return self.reader.receive_buffer()
+
+    def buffer_updated(self, nbytes):
+        self.reader.received(nbytes)
+        for message in self.reader.messages():
+            kind = message.get('type')
+            if kind == 'game_state':
+                self.snapshots += 1
+            elif kind == 'game_start':
+                self.started = True
+            elif kind == 'init':
+                self.transport.write(protocol.encode({'type': 'hello', 'protocol': protocol.PROTOCOL_BINARY}))
+                self.ready = True
+                self.connected.release()
+            elif kind == 'protocol':
+                self.reader.version = message['version']
+
+    def send_input(self, player_input):
+        if self.ready and not self.transport.is_closing():
+            self.transport.write(protocol.encode(player_input, protocol.PROTOCOL_BINARY))
+
+
+def _load(ports, tick_rate):
+    """Client process: two clients per port sending every tick; each stdin line
+    is answered with every client's snapshot count and how many got a match"""
+    clients = []
+
+    async def main(ready):
+        loop = asyncio.get_running_loop()
+        connected = asyncio.Semaphore(0)
+        connecting = asyncio.Semaphore(CONCURRENT_CONNECTS)
+
+        async def connect(port):
+            async with connecting:
+                _, client = await loop.create_connection(lambda: LoadClient(connected), '127.0.0.1', port)
+            clients.append(client)
+
+        # Player 1 everywhere first, so every threaded server numbers its players the usual way
+        for _ in range(2):
+            await asyncio.gather(*(connect(port) for port in ports))
+        for _ in clients:
+            await connected.acquire()
+        ready.set()
+
+        # Everyone walks back and forth, a direction change a second
+        interval = 1.0 / tick_rate
+        tick = 0
+        next_tick = loop.time()
+        while True:
+            player_input = {'move': 5 if (tick // tick_rate) % 2 else -5, 'action': 'idle'}
+            for client in clients:
+                client.send_input(player_input)
+            tick += 1
+            next_tick += interval
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+    ready = threading.Event()
+    threading.Thread(target=asyncio.run, args=(main(ready),), daemon=True).start()
+    ready.wait()
+    print(json.dumps({'clients': len(clients)}), flush=True)
+    for _ in sys.stdin:
+        print(json.dumps({'snapshots': [client.snapshots for client in clients],
+                          'started': sum(client.started for client in clients)}), flush=True)
+
+
+def _read_line(process, timeout=QUERY_TIMEOUT):
+    """The next report from a harness process; an overloaded one is killed rather than waited on"""
+    timer = threading.Timer(timeout, process.kill)
+    timer.start()
+    try:
+        line = process.stdout.readline()
+    finally:
+        timer.cancel()
+    if not line:
+        raise RuntimeError(f"the {process.args[2].lstrip('-')} process did not answer within {timeout} s")
+    return json.loads(line)
+
+
+def _query(process):
+    process.stdin.write('\n')
+    process.stdin.flush()
+    return _read_line(process)
+
+
+def measure(impl, matches, seconds=3.0, warmup=1.0, tick_rate=TICK_RATE, workers=None):
+    """Serve matches with impl, load them, and return the rates seen over seconds.
+    A server too overloaded to answer, or to let every client connect, gets
+    rates of zero and the reason under 'error'."""
+    script = os.path.abspath(__file__)
+    server = subprocess.Popen([sys.executable, script, '--serve', impl, '--matches', str(matches),
+                               '--tick-rate', str(tick_rate), '--workers', str(workers or os.cpu_count())],
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    load = None
+    try:
+        ports = _read_line(server)['ports']
+        load = subprocess.Popen([sys.executable, script, '--load', ','.join(map(str, ports)),
+                                 '--tick-rate', str(tick_rate)],
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        _read_line(load)
+        time.sleep(warmup)
+
+        start = time.perf_counter()
+        server_before, load_before = _query(server), _query(load)
+        time.sleep(seconds)
+        server_after, load_after = _query(server), _query(load)
+        elapsed = time.perf_counter() - start
+    except RuntimeError as e:
+        return {'matches': matches, 'clients': 2 * matches, 'snapshot_rate': 0.0, 'slowest_client_rate': 0.0,
+                'unmatched': 0, 'tick_rate': 0.0, 'server_cpu': 0.0, 'cpu_us_per_tick': 0.0, 'error': str(e)}
+    finally:
+        for process in (load, server):
+            if process is not None:
+                process.kill()
+                process.wait()
+
+    rates = [(after - before) / elapsed
+             for before, after in zip(load_before['snapshots'], load_after['snapshots'])]
+    ticks = server_after['ticks'] - server_before['ticks']
+    cpu = server_after['cpu'] - server_before['cpu']
+    return {
+        'matches': matches,
+        'clients': len(rates),
+        'snapshot_rate': sum(rates) / len(rates),
+        'slowest_client_rate': min(rates),
+        'unmatched': len(rates) - load_after['started'],
+        'tick_rate': ticks / elapsed / matches,
+        'server_cpu': cpu / elapsed,
+        'cpu_us_per_tick': cpu / max(1, ticks) * 1e6
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load many matches and report the snapshot rates clients get')
+    parser.add_argument('--impl', choices=IMPLEMENTATIONS + ('all',), default='all', help='Server implementation')
+    parser.add_argument('--matches', type=int, default=50, help='Matches (two clients each) to serve (default 50)')
+    parser.add_argument('--seconds', type=float, default=5.0, help='Measurement window (default 5)')
+    parser.add_argument('--tick-rate', type=int, default=TICK_RATE, help=f'Server ticks per second (default {TICK_RATE})')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Worker processes for the sharded server (default: one per core)')
+    parser.add_argument('--serve', choices=IMPLEMENTATIONS, help=argparse.SUPPRESS)
+    parser.add_argument('--load', type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        _serve(args.serve, args.matches, args.tick_rate, args.workers)
+        return
+    if args.load:
+        _load([int(port) for port in args.load.split(',')], args.tick_rate)
+        return
+
+    for impl in IMPLEMENTATIONS if args.impl == 'all' else (args.impl,):
+        result = measure(impl, args.matches, args.seconds, tick_rate=args.tick_rate, workers=args.workers)
+        if 'error' in result:
+            print(f"{impl:>8}: {result['matches']} matches: {result['error']}")
+            continue
+        print(f"{impl:>8}: {result['matches']} matches, {result['clients']} clients: "
+              f"{result['snapshot_rate']:.1f} snapshots/s per client (slowest {result['slowest_client_rate']:.1f}, "
+              f"{result['unmatched']} unmatched), "
+              f"{result['tick_rate']:.1f} ticks/s per match, server CPU {result['server_cpu'] * 100:.0f}% "
+              f"({result['cpu_us_per_tick']:.1f} us per match tick)")
+
+
+if __name__ == "__main__":
+    main()
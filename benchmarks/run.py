@@ -0,0 +1,109 @@
+"""Run the benchmark suite headless and write one JSON report.
+
+    python benchmarks/run.py                             # everything, results.json
+    python benchmarks/run.py --quick --only simulation render
+    python benchmarks/run.py --compare baseline.json     # exit 1 on a regression
+
+The report looks like
+
+    {"timestamp": ..., "python": ..., "platform": ...,
+     "results": {"simulation": {"steps_per_sec": {"value": ..., "unit": ...,
+                                                  "higher_is_better": true}}}}
+
+A benchmark whose dependencies are missing reports {"skipped": reason}, and one
+that raises reports {"error": message}; neither counts as a regression.
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import sys
+import time
+import traceback
+
+# common chdirs to the repository root; paths on the command line stay relative to here
+START_DIR = os.getcwd()
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import common
+
+BENCHMARKS = ('simulation', 'batch_sim', 'render', 'frames', 'assets', 'protocol', 'server', 'udp', 'socketio')
+
+
+def run_benchmark(name, quick):
+    try:
+        module = importlib.import_module(f'bench_{name}')
+        return module.run(quick=quick)
+    except ImportError as e:
+        return common.skipped(str(e))
+    except Exception as e:
+        traceback.print_exc()
+        return {'error': f'{type(e).__name__}: {e}'}
+
+
+def compare(results, baseline, threshold):
+    """Return a list of (benchmark, metric, old, new, change) that got worse than threshold"""
+    regressions = []
+    for name, metrics in results.items():
+        old_metrics = baseline.get('results', {}).get(name, {})
+        for key, new in metrics.items():
+            old = old_metrics.get(key)
+            if not isinstance(new, dict) or not isinstance(old, dict):
+                continue
+            if old['value'] == 0:
+                # Counters that should stay at zero, such as allocations per frame
+                if new['value'] != 0 and not new['higher_is_better']:
+                    regressions.append((name, key, old['value'], new['value'], float('inf')))
+                continue
+            change = (new['value'] - old['value']) / abs(old['value'])
+            worse = -change if new['higher_is_better'] else change
+            if worse > threshold:
+                regressions.append((name, key, old['value'], new['value'], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the benchmark suite')
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, help='Run just these benchmarks')
+    parser.add_argument('--quick', action='store_true', help='Shorter runs, for a smoke test')
+    parser.add_argument('--output', type=str, default='results.json', help='Where to write the report')
+    parser.add_argument('--compare', type=str, default=None, help='Baseline report to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Relative change that counts as a regression (default 0.10)')
+    args = parser.parse_args()
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': {}
+    }
+    for name in args.only or BENCHMARKS:
+        print(f"== {name}")
+        results = run_benchmark(name, args.quick)
+        report['results'][name] = results
+        for key, value in results.items():
+            if isinstance(value, dict):
+                print(f"   {key:<32} {value['value']:>14,.3f} {value['unit']}")
+            else:
+                print(f"   {key}: {value}")
+
+    output = os.path.join(START_DIR, args.output)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+    if args.compare:
+        with open(os.path.join(START_DIR, args.compare)) as f:
+            baseline = json.load(f)
+        regressions = compare(report['results'], baseline, args.threshold)
+        for name, key, old, new, change in regressions:
+            print(f"REGRESSION {name}.{key}: {old:,.3f} -> {new:,.3f} ({change:+.1%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import os
 import shutil
+import subprocess
+import sys
 import PyInstaller.__main__
 
 def clean_build():
@@ -11,6 +13,12 @@ def clean_build():
             else:
                 os.remove(item)
 
+def build_assets():
+    # Decode the images once here instead of on every launch of the game
+    print("Building asset pack...")
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy')
+    subprocess.run([sys.executable, 'asset_pack.py'], env=env, check=True)
+
 def build_client():
     print("Building client executable...")
     PyInstaller.__main__.run([
@@ -21,6 +29,8 @@ def build_client():
         '--add-data=player1;player1',
         '--add-data=player2;player2',
         '--add-data=background.jpg;.',
+        '--add-data=assets.pack;.',
+        '--add-data=frame_data.json;.',
         '--hidden-import=pygame',
         '--noconsole'
     ])
@@ -35,6 +45,8 @@ def build_client():
     shutil.copytree('player1', f'{client_dir}/player1', dirs_exist_ok=True)
     shutil.copytree('player2', f'{client_dir}/player2', dirs_exist_ok=True)
     shutil.copy('background.jpg', client_dir)
+    shutil.copy('assets.pack', client_dir)
+    shutil.copy('frame_data.json', client_dir)
     
     # Create a README file
     with open(f'{client_dir}/README.txt', 'w') as f:
@@ -54,6 +66,7 @@ def build_server():
         'server.py',
         '--name=FightingGameServer',
         '--onefile',
+        '--add-data=frame_data.json;.',
         '--noconsole'
     ])
     
@@ -79,6 +92,7 @@ def build_server():
 
 if __name__ == "__main__":
     clean_build()
+    build_assets()
     build_client()
     build_server()
     print("\nBuild complete!")
@@ -18,12 +18,13 @@ def build_client():
         '--add-data=player1;player1',
         '--add-data=player2;player2',
         '--add-data=background.jpg;.',
+        '--add-data=frame_data.json;.',
         '--hidden-import=pygame',
         '--noconsole'
     ])
     
     # Copy necessary files to dist folder
-    files_to_copy = ['player1', 'player2', 'background.jpg']
+    files_to_copy = ['player1', 'player2', 'background.jpg', 'frame_data.json']
     for file in files_to_copy:
         if os.path.isdir(file):
             dest = os.path.join('dist', file)
@@ -1,60 +1,219 @@
 import socket
-import json
 import pygame
 import sys
 import threading
 import time
-from game import Fighter, SCREEN_WIDTH, SCREEN_HEIGHT, GRAVITY, SCROLL_THRESH, TILE_SIZE, ROWS, COLS, TILE_TYPES, screen, scroll, bg_scroll, bg, screen_scroll, game_active, player1, player2, draw_bg, draw_health_bars, draw_controls, draw_game, check_winner, reset_game, slow_mo_timer, MAX_SLOW_MO_FRAMES, WIN_WIDTH, WIN_HEIGHT, GROUND_HEIGHT
+from collections import deque
+
+import protocol
+import simulation
+import text_cache
+import udp_transport
+from replay import ReplayRecorder
+from rollback import RollbackSession
+
+WHITE = (255, 255, 255)
+
+def _blend(older, newer, alpha):
+    """game_state with positions at alpha between two snapshots (past 1 extrapolates);
+    everything else comes from the newest snapshot not ahead of alpha"""
+    base = older if alpha < 1 else newer
+    players = {}
+    for name, state in base.get('players', {}).items():
+        a = older.get('players', {}).get(name, state)
+        b = newer.get('players', {}).get(name, state)
+        blended = dict(state)
+        for key in ('x', 'y'):
+            blended[key] = a[key] + (b[key] - a[key]) * alpha
+        players[name] = blended
+    return {'players': players}
+
+class SnapshotBuffer:
+    """Server game_state snapshots, drawn a little in the past.
+
+    Snapshots are stamped when they arrive, or with the server's clock
+    shifted onto ours when the message carries 'server_time'. sample() draws
+    at now - delay, interpolating between the two snapshots around that time;
+    when the next snapshot is late it extrapolates from the last two for up
+    to MAX_EXTRAPOLATION seconds, then holds the last position. The delay
+    follows the smoothed snapshot interval plus JITTER_MULTIPLIER times the
+    measured jitter (RFC 3550 style), eased so the drawn time never jumps or
+    runs backwards.
+
+    stats() reports the buffered depth, the delay and jitter, and how many
+    frames were extrapolated or held and how many snapshots arrived late
+    (older than the time already drawn).
+    """
+    MIN_DELAY = 0.05
+    MAX_DELAY = 0.25
+    MAX_EXTRAPOLATION = 0.1
+    JITTER_MULTIPLIER = 3
+    DELAY_EASING = 0.05  # Fraction of the way to the target delay per sample
+
+    def __init__(self, capacity=64):
+        self.snapshots = deque(maxlen=capacity)  # (time, game_state), oldest first
+        self.lock = threading.Lock()
+        self.interval = None
+        self.jitter = 0.0
+        self.delay = self.MIN_DELAY
+        self.offset = None  # Our clock minus the server's, lowest seen
+        self.render_time = None
+        self._last_arrival = None
+        self._last_server_time = None
+        self.received = 0
+        self.late = 0
+        self.extrapolated = 0
+        self.held = 0
+
+    def push(self, game_state, server_time=None, now=None):
+        now = time.perf_counter() if now is None else now
+        with self.lock:
+            if server_time is None:
+                stamp = now
+            else:
+                offset = now - server_time
+                if self.offset is None or offset < self.offset:
+                    self.offset = offset
+                stamp = server_time + self.offset
+
+            if self._last_arrival is not None:
+                gap = now - self._last_arrival
+                if server_time is not None and self._last_server_time is not None:
+                    expected = server_time - self._last_server_time
+                else:
+                    expected = gap if self.interval is None else self.interval
+                self.interval = gap if self.interval is None else self.interval + (gap - self.interval) / 16
+                self.jitter += (abs(gap - expected) - self.jitter) / 16
+            self._last_arrival = now
+            self._last_server_time = server_time
+
+            if self.render_time is not None and stamp <= self.render_time:
+                self.late += 1
+            if self.snapshots and stamp < self.snapshots[-1][0]:
+                stamp = self.snapshots[-1][0]
+            self.snapshots.append((stamp, game_state))
+            self.received += 1
+
+    def target_delay(self):
+        interval = self.interval or 0.0
+        return min(self.MAX_DELAY, max(self.MIN_DELAY, interval + self.JITTER_MULTIPLIER * self.jitter))
+
+    def sample(self, now=None):
+        """game_state to draw now, or None before the first snapshot"""
+        now = time.perf_counter() if now is None else now
+        with self.lock:
+            snapshots = self.snapshots
+            if not snapshots:
+                return None
+            self.delay += (self.target_delay() - self.delay) * self.DELAY_EASING
+            render_time = now - self.delay
+            if self.render_time is not None and render_time < self.render_time:
+                render_time = self.render_time
+            self.render_time = render_time
+
+            newest_time, newest = snapshots[-1]
+            if render_time >= newest_time:
+                if len(snapshots) < 2 or newest_time <= snapshots[-2][0]:
+                    return _blend(newest, newest, 0)
+                previous_time, previous = snapshots[-2]
+                ahead = render_time - newest_time
+                if ahead > self.MAX_EXTRAPOLATION:
+                    self.held += 1
+                    ahead = self.MAX_EXTRAPOLATION
+                else:
+                    self.extrapolated += 1
+                return _blend(previous, newest, 1 + ahead / (newest_time - previous_time))
+
+            # Keep only the snapshots from the one at or before render_time on
+            while len(snapshots) > 2 and snapshots[1][0] <= render_time:
+                snapshots.popleft()
+            older_time, older = snapshots[0]
+            newer_time, newer = snapshots[1]
+            if render_time <= older_time:
+                return _blend(older, older, 0)
+            return _blend(older, newer, (render_time - older_time) / (newer_time - older_time))
+
+    def stats(self):
+        with self.lock:
+            ahead = sum(1 for stamp, _ in self.snapshots if self.render_time is None or stamp > self.render_time)
+            return {
+                'depth': ahead,
+                'delay_ms': self.delay * 1000,
+                'jitter_ms': self.jitter * 1000,
+                'received': self.received,
+                'late': self.late,
+                'extrapolated': self.extrapolated,
+                'held': self.held
+            }
 
 class NetworkClient:
-    def __init__(self, host='localhost', port=5555):
+    """Connection to server.py. protocol_version is the wire format to ask the
+    server for (see protocol.py); against a server that doesn't offer it the
+    client stays on JSON.
+
+    With transport='udp' (binary protocol only) inputs and snapshots go over
+    UDP once the server agrees; see udp_transport.py. link, a
+    udp_transport.LinkSimulator, makes those datagrams lossy both ways."""
+    def __init__(self, host='localhost', port=5555, protocol_version=protocol.PROTOCOL_BINARY,
+                 transport='tcp', link=None, redundancy=udp_transport.REDUNDANCY):
         self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         self.host = host
         self.port = port
         self.connected = False
         self.player_id = None
+        self.game_started = False
         self.game_state = {}
+        self.snapshots = SnapshotBuffer()
+        self.remote_inputs = deque()  # (frame, input) from the other player, rollback mode
         self.lock = threading.Lock()
-    
+        self.protocol_version = protocol_version
+        self.send_protocol = protocol.PROTOCOL_JSON  # Until the hello is sent
+        self.reader = protocol.MessageReader()
+        self.transport = transport
+        self.link = link
+        self.udp = None  # UDP socket, once the server has given us a port
+        self.token = None
+        self.udp_lock = threading.Lock()
+        self.channel = udp_transport.PacketChannel()
+        self.inputs = udp_transport.InputWindow(redundancy)  # Our unacknowledged input frames
+        self.input_frame = 0  # Numbers state-sync inputs sent over UDP
+        self.remote_frames = udp_transport.ReceivedFrames()  # Relayed input frames taken
+
     def connect(self):
         try:
             self.client.connect((self.host, self.port))
             self.connected = True
-            
+
             # Start receiving thread
             receive_thread = threading.Thread(target=self.receive_data, daemon=True)
             receive_thread.start()
-            
+
             # Wait for initial game state
             start_time = time.time()
-            while not hasattr(self, 'player_id') and time.time() - start_time < 5:
+            while self.player_id is None and self.connected and time.time() - start_time < 5:
                 time.sleep(0.1)
-                
+
             return self.connected
-            
+
         except Exception as e:
             print(f"Failed to connect to server: {e}")
             return False
-    
+
     def receive_data(self):
         while self.connected:
             try:
-                data = self.client.recv(8192).decode()
-                if not data:
+                # Straight into the reader's buffer; a partial message waits for the next recv
+                if not self.reader.recv_into(self.client):
                     self.connected = False
                     break
-                    
-                messages = data.split('\n')
-                for msg in messages:
-                    if not msg.strip():
-                        continue
-                    try:
-                        message = json.loads(msg)
+
+                try:
+                    for message in self.reader.messages():
                         self.handle_message(message)
-                    except json.JSONDecodeError:
-                        print(f"Invalid JSON: {msg}")
-                        
+                except protocol.ProtocolError as e:
+                    print(f"Invalid message: {e}")
+
             except (ConnectionResetError, ConnectionAbortedError):
                 print("Connection to server lost")
                 self.connected = False
@@ -63,116 +222,192 @@ class NetworkClient:
                 print(f"Error receiving data: {e}")
                 self.connected = False
                 break
-    
+
     def handle_message(self, message):
         if message['type'] == 'init':
-            self.player_id = message['player_id']
             with self.lock:
                 self.game_state = message['game_state']
+            self.snapshots.push(message['game_state'], message.get('server_time'))
+            version = protocol.negotiate(message.get('protocols', ()), (self.protocol_version,))
+            if version != protocol.PROTOCOL_JSON:
+                self.send_data({'type': 'hello', 'protocol': version, 'transport': self.transport})
+                self.send_protocol = version
+            self.player_id = message['player_id']
             print(f"Connected as {self.player_id}")
-            
+
         elif message['type'] == 'game_state':
             with self.lock:
                 self.game_state = message['game_state']
-                
+            self.snapshots.push(message['game_state'], message.get('server_time'))
+
+        elif message['type'] == 'protocol':
+            # Everything after this line comes in the agreed version
+            self.reader.version = message['version']
+            if 'udp_port' in message:
+                self.open_udp(message['udp_port'], message['token'])
+
         elif message['type'] == 'game_start':
+            self.game_started = True
             print("Game started!")
-            
+
+        elif message['type'] == 'input':
+            self.remote_inputs.append((message['frame'], message['input']))
+
         elif message['type'] == 'player_disconnected':
             print(f"{message['player_id']} has disconnected")
             # Handle player disconnection
-            
+
+        elif message['type'] == 'error':
+            # The server turned us away and is closing the connection
+            print(f"Server refused the connection: {message['error']}")
+            self.connected = False
+
+    def open_udp(self, port, token):
+        self.token = token
+        self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp.connect((self.host, port))
+        threading.Thread(target=self.receive_udp, daemon=True).start()
+        # Tells the server where we are; until it hears from us it keeps to TCP
+        self.send_packet()
+        print(f"Using UDP port {port}")
+
+    def receive_udp(self):
+        while self.connected:
+            try:
+                data = self.udp.recv(2048)
+            except ConnectionRefusedError:
+                continue  # An earlier datagram found nobody listening
+            except OSError:
+                break
+            if self.link:
+                self.link(self.handle_datagram, data)
+            else:
+                self.handle_datagram(data)
+
+    def handle_datagram(self, data):
+        if udp_transport.packet_token(data) != self.token:
+            return
+        try:
+            messages = protocol.decode_frames(data, udp_transport.PACKET.size)
+        except protocol.ProtocolError:
+            return
+        with self.udp_lock:
+            newest = self.channel.receive(data)
+            if newest is None:
+                return
+            self.inputs.ack(self.channel.acked_frame)
+        for message in messages:
+            if message['type'] == 'inputs':
+                # The rollback session takes frames in any order
+                for frame, mask, _ in udp_transport.new_inputs(message, self.remote_frames):
+                    self.remote_inputs.append((frame, mask))
+            elif message['type'] != 'game_state' or newest:
+                # A snapshot from a packet that was overtaken is already stale
+                self.handle_message(message)
+
+    def send_packet(self, relay=False):
+        """Send our unacknowledged inputs (and the acks) in a datagram"""
+        with self.udp_lock:
+            data = self.channel.header(self.token, self.inputs.newest()) + self.inputs.record(relay)
+        try:
+            if self.link:
+                self.link(self.udp.send, data)
+            else:
+                self.udp.send(data)
+        except OSError:
+            pass  # Lost like any datagram; the next packet repeats the inputs
+
     def send_data(self, data):
+        if self.udp is not None and data.get('type') is None:
+            if self.channel.received:
+                # A state-sync input: numbered, and repeated until acknowledged
+                with self.udp_lock:
+                    self.inputs.add(self.input_frame, protocol.input_mask(data))
+                    self.input_frame += 1
+                self.send_packet()
+                return
+            # Nothing back over UDP yet: keep knocking, but send the input over TCP
+            self.send_packet()
         if self.connected:
             try:
-                self.client.send((json.dumps(data) + '\n').encode())
+                self.client.sendall(protocol.encode(data, self.send_protocol))
             except:
                 print("Failed to send data to server")
                 self.connected = False
 
-def main():
-    pygame.init()
-    
-    # Initialize network client
-    import argparse
-    parser = argparse.ArgumentParser(description='Game Client')
-    parser.add_argument('--host', type=str, default='localhost', help='Server IP to connect to')
-    parser.add_argument('--port', type=int, default=5555, help='Server port')
-    args = parser.parse_args()
-    
-    client = NetworkClient(host=args.host, port=args.port)
-    if not client.connect():
-        print("Failed to connect to server. Starting in offline mode.")
-        import game
-        game.main()
-        return
-    
-    # Wait until we receive initial game state
-    start_time = time.time()
-    while not hasattr(client, 'player_id') and time.time() - start_time < 5:
-        time.sleep(0.1)
-    
-    if not hasattr(client, 'player_id'):
-        print("Failed to receive initial game state. Starting in offline mode.")
-        import game
-        game.main()
-        return
-    
-    # Game variables
+    def send_input(self, frame, keys):
+        """Send one frame of rollback input; the server relays it to the other player.
+        Over UDP as well when it's up, with TCP as the copy that always arrives."""
+        if self.udp is not None:
+            with self.udp_lock:
+                self.inputs.add(frame, keys)
+            self.send_packet(relay=True)
+        self.send_data({'type': 'input', 'frame': frame, 'input': keys})
+
+def draw_frame(game, status_lines, winner=None):
+    """Draw the arena, both fighters and the HUD, plus status text in the top-left"""
+    game.screen.blit(game.background, (0, 0))
+    game.draw_ground()
+
+    # Determine drawing order based on y-position (player with higher y is in front)
+    if game.player1.rect.bottom < game.player2.rect.bottom:
+        game.player1.draw(game.screen)
+        game.player2.draw(game.screen)
+    else:
+        game.player2.draw(game.screen)
+        game.player1.draw(game.screen)
+
+    game.draw_health_bars()
+    game.draw_controls()
+
+    if winner:
+        text = text_cache.render(winner, 72, WHITE, bold=True)
+        game.screen.blit(text, text.get_rect(center=(simulation.WIDTH // 2, simulation.HEIGHT // 2)))
+
+    for i, (text, color) in enumerate(status_lines):
+        game.screen.blit(text_cache.render(text, 20, color), (10, 60 + i * 22))
+
+    pygame.display.flip()
+
+def run_state_sync(client, game):
+    """Original mode: draw whatever game_state the server sent last"""
     clock = pygame.time.Clock()
     FPS = 60
-    
-    # Create players
-    player1 = None
-    player2 = None
-    
+
     # Game loop
     run = True
     while run:
         clock.tick(FPS)
-        
-        # Get game state
-        with client.lock:
-            game_state = client.game_state.copy()
-        
+
+        # Server state as of a moment ago, interpolated between snapshots
+        game_state = client.snapshots.sample()
+
         # Update players from game state
-        if 'players' in game_state:
-            if player1 is None or player2 is None:
-                # Initialize players
-                player1 = Fighter(200, 0, 'player1')
-                player2 = Fighter(800, 0, 'player2')
-            
-            # Update player1
-            p1_state = game_state['players'].get('player1', {})
-            player1.rect.x = p1_state.get('x', 200)
-            player1.rect.y = p1_state.get('y', 0)
-            player1.health = p1_state.get('health', 100)
-            player1.facing_right = p1_state.get('facing_right', True)
-            player1.is_attacking = p1_state.get('is_attacking', False)
-            player1.animation_frame = p1_state.get('animation_frame', 0)
-            
-            # Update player2
-            p2_state = game_state['players'].get('player2', {})
-            player2.rect.x = p2_state.get('x', 800)
-            player2.rect.y = p2_state.get('y', 0)
-            player2.health = p2_state.get('health', 100)
-            player2.facing_right = p2_state.get('facing_right', False)
-            player2.is_attacking = p2_state.get('is_attacking', False)
-            player2.animation_frame = p2_state.get('animation_frame', 0)
-        
+        if game_state and 'players' in game_state:
+            for fighter, name in ((game.player1, 'player1'), (game.player2, 'player2')):
+                state = game_state['players'].get(name, {})
+                fighter.state.x = state.get('x', fighter.state.x)
+                fighter.state.y = state.get('y', fighter.state.y)
+                fighter.state.health = state.get('health', 100)
+                fighter.state.facing_right = state.get('facing_right', name == 'player1')
+                fighter.state.is_attacking = state.get('is_attacking', False)
+                fighter.state.action = simulation.ACTION_IDS.get(state.get('action'), 0)
+                fighter.state.animation_frame = state.get('animation_frame', 0)
+                fighter.save_position()
+
         # Handle events
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 run = False
-            
+
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     run = False
                 # Add other key events as needed
-        
+
         # Get keyboard state
         keys = pygame.key.get_pressed()
-        
+
         # Prepare player input
         player_input = {}
         if client.player_id == 'player1':
@@ -181,64 +416,167 @@ def main():
                 player_input['move'] = -5
             elif keys[pygame.K_d]:
                 player_input['move'] = 5
-            
+            if keys[pygame.K_w]:
+                player_input['up'] = True
+
             if keys[pygame.K_f]:
                 player_input['action'] = 'punch'
             elif keys[pygame.K_g]:
                 player_input['action'] = 'kick'
             else:
                 player_input['action'] = 'idle'
-                
+
         elif client.player_id == 'player2':
             # Player 2 controls (Arrow keys + L, K)
             if keys[pygame.K_LEFT]:
                 player_input['move'] = -5
             elif keys[pygame.K_RIGHT]:
                 player_input['move'] = 5
-            
+            if keys[pygame.K_UP]:
+                player_input['up'] = True
+
             if keys[pygame.K_l]:
                 player_input['action'] = 'punch'
             elif keys[pygame.K_k]:
                 player_input['action'] = 'kick'
             else:
                 player_input['action'] = 'idle'
-        
+
         # Send input to server
         if client.connected and player_input:
             client.send_data(player_input)
-        
-        # Draw game
-        screen.fill((0, 0, 0))
-        
-        # Draw background
-        draw_bg()
-        
-        # Draw players
-        if player1 and player2:
-            # Determine drawing order based on y-position (player with higher y is in front)
-            if player1.rect.bottom < player2.rect.bottom:
-                player1.draw(screen, scroll)
-                player2.draw(screen, scroll)
-            else:
-                player2.draw(screen, scroll)
-                player1.draw(screen, scroll)
-            
-            # Draw health bars and controls
-            draw_health_bars()
-            draw_controls()
-        
+
         # Draw connection status
-        font = pygame.font.SysFont('Arial', 20)
         status_text = f"Connected as {client.player_id}" if client.connected else "Disconnected"
         status_color = (0, 255, 0) if client.connected else (255, 0, 0)
-        status_surface = font.render(status_text, True, status_color)
-        screen.blit(status_surface, (10, 10))
-        
-        pygame.display.update()
-        
-        # Cap the frame rate
+        stats = client.snapshots.stats()
+        draw_frame(game, [
+            (status_text, status_color),
+            (f"snapshots {stats['depth']} ahead | delay {stats['delay_ms']:.0f} ms | "
+             f"jitter {stats['jitter_ms']:.1f} ms", WHITE),
+            (f"extrapolated {stats['extrapolated']} | held {stats['held']} | late {stats['late']}", WHITE)
+        ])
+
+    print(f"Snapshot buffer: {client.snapshots.stats()}")
+
+def run_rollback(client, game, input_delay, rollback_window, record_path=None):
+    """Rollback mode: simulate locally, predict the remote player, correct on arrival"""
+    clock = pygame.time.Clock()
+    FPS = 60
+
+    local_index = 0 if client.player_id == 'player1' else 1
+    local_fighter = game.player1 if local_index == 0 else game.player2
+    recorder = ReplayRecorder() if record_path else None
+    session = RollbackSession(local_index, input_delay=input_delay, max_rollback=rollback_window,
+                              recorder=recorder)
+
+    # Both peers start counting frames from game_start
+    print("Waiting for the other player...")
+    while not client.game_started and client.connected:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                return
         clock.tick(FPS)
-    
+
+    for frame, keys in session.start_inputs():
+        client.send_input(frame, keys)
+
+    # Counters, refreshed once per second
+    stats_time = time.perf_counter()
+    stats_resimulated = 0
+    resim_per_sec = 0.0
+    stalls = 0
+
+    run = True
+    while run:
+        clock.tick(FPS)
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                run = False
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                run = False
+
+        while client.remote_inputs:
+            frame, keys = client.remote_inputs.popleft()
+            session.add_remote_input(frame, keys)
+
+        # Hold the local frame while the peer is more than the window behind
+        if session.can_advance():
+            keys = local_fighter.read_input(pygame.key.get_pressed())
+            client.send_input(*session.add_local_input(keys))
+        else:
+            stalls += 1
+        session.advance()
+
+        now = time.perf_counter()
+        if now - stats_time >= 1.0:
+            resim_per_sec = (session.resimulated_frames - stats_resimulated) / (now - stats_time)
+            stats_resimulated = session.resimulated_frames
+            stats_time = now
+
+        # Draw the predicted present
+        game.player1.state = session.state.p1
+        game.player2.state = session.state.p2
+        game.player1.save_position()
+        game.player2.save_position()
+
+        stats = session.stats()
+        status_color = (0, 255, 0) if client.connected else (255, 0, 0)
+        draw_frame(game, [
+            (f"{client.player_id} | frame {stats['frame']} | delay {input_delay}", status_color),
+            (f"rollback depth {stats['last_rollback_depth']} (max {stats['max_rollback_depth']})", WHITE),
+            (f"resim {resim_per_sec:.0f} frames/s | stalls {stalls}", WHITE)
+        ], simulation.check_winner(session.state))
+
+    if recorder and recorder.frame_count:
+        recorder.save(record_path)
+
+def main():
+    pygame.init()
+
+    # Initialize network client
+    import argparse
+    parser = argparse.ArgumentParser(description='Game Client')
+    parser.add_argument('--host', type=str, default='localhost', help='Server IP to connect to')
+    parser.add_argument('--port', type=int, default=5555, help='Server port')
+    parser.add_argument('--rollback', action='store_true', help='Simulate locally with rollback netcode')
+    parser.add_argument('--input-delay', type=int, default=2, help='Frames of local input delay (rollback mode)')
+    parser.add_argument('--rollback-window', type=int, default=8, help='Max frames to predict ahead (rollback mode)')
+    parser.add_argument('--record', type=str, default=None, help='Save a replay of the match (rollback mode)')
+    parser.add_argument('--protocol', choices=protocol.PROTOCOL_NAMES, default='binary',
+                        help='Wire format to ask the server for; json is easier to read when debugging')
+    parser.add_argument('--transport', choices=('tcp', 'udp'), default='tcp',
+                        help='Send inputs and get snapshots over UDP, if the server has --udp-port')
+    parser.add_argument('--sim-loss', type=float, default=0.0, help='Drop this fraction of UDP datagrams, both ways')
+    parser.add_argument('--sim-latency', type=float, default=0.0, help='Delay UDP datagrams by this many ms, each way')
+    parser.add_argument('--sim-jitter', type=float, default=0.0, help='Vary that delay by up to this many ms')
+    args = parser.parse_args()
+
+    from game import Game
+    game = Game()
+    game.open_window()
+
+    link = None
+    if args.sim_loss or args.sim_latency or args.sim_jitter:
+        link = udp_transport.LinkSimulator(args.sim_loss, args.sim_latency / 1000, args.sim_jitter / 1000)
+    client = NetworkClient(host=args.host, port=args.port, protocol_version=protocol.PROTOCOL_NAMES[args.protocol],
+                           transport=args.transport, link=link)
+    if not client.connect():
+        print("Failed to connect to server. Starting in offline mode.")
+        game.run()
+        return
+
+    if client.player_id is None:
+        print("Failed to receive initial game state. Starting in offline mode.")
+        game.run()
+        return
+
+    if args.rollback:
+        run_rollback(client, game, args.input_delay, args.rollback_window, args.record)
+    else:
+        run_state_sync(client, game)
+
     # Clean up
     pygame.quit()
     sys.exit()
@@ -1,6 +1,10 @@
+import json
 import os
 import pygame
 
+import simulation
+from sprite_cache import ANIMATIONS, ATLAS_INDEX
+
 def create_sprite_sheet(player_num, output_dir):
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
@@ -87,11 +91,65 @@ def create_sprite_sheet(player_num, output_dir):
         # Save
         pygame.image.save(surf, f"{output_dir}/kick{i}.png")
 
+def build_atlas(folder, max_width=512):
+    """Pack a character's frames into one image plus an index of rects and pivots.
+
+    Frames are read from the per-frame PNGs in `folder`, scaled to the sizes
+    the game draws them at (sprite_cache.ANIMATIONS) and placed on shelves,
+    tallest first. The index maps each action to a list of frames with their
+    rect in the atlas and the pivot (the point placed on the fighter's
+    bottom centre).
+    """
+    frames = []
+    for action, (frame_count, size) in ANIMATIONS.items():
+        name = simulation.ACTION_NAMES[action]
+        for i in range(1, frame_count + 1):
+            frame = pygame.image.load(f"{folder}/{name}{i}.png")
+            frames.append((name, i, pygame.transform.scale(frame, size)))
+
+    # Shelf packing
+    placements = []
+    x = y = shelf_height = 0
+    for name, i, frame in sorted(frames, key=lambda f: -f[2].get_height()):
+        w, h = frame.get_size()
+        if x + w > max_width:
+            x, y = 0, y + shelf_height
+            shelf_height = 0
+        placements.append((name, i, frame, x, y))
+        x += w
+        shelf_height = max(shelf_height, h)
+    width = max(px + frame.get_width() for _, _, frame, px, _ in placements)
+    height = y + shelf_height
+
+    atlas = pygame.Surface((width, height), pygame.SRCALPHA)
+    index = {'version': 1, 'image': 'atlas.png', 'frames': {}}
+    for name, i, frame, px, py in sorted(placements, key=lambda p: (p[0], p[1])):
+        # RGBA_MAX onto the transparent atlas copies the pixels, alpha included, unblended
+        atlas.blit(frame, (px, py), special_flags=pygame.BLEND_RGBA_MAX)
+        w, h = frame.get_size()
+        index['frames'].setdefault(name, []).append(
+            {'x': px, 'y': py, 'w': w, 'h': h, 'pivot': [w // 2, h]})
+
+    pygame.image.save(atlas, os.path.join(folder, index['image']))
+    with open(os.path.join(folder, ATLAS_INDEX), 'w') as f:
+        json.dump(index, f, indent=2)
+    print(f"Wrote {folder}/{index['image']} ({width}x{height}, {len(frames)} frames)")
+
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Generate the fighter sprites')
+    parser.add_argument('--atlas', action='store_true', help='Also pack each character into one atlas image')
+    parser.add_argument('--atlas-only', action='store_true', help='Only rebuild the atlases from the existing PNGs')
+    args = parser.parse_args()
+    
     pygame.init()
     
-    # Create sprites for both players
-    create_sprite_sheet(1, "player1")
-    create_sprite_sheet(2, "player2")
+    if not args.atlas_only:
+        # Create sprites for both players
+        create_sprite_sheet(1, "player1")
+        create_sprite_sheet(2, "player2")
+        print("Sprite sheets created successfully!")
     
-    print("Sprite sheets created successfully!")
+    if args.atlas or args.atlas_only:
+        for folder in simulation.CHARACTER_NAMES:
+            build_atlas(folder)
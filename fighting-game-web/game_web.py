@@ -3,8 +3,12 @@ import sys
 import math
 import random
 import json
+import time
 from js import document, window, WebSocket, setInterval, clearInterval
 from pyodide.ffi import create_proxy
+from presenter import CanvasPresenter
+from profiler import FrameProfiler
+import text_cache
 
 # Game states
 MENU = 0
@@ -33,6 +37,7 @@ canvas = document.getElementById("game-canvas")
 WIDTH, HEIGHT = 1000, 600
 screen = pygame.Surface((WIDTH, HEIGHT))
 pygame_screen = pygame.canvas
+presenter = CanvasPresenter(pygame_screen)
 
 # Colors
 WHITE = (255, 255, 255)
@@ -46,6 +51,31 @@ GRAVITY = 0.8
 JUMP_STRENGTH = -15
 PLAYER_SPEED = 5
 
+# Attack frame data shared with the desktop game. index.html copies
+# frame_data.json into the Pyodide filesystem before this script runs.
+# The web build resolves an attack in a single hit, so the per-tick damage
+# is multiplied by the number of active ticks.
+DEFAULT_ATTACKS = {'punch': ((0, -20, 60, 40), 10), 'kick': ((0, -20, 60, 40), 15)}
+
+def load_attacks(path='frame_data.json'):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except Exception:
+        return {}
+    ticks_per_frame = round(1 / data['animation_speed'])
+    attacks = {}
+    for character, moves in data['characters'].items():
+        attacks[character] = {}
+        for action in DEFAULT_ATTACKS:
+            move = moves[action]
+            box = move['hitbox']
+            active_ticks = (move['active'][1] - move['active'][0] + 1) * ticks_per_frame
+            attacks[character][action] = ((box['x'], box['y'], box['w'], box['h']), move['damage'] * active_ticks)
+    return attacks
+
+CHARACTER_ATTACKS = load_attacks()
+
 # Load assets
 def load_image(name, scale=1):
     try:
@@ -61,6 +91,28 @@ def load_image(name, scale=1):
         surf.fill((random.randint(0, 255), random.randint(0, 255), random.randint(0, 255)))
         return surf
 
+# Sprites per fighter name as {action: (facing right, facing left)}, built once
+# and shared by every Fighter, so drawing never creates a Surface.
+# surfaces_created counts the Surfaces made here.
+SPRITES = {}
+surfaces_created = 0
+
+def load_sprites(name):
+    global surfaces_created
+    if name not in SPRITES:
+        # Simple colored rectangles for web version
+        sprites = {}
+        for action, size, color, other_color in (
+                ('idle', (50, 100), (0, 128, 255), (255, 100, 100)),
+                ('punch', (70, 100), (0, 200, 255), (255, 150, 150)),
+                ('kick', (60, 110), (0, 170, 255), (255, 120, 120))):
+            img = pygame.Surface(size)
+            img.fill(color if name == "player1" else other_color)
+            sprites[action] = (img, pygame.transform.flip(img, True, False))
+            surfaces_created += 2
+        SPRITES[name] = sprites
+    return SPRITES[name]
+
 # Player class
 class Fighter:
     def __init__(self, x, y, controls, name):
@@ -74,18 +126,11 @@ class Fighter:
         self.attack_frame = 0
         self.attack_cooldown = 0
         self.name = name
+        self.character = 'player2' if name in ('player2', 'bot', 'Opponent') else 'player1'
         self.load_animations()
     
     def load_animations(self):
-        # Simple colored rectangles for web version
-        self.idle_img = pygame.Surface((50, 100))
-        self.idle_img.fill((0, 128, 255) if self.name == "player1" else (255, 100, 100))
-        
-        self.punch_img = pygame.Surface((70, 100))
-        self.punch_img.fill((0, 200, 255) if self.name == "player1" else (255, 150, 150))
-        
-        self.kick_img = pygame.Surface((60, 110))
-        self.kick_img.fill((0, 170, 255) if self.name == "player1" else (255, 120, 120))
+        self.sprites = load_sprites(self.name)
     
     def move(self, target):
         # Movement logic here (simplified for web)
@@ -127,14 +172,16 @@ class Fighter:
             self.attack_type = attack_type
             
             # Check if attack hits
+            (offset_x, offset_y, width, height), damage = \
+                CHARACTER_ATTACKS.get(self.character, DEFAULT_ATTACKS)[attack_type]
             attack_rect = pygame.Rect(
-                self.rect.right if self.facing_right else self.rect.left - 60,
-                self.rect.centery - 20,
-                60, 40
+                self.rect.right + offset_x if self.facing_right else self.rect.left - offset_x - width,
+                self.rect.centery + offset_y,
+                width, height
             )
             
             if attack_rect.colliderect(target.rect):
-                target.health -= 10 if attack_type == 'punch' else 15
+                target.health -= damage
                 target.health = max(0, target.health)
                 
             self.attack_cooldown = 20
@@ -151,18 +198,12 @@ class Fighter:
         self.move(target)
     
     def draw(self, surface, scroll):
-        # Draw character
+        # Draw character, pre-flipped for the facing
         if self.is_attacking:
-            if self.attack_type == 'punch':
-                img = self.punch_img
-            else:
-                img = self.kick_img
+            action = 'punch' if self.attack_type == 'punch' else 'kick'
         else:
-            img = self.idle_img
-        
-        # Flip image if facing left
-        if not self.facing_right:
-            img = pygame.transform.flip(img, True, False)
+            action = 'idle'
+        img = self.sprites[action][0 if self.facing_right else 1]
         
         surface.blit(img, (self.rect.x - scroll[0], self.rect.y - scroll[1]))
         
@@ -252,30 +293,27 @@ def draw_menu():
     global online_players, challenged, game_state
     
     screen.fill((30, 30, 40))
-    font = pygame.font.SysFont(None, 64)
-    title = font.render("SHADOW FIGHTERS", True, (255, 255, 255))
+    title = text_cache.render("SHADOW FIGHTERS", 64, (255, 255, 255), name=None)
     screen.blit(title, (WIDTH//2 - title.get_width()//2, 80))
     
     # Online players counter
-    online_text = font.render(f"ONLINE: {online_players}", True, (100, 200, 255))
+    online_text = text_cache.render(f"ONLINE: {online_players}", 64, (100, 200, 255), name=None)
     screen.blit(online_text, (WIDTH//2 - online_text.get_width()//2, 150))
     
-    font = pygame.font.SysFont(None, 36)
-    
     # Game mode selection
-    mode_title = font.render("SELECT GAME MODE:", True, (255, 255, 200))
+    mode_title = text_cache.render("SELECT GAME MODE:", 36, (255, 255, 200), name=None)
     screen.blit(mode_title, (WIDTH//2 - mode_title.get_width()//2, 240))
     
     # VS BOT option
     vs_bot_color = (100, 255, 100) if vs_bot else (200, 200, 200)
     vs_bot_text = "[X] VS BOT" if vs_bot else "[ ] VS BOT"
-    mode_text = font.render(vs_bot_text, True, vs_bot_color)
+    mode_text = text_cache.render(vs_bot_text, 36, vs_bot_color, name=None)
     screen.blit(mode_text, (WIDTH//2 - mode_text.get_width()//2, 290))
     
     # VS FRIEND option
     vs_friend_color = (100, 255, 100) if not vs_bot else (200, 200, 200)
     vs_friend_text = "[X] VS FRIEND" if not vs_bot else "[ ] VS FRIEND"
-    friend_text = font.render(vs_friend_text, True, vs_friend_color)
+    friend_text = text_cache.render(vs_friend_text, 36, vs_friend_color, name=None)
     screen.blit(friend_text, (WIDTH//2 - friend_text.get_width()//2, 330))
     
     # Online options (only in VS FRIEND mode)
@@ -283,13 +321,13 @@ def draw_menu():
         # Challenge button
         challenge_color = (255, 200, 100) if not challenged else (100, 255, 100)
         challenge_text = "[C] CHALLENGE RANDOM PLAYER" if not challenged else "[C] SEARCHING FOR OPPONENT..."
-        challenge_render = font.render(challenge_text, True, challenge_color)
+        challenge_render = text_cache.render(challenge_text, 36, challenge_color, name=None)
         screen.blit(challenge_render, (WIDTH//2 - challenge_render.get_width()//2, 380))
         
         # Online status
         online_status = "ONLINE" if player_id else "OFFLINE"
         status_color = (100, 255, 100) if player_id else (255, 100, 100)
-        status_text = font.render(f"Status: {online_status}", True, status_color)
+        status_text = text_cache.render(f"Status: {online_status}", 36, status_color, name=None)
         screen.blit(status_text, (WIDTH - 150, 20))
     
     # Instructions
@@ -300,31 +338,27 @@ def draw_menu():
     ]
     
     for i, text in enumerate(instructions):
-        inst_text = font.render(text, True, (180, 180, 180))
+        inst_text = text_cache.render(text, 36, (180, 180, 180), name=None)
         screen.blit(inst_text, (WIDTH//2 - inst_text.get_width()//2, 450 + i * 30))
     
-    pygame_screen.blit(pygame.transform.scale(screen, (canvas.width, canvas.height)), (0, 0))
-    pygame.display.flip()
+    present()
 
 def draw_game_over(winner):
     screen.fill((30, 30, 40))
-    font = pygame.font.SysFont(None, 64)
     if winner == 1:
-        text = font.render("PLAYER 1 WINS!", True, (100, 255, 100))
+        text = text_cache.render("PLAYER 1 WINS!", 64, (100, 255, 100), name=None)
     else:
-        text = font.render("PLAYER 2 WINS!" if not vs_bot else "BOT WINS!", True, (255, 100, 100))
+        text = text_cache.render("PLAYER 2 WINS!" if not vs_bot else "BOT WINS!", 64, (255, 100, 100), name=None)
     
     screen.blit(text, (WIDTH//2 - text.get_width()//2, 200))
     
-    font = pygame.font.SysFont(None, 36)
-    restart_text = font.render("Press R to restart", True, (200, 200, 200))
-    menu_text = font.render("Press M for menu", True, (200, 200, 200))
+    restart_text = text_cache.render("Press R to restart", 36, (200, 200, 200), name=None)
+    menu_text = text_cache.render("Press M for menu", 36, (200, 200, 200), name=None)
     
     screen.blit(restart_text, (WIDTH//2 - restart_text.get_width()//2, 300))
     screen.blit(menu_text, (WIDTH//2 - menu_text.get_width()//2, 350))
     
-    pygame_screen.blit(pygame.transform.scale(screen, (canvas.width, canvas.height)), (0, 0))
-    pygame.display.flip()
+    present()
 
 # Game loop
 def create_online_players():
@@ -360,6 +394,25 @@ def create_online_players():
     
     input_send_interval = setInterval(create_proxy(send_input_updates), 50)  # 20 updates per second
 
+# Frame profiler: F3 toggles the overlay, F4 downloads a Chrome trace
+profiler = FrameProfiler(('events', 'update', 'draw', 'overlay', 'scale', 'flip', 'wait'))
+
+def present():
+    """Scale the finished frame onto the canvas and flip, timing both"""
+    # Screens without their own marks (menu, game over) count as drawing up to here
+    profiler.mark('draw')
+    presenter.present(screen, (canvas.width, canvas.height))
+    profiler.mark('scale')
+    pygame.display.flip()
+    profiler.mark('flip')
+
+def download_profile():
+    trace = json.dumps(profiler.chrome_trace())
+    link = document.createElement('a')
+    link.href = 'data:application/json,' + window.encodeURIComponent(trace)
+    link.download = time.strftime('profile-%Y%m%d-%H%M%S.json')
+    link.click()
+
 def game_loop():
     global game_state, player1, player2, vs_bot, match_id, player_number
     clock = pygame.time.Clock()
@@ -407,24 +460,29 @@ def game_loop():
             player1.draw(screen, scroll)
         
         # Draw HUD
-        font = pygame.font.SysFont(None, 36)
-        p1_text = font.render(f"P1: {player1.health}", True, (255, 255, 255))
-        p2_text = font.render(f"P2: {player2.health}", True, (255, 255, 255))
+        p1_text = text_cache.render(f"P1: {player1.health}", 36, (255, 255, 255), name=None)
+        p2_text = text_cache.render(f"P2: {player2.health}", 36, (255, 255, 255), name=None)
         screen.blit(p1_text, (20, 20))
         screen.blit(p2_text, (WIDTH - 100, 20))
         
         # Draw to canvas
-        pygame_screen.blit(pygame.transform.scale(screen, (canvas.width, canvas.height)), (0, 0))
-        pygame.display.flip()
+        present()
     
     # Main game loop
     while True:
+        profiler.begin_frame()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 return
             
             if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_F3:
+                    profiler.overlay = not profiler.overlay
+                    profiler.enabled = profiler.enabled or profiler.overlay
+                if event.key == pygame.K_F4 and profiler.enabled:
+                    download_profile()
+                
                 if game_state == MENU:
                     if event.key == pygame.K_RETURN:
                         if not vs_bot and challenged:
@@ -472,6 +530,8 @@ def game_loop():
                     elif event.key == pygame.K_m:  # Back to menu
                         game_state = MENU
         
+        profiler.mark('events')
+        
         if game_state == MENU:
             draw_menu()
         
@@ -497,6 +557,7 @@ def game_loop():
             elif player2.health <= 0:
                 game_state = GAME_OVER
                 winner = 1
+            profiler.mark('update')
             
             # Draw game
             screen.fill((50, 50, 50))
@@ -510,25 +571,26 @@ def game_loop():
                 player1.draw(screen, scroll)
             
             # Draw HUD
-            font = pygame.font.SysFont(None, 36)
-            p1_text = font.render(f"P1: {player1.health}", True, (255, 255, 255))
-            p2_text = font.render(f"BOT: {player2.health}" if vs_bot else f"P2: {player2.health}", True, (255, 255, 255))
+            p1_text = text_cache.render(f"P1: {player1.health}", 36, (255, 255, 255), name=None)
+            p2_text = text_cache.render(f"BOT: {player2.health}" if vs_bot else f"P2: {player2.health}", 36, (255, 255, 255), name=None)
             screen.blit(p1_text, (20, 20))
             screen.blit(p2_text, (WIDTH - 100, 20))
+            profiler.mark('draw')
+            
+            profiler.draw_overlay(screen)
+            profiler.mark('overlay')
             
-            pygame_screen.blit(pygame.transform.scale(screen, (canvas.width, canvas.height)), (0, 0))
-            pygame.display.flip()
+            present()
         
         elif game_state == ONLINE_MATCHMAKING:
             screen.fill((30, 30, 40))
-            font = pygame.font.SysFont(None, 48)
             
             # Animated dots
             dots = "." * ((pygame.time.get_ticks() // 500) % 4)
             
-            waiting_text = font.render(f"Searching for opponent{dots}", True, (255, 255, 255))
-            players_text = font.render(f"Online players: {online_players}", True, (200, 200, 255))
-            cancel_text = font.render("Press ESC to cancel", True, (200, 200, 200))
+            waiting_text = text_cache.render(f"Searching for opponent{dots}", 48, (255, 255, 255), name=None)
+            players_text = text_cache.render(f"Online players: {online_players}", 48, (200, 200, 255), name=None)
+            cancel_text = text_cache.render("Press ESC to cancel", 48, (200, 200, 200), name=None)
             
             screen.blit(waiting_text, (WIDTH//2 - waiting_text.get_width()//2, 200))
             screen.blit(players_text, (WIDTH//2 - players_text.get_width()//2, 270))
@@ -540,8 +602,7 @@ def game_loop():
                 vs_bot = False
                 create_online_players()
             
-            pygame_screen.blit(pygame.transform.scale(screen, (canvas.width, canvas.height)), (0, 0))
-            pygame.display.flip()
+            present()
             
         elif game_state == ONLINE_PLAYING:
             # Similar to regular playing state but with network synchronization
@@ -593,17 +654,15 @@ def game_loop():
                 player1.draw(screen, scroll)
             
             # Draw HUD with ping
-            font = pygame.font.SysFont(None, 36)
-            p1_text = font.render(f"YOU: {player1.health}", True, (255, 255, 255))
-            p2_text = font.render(f"OPPONENT: {player2.health}", True, (255, 255, 255))
-            ping_text = font.render("PING: 42ms", True, (200, 200, 200))
+            p1_text = text_cache.render(f"YOU: {player1.health}", 36, (255, 255, 255), name=None)
+            p2_text = text_cache.render(f"OPPONENT: {player2.health}", 36, (255, 255, 255), name=None)
+            ping_text = text_cache.render("PING: 42ms", 36, (200, 200, 200), name=None)
             
             screen.blit(p1_text, (20, 20))
             screen.blit(p2_text, (WIDTH - 200, 20))
             screen.blit(ping_text, (WIDTH//2 - ping_text.get_width()//2, 20))
             
-            pygame_screen.blit(pygame.transform.scale(screen, (canvas.width, canvas.height)), (0, 0))
-            pygame.display.flip()
+            present()
             
             # Check for game over
             if player1.health <= 0 or player2.health <= 0:
@@ -613,8 +672,11 @@ def game_loop():
             
         elif game_state == GAME_OVER:
             draw_game_over(winner)
+        profiler.mark('draw')
         
         clock.tick(60)
+        profiler.mark('wait')
+        profiler.end_frame()
 
 # Initialize networking
 connect_to_server()
@@ -0,0 +1,84 @@
+"""Font and rendered-text cache.
+
+pygame.font.SysFont() scans the system font list on every call, and most HUD
+strings are the same from one frame to the next, so both fonts and rendered
+text surfaces are kept in small LRU caches:
+
+    text_cache.font('Arial', 24, bold=True)             -> pygame.font.Font
+    text_cache.render("Press R to restart", 36, WHITE)  -> pygame.Surface
+
+Cached surfaces are shared between callers, so blit them but don't draw on
+them. Both caches are bounded; the least recently used entry is dropped when
+one is full. stats() reports hits, misses and evictions.
+"""
+from collections import OrderedDict
+
+import pygame
+
+
+class TextCache:
+    def __init__(self, max_fonts=32, max_surfaces=256):
+        self.max_fonts = max_fonts
+        self.max_surfaces = max_surfaces
+        self._fonts = OrderedDict()
+        self._surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def font(self, name, size, bold=False, italic=False):
+        """pygame.font.SysFont(name, size, bold, italic), looked up once per combination"""
+        if (name, size, bold, italic) in self._fonts:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return self._font(name, size, bold, italic)
+
+    def _font(self, name, size, bold, italic):
+        """font() without counting, for render()'s own misses"""
+        key = (name, size, bold, italic)
+        font = self._fonts.get(key)
+        if font is not None:
+            self._fonts.move_to_end(key)
+            return font
+        font = pygame.font.SysFont(name, size, bold=bold, italic=italic)
+        self._fonts[key] = font
+        if len(self._fonts) > self.max_fonts:
+            self._fonts.popitem(last=False)
+            self.evictions += 1
+        return font
+
+    def render(self, text, size, color, name='Arial', bold=False, italic=False, antialias=True):
+        """Rendered text surface, re-rendered only the first time it is asked for"""
+        key = (name, size, bold, italic, text, tuple(color), antialias)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        surface = self._font(name, size, bold, italic).render(text, antialias, color)
+        self.misses += 1
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_surfaces:
+            self._surfaces.popitem(last=False)
+            self.evictions += 1
+        return surface
+
+    def clear(self):
+        """Drop everything, e.g. after pygame.font.quit() invalidated the fonts"""
+        self._fonts.clear()
+        self._surfaces.clear()
+
+    def stats(self):
+        return {
+            'fonts': len(self._fonts), 'surfaces': len(self._surfaces),
+            'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions
+        }
+
+
+# Shared by everything that draws text
+_cache = TextCache()
+font = _cache.font
+render = _cache.render
+clear = _cache.clear
+stats = _cache.stats
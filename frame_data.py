@@ -0,0 +1,51 @@
+"""Frame data for every character's moves, loaded from frame_data.json.
+
+Per action: `frames` is the animation length, `active` the inclusive range of
+animation frames on which the hitbox is live, `hitbox` is offset from the
+fighter's front edge (x) and vertical centre (y), `damage` is applied on every
+active tick that connects and `hitstop` is how many ticks of slow motion a hit
+causes.
+
+The desktop game, the servers and the batch simulator all read the same file;
+the web builds get a copy written into the Pyodide filesystem by index.html.
+"""
+import json
+import os
+
+FRAME_DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'frame_data.json')
+
+
+def load(path=FRAME_DATA_FILE):
+    with open(path) as f:
+        return json.load(f)
+
+
+def build_tables(data, action_names):
+    """Flatten the JSON into per-character tuples indexed by action id.
+
+    Returns (character_names, frames, moves) where frames[c][a] is the
+    animation length and moves[c][a] is None for a non-attack, otherwise
+    (active_start, active_end, x, y, w, h, damage, hitstop).
+    """
+    character_names = tuple(data['characters'])
+    frames = []
+    moves = []
+    for name in character_names:
+        actions = data['characters'][name]
+        char_frames = []
+        char_moves = []
+        for action in action_names:
+            move = actions[action]
+            char_frames.append(move['frames'])
+            if 'hitbox' in move:
+                box = move['hitbox']
+                char_moves.append((
+                    move['active'][0], move['active'][1],
+                    box['x'], box['y'], box['w'], box['h'],
+                    move['damage'], move['hitstop']
+                ))
+            else:
+                char_moves.append(None)
+        frames.append(tuple(char_frames))
+        moves.append(tuple(char_moves))
+    return character_names, tuple(frames), tuple(moves)
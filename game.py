@@ -1,32 +1,30 @@
+import time
+IMPORT_START = time.perf_counter()  # For Game.print_startup()
+
 import pygame
 import sys
-import socket
-import json
 import threading
-import time
+
+import asset_pack
+import simulation
+import text_cache
+from profiler import FrameProfiler
+from replay import ReplayRecorder, numbered_path
+from sprite_cache import sprites
+from simulation import (
+    WIDTH, HEIGHT, SLOW_MO_FACTOR, FIGHTER_WIDTH, FIGHTER_HEIGHT,
+    ACTION_NAMES, ACTION_IDS, INPUT_LEFT, INPUT_RIGHT, INPUT_UP, INPUT_PUNCH, INPUT_KICK
+)
 
 # Constants
-WIDTH, HEIGHT = 1000, 600
-FPS = 60
+FPS = 60  # Simulation rate; the simulation always advances in 1/FPS steps
+MAX_RENDER_FPS = 120  # Render cap, 0 renders as fast as possible
+SIM_DT = 1.0 / FPS
+MAX_CATCH_UP_STEPS = 5  # Max simulation steps per rendered frame before dropping time
+MAX_FRAME_TIME = 0.25  # Longer hitches (window drag, breakpoint) are clamped to this
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
-GRAVITY = 0.8
-JUMP_STRENGTH = -15
-PLAYER_SPEED = 5
-
-# Slow motion settings
-SLOW_MO_FACTOR = 0.5  # 50% speed
-MAX_SLOW_MO_FRAMES = 20  # Duration of slow motion in frames
-slow_mo_timer = 0
 
-# Create the game window
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Shadow Fighters")
-clock = pygame.time.Clock()
-
-# Load and scale background image
-background = pygame.image.load('background.jpg').convert()
-background = pygame.transform.scale(background, (WIDTH, HEIGHT))
 
 def load_animation_frames(base_path, action, frame_count, size=(80, 120)):
     """Load animation frames for a specific action"""
@@ -44,418 +42,711 @@ def load_animation_frames(base_path, action, frame_count, size=(80, 120)):
     return frames
 
 class Fighter:
-    def __init__(self, x, y, controls, image_file):
-        # Load player image
-        try:
-            self.original_image = pygame.image.load(image_file).convert_alpha()
-        except:
-            # Create a placeholder if image fails to load
-            self.original_image = pygame.Surface((80, 120), pygame.SRCALPHA)
-            pygame.draw.rect(self.original_image, (200, 200, 200), (0, 0, 80, 120))
-            
-        self.image = pygame.transform.scale(self.original_image, (80, 120))
-        self.rect = self.image.get_rect()
-        self.rect.x = x
-        self.rect.y = y
-        self.vel_y = 0
-        self.jumping = False
-        self.health = 100
+    def __init__(self, x, y, controls, image_file, character=0):
         self.controls = controls
-        self.facing_right = True if x < WIDTH // 2 else False
-        self.attack_rect = pygame.Rect(0, 0, 60, 40)
-        
-        # Animation states
-        self.current_action = "idle"
-        self.animation_frame = 0
-        self.animation_speed = 0.2
-        self.animation_cooldown = 0
-        
-        # Create animation frames
-        self.animations = {
-            "idle": self._create_animation_frames("idle", 2, (80, 120)),
-            "punch": self._create_animation_frames("punch", 3, (100, 120)),
-            "kick": self._create_animation_frames("kick", 3, (100, 140))
-        }
-        
-        # Set initial image
-        self.image = self.animations["idle"][0]
-        self.rect = self.image.get_rect()
-        self.rect.x = x
-        self.rect.y = y
-        
-        # Attack properties
-        self.is_attacking = False
-        self.attack_frame_active = False
-
-    def update_animation(self, other_player):
-        """Update the current animation frame and handle attack logic"""
-        global slow_mo_timer
-        self.animation_cooldown += self.animation_speed
-        
-        # Update attack state based on current frame
-        if self.current_action == "punch" and 1 <= int(self.animation_frame) < 2:
-            self.attack_frame_active = True
-            # Set attack hitbox
-            self.attack_rect = pygame.Rect(
-                self.rect.right if self.facing_right else self.rect.left - 60,
-                self.rect.centery - 20,
-                60, 40
-            )
-            # Check for hit
-            if self.attack_rect.colliderect(other_player.rect) and not other_player.is_attacking:
-                other_player.health = max(0, other_player.health - 2)  # Reduced from 5 to 2
-                slow_mo_timer = MAX_SLOW_MO_FRAMES
-        elif self.current_action == "kick" and 1 <= int(self.animation_frame) < 2:
-            self.attack_frame_active = True
-            # Set kick hitbox
-            self.attack_rect = pygame.Rect(
-                self.rect.right if self.facing_right else self.rect.left - 70,
-                self.rect.centery - 20,
-                70, 45
-            )
-            # Check for hit 
-            if self.attack_rect.colliderect(other_player.rect) and not other_player.is_attacking:
-                other_player.health = max(0, other_player.health - 3)  # Reduced from 8 to 3
-                slow_mo_timer = MAX_SLOW_MO_FRAMES
-        else:
-            self.attack_frame_active = False
-        
-        # Update animation frame
-        if self.animation_cooldown >= 1:
-            self.animation_cooldown = 0
-            self.animation_frame += 1
-            
-            # Check if animation is complete
-            if self.current_action != "idle" and self.animation_frame >= len(self.animations[self.current_action]):
-                self.current_action = "idle"
-                self.animation_frame = 0
-                self.is_attacking = False
-    
-    def move(self, other_player):
-        global slow_mo_timer
-        dx = 0
-        dy = 0
-        keys = pygame.key.get_pressed()
         
-        # Movement - only if not in the middle of an attack
-        if self.current_action == "idle":
-            if keys[self.controls['left']]:
-                dx = -PLAYER_SPEED
-                self.facing_right = False
-            if keys[self.controls['right']]:
-                dx = PLAYER_SPEED
-                self.facing_right = True
-                
-        # Jumping
-        if keys[self.controls['up']] and not self.jumping and self.current_action == "idle":
-            self.vel_y = JUMP_STRENGTH
-            self.jumping = True
-            
-        # Apply gravity
-        self.vel_y += GRAVITY
-        dy += self.vel_y
-        
-        # Handle attacks
-        if self.current_action == "idle":
-            if keys[self.controls['punch']]:
-                self.current_action = "punch"
-                self.animation_frame = 0
-                self.is_attacking = True
-            elif keys[self.controls['kick']]:
-                self.current_action = "kick"
-                self.animation_frame = 0
-                self.is_attacking = True
+        # Simulation state (position, health, action, animation timers)
+        self.state = simulation.FighterState(x, y, character=character)
+        # Position before the last simulation step, for render interpolation
+        self.prev_x = x
+        self.prev_y = y
         
-        # Update position with collision detection
-        if 0 <= self.rect.x + dx <= WIDTH - self.rect.width:
-            self.rect.x += dx
-            
-        # Ground collision
-        if self.rect.bottom + dy > HEIGHT - 50:
-            self.rect.bottom = HEIGHT - 50
-            self.vel_y = 0
-            self.jumping = False
-        else:
-            self.rect.y += dy
-            
-        # Update animation
-        self.update_animation(other_player)
+        # Animation frames for both facings come from the shared sprite cache,
+        # loaded the first time they are drawn (image_file is unused)
 
-    def _create_animation_frames(self, action, frame_count, size):
-        """Create animation frames for a specific action"""
-        frames = []
-        player_folder = 'player1' if '1' in str(type(self)) else 'player2'
-        
-        try:
-            # Try to load the actual sprite frames
-            for i in range(1, frame_count + 1):
-                frame_path = f"{player_folder}/{action}{i}.png"
-                frame = pygame.image.load(frame_path).convert_alpha()
-                frame = pygame.transform.scale(frame, size)
-                frames.append(frame)
-        except Exception as e:
-            print(f"Error loading {action} frames: {e}")
-            # Fallback to simple colored rectangles if loading fails
-            for i in range(frame_count):
-                frame = pygame.Surface(size, pygame.SRCALPHA)
-                color = (255, 0, 0) if '1' in player_folder else (0, 0, 255)
-                pygame.draw.rect(frame, color, (0, 0, size[0], size[1]))
-                frames.append(frame)
-                
-        return frames
-        
-    def draw(self, surface):
-        # Get the current animation frame
-        frame_index = int(self.animation_frame) % len(self.animations[self.current_action])
-        current_frame = self.animations[self.current_action][frame_index].copy()
+    # Simulation state lives in self.state; these keep the old attribute names working
+    @property
+    def rect(self):
+        """A copy: moving it doesn't move the fighter, set state.x / state.y for that"""
+        return pygame.Rect(self.state.x, self.state.y, FIGHTER_WIDTH, FIGHTER_HEIGHT)
+
+    @property
+    def health(self):
+        return self.state.health
+
+    @health.setter
+    def health(self, value):
+        self.state.health = value
+
+    @property
+    def facing_right(self):
+        return self.state.facing_right
+
+    @facing_right.setter
+    def facing_right(self, value):
+        self.state.facing_right = value
+
+    @property
+    def is_attacking(self):
+        return self.state.is_attacking
+
+    @is_attacking.setter
+    def is_attacking(self, value):
+        self.state.is_attacking = value
+
+    @property
+    def current_action(self):
+        return ACTION_NAMES[self.state.action]
+
+    @property
+    def animation_frame(self):
+        return self.state.animation_frame
+
+    def save_position(self):
+        """Remember the current position as the interpolation start point"""
+        self.prev_x = self.state.x
+        self.prev_y = self.state.y
+
+    def render_rect(self, alpha=1.0):
+        """Collision rect placed between the previous and current step by alpha"""
+        x = self.prev_x + (self.state.x - self.prev_x) * alpha
+        y = self.prev_y + (self.state.y - self.prev_y) * alpha
+        return pygame.Rect(round(x), round(y), FIGHTER_WIDTH, FIGHTER_HEIGHT)
+
+    def read_input(self, keys):
+        """Turn the pressed keys into this fighter's simulation input bitmask"""
+        mask = 0
+        if keys[self.controls['left']]:
+            mask |= INPUT_LEFT
+        if keys[self.controls['right']]:
+            mask |= INPUT_RIGHT
+        if keys[self.controls['up']]:
+            mask |= INPUT_UP
+        if keys[self.controls['punch']]:
+            mask |= INPUT_PUNCH
+        if keys[self.controls['kick']]:
+            mask |= INPUT_KICK
+        return mask
+
+    def layout(self, alpha=1.0):
+        """Current animation frame (already flipped the right way), where it goes, and the body rect"""
+        rect = self.render_rect(alpha)
+        state = self.state
+        frames = sprites.frames(state.character, state.action, state.facing_right)
+        index = state.animation_frame % len(frames)
+        current_frame = frames[index]
+        pivot_x, pivot_y = sprites.pivots(state.character, state.action, state.facing_right)[index]
+        draw_rect = pygame.Rect(rect.centerx - pivot_x, rect.bottom - pivot_y, *current_frame.get_size())
+        return current_frame, draw_rect, rect
+    
+    def bounds(self, alpha=1.0):
+        """Screen area draw() touches: the sprite plus the small health bar above it"""
+        _, draw_rect, rect = self.layout(alpha)
+        return draw_rect.union((rect.x, rect.y - 15, 80, 5))
+    
+    def draw(self, surface, alpha=1.0):
+        current_frame, draw_rect, rect = self.layout(alpha)
         
-        # Flip the frame if facing left
-        if not self.facing_right:
-            current_frame = pygame.transform.flip(current_frame, True, False)
-            
         # Draw the current frame
-        draw_rect = current_frame.get_rect(midbottom=self.rect.midbottom)
         surface.blit(current_frame, draw_rect)
         
         # Draw health bar
         health_bar_width = 80
         health_ratio = self.health / 100
-        health_bar = pygame.Rect(self.rect.x, self.rect.y - 15, health_bar_width * health_ratio, 5)
-        health_bar_outline = pygame.Rect(self.rect.x, self.rect.y - 15, health_bar_width, 5)
+        health_bar = pygame.Rect(rect.x, rect.y - 15, health_bar_width * health_ratio, 5)
+        health_bar_outline = pygame.Rect(rect.x, rect.y - 15, health_bar_width, 5)
         pygame.draw.rect(surface, (255, 0, 0), health_bar)
         pygame.draw.rect(surface, (255, 255, 255), health_bar_outline, 1)
     
     # Health text is now handled by draw_health_bars()
 
-def draw_ground():
-    pygame.draw.rect(screen, (50, 50, 50), (0, HEIGHT - 50, WIDTH, 50))
+def draw_ground(surface):
+    pygame.draw.rect(surface, (50, 50, 50), (0, HEIGHT - 50, WIDTH, 50))
 
-def draw_controls():
-    font = pygame.font.SysFont('Arial', 24, bold=True)
-    controls1 = font.render("P1: WASD - Move | F - Punch | G - Kick", True, WHITE)
-    controls2 = font.render("P2: Arrows - Move | K - Punch | L - Kick", True, WHITE)
+def draw_controls(surface):
+    controls1 = text_cache.render("P1: WASD - Move | F - Punch | G - Kick", 24, WHITE, bold=True)
+    controls2 = text_cache.render("P2: Arrows - Move | K - Punch | L - Kick", 24, WHITE, bold=True)
     # Position controls at the bottom with more padding
-    screen.blit(controls1, (20, HEIGHT - 40))
-    screen.blit(controls2, (WIDTH - 400, HEIGHT - 40))
-
-# Add these at the top with other variables
-global p1_health_smooth, p2_health_smooth, p1_health_prev, p2_health_prev
-if 'p1_health_smooth' not in globals():
-    p1_health_smooth = 100.0
-    p2_health_smooth = 100.0
-    p1_health_prev = 100
-    p2_health_prev = 100
-
-def draw_health_bars():
-    global p1_health_smooth, p2_health_smooth, p1_health_prev, p2_health_prev
-    
-    # Smooth health decrease effect
-    smooth_speed = 0.2
-    p1_health_smooth += (player1.health - p1_health_smooth) * smooth_speed
-    p2_health_smooth += (player2.health - p2_health_smooth) * smooth_speed
-    
-    # Flash white when taking damage
-    p1_flash = abs(player1.health - p1_health_prev) > 0.1
-    p2_flash = abs(player2.health - p2_health_prev) > 0.1
-    
-    # Update previous health values
-    p1_health_prev = player1.health
-    p2_health_prev = player2.health
-    
-    # Draw health bar backgrounds with flash effect
-    bg_color1 = (255, 200, 200) if p1_flash else (80, 0, 0)
-    bg_color2 = (255, 200, 200) if p2_flash else (80, 0, 0)
-    
-    # P1 Health Bar
-    pygame.draw.rect(screen, bg_color1, (50, 20, 400, 30))  # Background with flash
-    
-    # P1 Health gradient
-    health_ratio1 = player1.health / 100.0
-    for i in range(int(400 * health_ratio1)):
-        # Gradient from green to yellow to red
-        if health_ratio1 > 0.5:
-            g = 255
-            r = int(510 * (1 - health_ratio1))
+    surface.blit(controls1, (20, HEIGHT - 40))
+    surface.blit(controls2, (WIDTH - 400, HEIGHT - 40))
+
+class HealthBarHUD:
+    """Health bars and P1/P2 labels.
+
+    The glow rings and labels never change, so they are rendered once and
+    re-blitted; per frame only the fill and the damage trail are drawn.
+    """
+    BAR_WIDTH, BAR_HEIGHT = 400, 30
+    SMOOTH_SPEED = 0.2
+
+    def __init__(self):
+        self.bar_x = (50, WIDTH - 450)
+        self.label_x = (10, WIDTH - 30)
+        self.health_smooth = [100.0, 100.0]
+        self.health_prev = [100, 100]
+        self.layout = None
+        self.glows = None
+        self.labels = None
+
+    def _build(self):
+        # The three glow rings around a bar, widest outermost. They don't
+        # overlap, so they share one surface, and only its four edges (the
+        # rest is transparent) are kept for blitting. The screen has no alpha
+        # channel, so the border is plain white whether or not the bar flashes.
+        pad = 6
+        width, height = self.BAR_WIDTH + pad*2, self.BAR_HEIGHT + pad*2
+        glow_surf = pygame.Surface((width, height), pygame.SRCALPHA)
+        for i in range(1, 4):
+            offset = pad - i*2
+            pygame.draw.rect(glow_surf, (255, 255, 255, 50//i),
+                             (offset, offset, self.BAR_WIDTH + i*4, self.BAR_HEIGHT + i*4), 2)
+        self.glows = [
+            (glow_surf.subsurface((x, y, w, h)), (x - pad, y - pad))
+            for x, y, w, h in ((0, 0, width, pad), (0, height - pad, width, pad),
+                               (0, pad, pad, self.BAR_HEIGHT), (width - pad, pad, pad, self.BAR_HEIGHT))
+        ]
+
+        self.labels = [text_cache.render(text, 24, (255, 255, 255, 200), bold=True) for text in ("P1", "P2")]
+
+    def update(self, health):
+        """Advance the smoothing and flash for this frame's health values.
+
+        Returns True if the bars look different from the last update.
+        """
+        layout = []
+        for side in (0, 1):
+            x = self.bar_x[side]
+            hp = health[side]
+
+            # Smooth health decrease effect
+            self.health_smooth[side] += (hp - self.health_smooth[side]) * self.SMOOTH_SPEED
+            smooth = self.health_smooth[side]
+
+            # Health fill, green to yellow to red as health drops
+            health_ratio = hp / 100.0
+            if health_ratio > 0.5:
+                color = (int(510 * (1 - health_ratio)), 255, 0)
+            else:
+                color = (255, int(510 * health_ratio), 0)
+            fill = max(0, int(self.BAR_WIDTH * health_ratio))
+
+            # Smooth damage indicator (white); Rect() rounds the float edges the way draw.rect does
+            trail = tuple(pygame.Rect(x + self.BAR_WIDTH * (smooth/100.0), 20,
+                                      self.BAR_WIDTH * ((100 - smooth)/100.0), self.BAR_HEIGHT))
+
+            # Flash the background when taking damage
+            flash = abs(hp - self.health_prev[side]) > 0.1
+            self.health_prev[side] = hp
+            bg_color = (255, 200, 200) if flash else (80, 0, 0)
+            layout.append((x, fill, color, trail, bg_color))
+
+        changed = layout != self.layout
+        self.layout = layout
+        return changed
+
+    def draw(self, surface):
+        if self.glows is None:
+            self._build()
+
+        for side, (x, fill, color, trail, bg_color) in enumerate(self.layout):
+            if fill > 0:
+                surface.fill(color, (x, 20, fill, self.BAR_HEIGHT))
+
+            # Background behind the lost health; only the parts the trail doesn't cover
+            trail = pygame.Rect(trail)
+            bg_left, bg_right = x + fill, x + self.BAR_WIDTH
+            if trail.width > 0:
+                if trail.left > bg_left:
+                    surface.fill(bg_color, (bg_left, 20, min(trail.left, bg_right) - bg_left, self.BAR_HEIGHT))
+                if trail.right < bg_right:
+                    left = max(trail.right, bg_left)
+                    surface.fill(bg_color, (left, 20, bg_right - left, self.BAR_HEIGHT))
+                surface.fill(WHITE, trail)
+            elif bg_left < bg_right:
+                surface.fill(bg_color, (bg_left, 20, bg_right - bg_left, self.BAR_HEIGHT))
+
+            for glow_surf, (dx, dy) in self.glows:
+                surface.blit(glow_surf, (x + dx, 20 + dy))
+            pygame.draw.rect(surface, WHITE, (x, 20, self.BAR_WIDTH, self.BAR_HEIGHT), 2)
+
+            # Label with glow
+            label = self.labels[side]
+            label_x = self.label_x[side]
+            for dx, dy in ((-1, -1), (-1, 1), (1, -1), (1, 1)):
+                surface.blit(label, (label_x + dx, 20 + dy))
+            surface.blit(label, (label_x, 20))
+
+    def bounds(self):
+        """Screen area the bars, glows and labels can touch"""
+        if self.glows is None:
+            self._build()
+        rects = [pygame.Rect(x - 6, 14, self.BAR_WIDTH + 12, self.BAR_HEIGHT + 12) for x in self.bar_x]
+        for label, label_x in zip(self.labels, self.label_x):
+            rects.append(label.get_rect(topleft=(label_x - 1, 19)).union(
+                label.get_rect(topleft=(label_x + 1, 21))))
+        return rects[0].unionall(rects[1:])
+
+
+def game_over_layout(winner):
+    """The game over texts and where they go"""
+    text = text_cache.render(winner, 72, WHITE, bold=True)
+    restart_text = text_cache.render("Press R to restart", 36, WHITE)
+    return [(text, text.get_rect(center=(WIDTH//2, HEIGHT//2))),
+            (restart_text, restart_text.get_rect(center=(WIDTH//2, HEIGHT//2 + 80)))]
+
+def merge_rects(rects):
+    """Union overlapping rects until none overlap, so every pixel is redrawn once"""
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        while True:
+            index = rect.collidelist(merged)
+            if index < 0:
+                break
+            rect.union_ip(merged.pop(index))
+        merged.append(rect)
+    return merged
+
+
+class DirtyRenderer:
+    """Redraw only the parts of the screen that changed since the last frame.
+
+    The background, ground and control hints never change, so they are
+    composited once into a static layer. Every frame each dynamic layer
+    (fighters, HUD bars, game over text, profiler overlay) reports what it
+    looks like and where it is; the old and new areas of the layers that
+    changed, grown until every layer they touch lies wholly inside one, are
+    restored from the static layer, the layers are redrawn clipped to them
+    and only they are pushed with pygame.display.update().
+    The fighters never reach the control hints at the bottom, so drawing the
+    hints underneath them gives the same picture as Game.draw_scene().
+
+    When more than MAX_DIRTY_FRACTION of the screen changed, or after
+    invalidate(), the frame is drawn in full and flipped instead.
+    """
+    MAX_DIRTY_FRACTION = 0.4
+
+    def __init__(self, game):
+        self.game = game
+        self.static = None
+        self.previous = None
+        self.frames = 0
+        self.full_frames = 0
+        self.dirty_pixels = 0
+
+    def invalidate(self):
+        """Force a full redraw, e.g. after the window was covered"""
+        self.previous = None
+
+    def _layers(self, winner, game_over, alpha):
+        """(signature, bounds, draw) for every dynamic layer, bottom to top"""
+        game = self.game
+        layers = []
+        for fighter in (game.player1, game.player2):
+            frame, draw_rect, rect = fighter.layout(alpha)
+            layers.append(((id(frame), tuple(draw_rect), tuple(rect), fighter.health),
+                           fighter.bounds(alpha),
+                           lambda fighter=fighter: fighter.draw(game.screen, alpha)))
+        layers.append((game.hud.layout, game.hud.bounds(), lambda: game.hud.draw(game.screen)))
+        if game_over:
+            texts = game_over_layout(winner)
+            layers.append((winner, texts[0][1].unionall([r for _, r in texts[1:]]),
+                           lambda: game.draw_game_over(winner)))
         else:
-            r = 255
-            g = int(510 * health_ratio1)
-        color = (r, g, 0)
-        pygame.draw.rect(screen, color, (50 + i, 20, 1, 30))
-    
-    # P1 Smooth damage indicator (white)
-    pygame.draw.rect(screen, (255, 255, 255, 100), 
-                    (50 + 400 * (p1_health_smooth/100.0), 20, 
-                     400 * ((100 - p1_health_smooth)/100.0), 30))
-    
-    # P2 Health Bar
-    pygame.draw.rect(screen, bg_color2, (WIDTH - 450, 20, 400, 30))  # Background with flash
-    
-    # P2 Health gradient
-    health_ratio2 = player2.health / 100.0
-    for i in range(int(400 * health_ratio2)):
-        # Gradient from green to yellow to red
-        if health_ratio2 > 0.5:
-            g = 255
-            r = int(510 * (1 - health_ratio2))
+            layers.append((None, None, None))
+        if game.profiler.overlay:
+            # The graph scrolls every frame
+            layers.append((self.frames, pygame.Rect(game.profiler.overlay_rect()),
+                           lambda: game.profiler.draw_overlay(game.screen)))
         else:
-            r = 255
-            g = int(510 * health_ratio2)
-        color = (r, g, 0)
-        pygame.draw.rect(screen, color, (WIDTH - 450 + i, 20, 1, 30))
-    
-    # P2 Smooth damage indicator (white)
-    pygame.draw.rect(screen, (255, 255, 255, 100), 
-                    (WIDTH - 450 + 400 * (p2_health_smooth/100.0), 20, 
-                     400 * ((100 - p2_health_smooth)/100.0), 30))
-    
-    # Draw health bar borders with glow effect
-    border_color1 = (255, 255, 255, 200) if p1_flash else WHITE
-    border_color2 = (255, 255, 255, 200) if p2_flash else WHITE
-    
-    # Glow effect
-    for i in range(1, 4):
-        glow_surf = pygame.Surface((400 + i*4, 30 + i*4), pygame.SRCALPHA)
-        pygame.draw.rect(glow_surf, (*border_color1[:3], 50//i), (0, 0, 400 + i*4, 30 + i*4), 2)
-        screen.blit(glow_surf, (50 - i*2, 20 - i*2))
+            layers.append((None, None, None))
+        return layers
+
+    def draw(self, winner, game_over, alpha=1.0):
+        game = self.game
+        screen = game.screen
+        if self.static is None:
+            self.static = game.background.copy()
+            draw_ground(self.static)
+            draw_controls(self.static)
+
+        layers = self._layers(winner, game_over, alpha)
+        previous, self.previous = self.previous, [(signature, bounds) for signature, bounds, _ in layers]
+        self.frames += 1
+
+        dirty = None
+        if previous is not None:
+            changed = []
+            for (signature, bounds, _), (old_signature, old_bounds) in zip(layers, previous):
+                if signature != old_signature:
+                    changed += [r for r in (old_bounds, bounds) if r is not None]
+            dirty = merge_rects(changed)
+            # A layer is redrawn whole or not at all: clipped, outlines such as the
+            # health bar's would be drawn along the clip edge instead of their own
+            grown = True
+            while grown:
+                grown = False
+                for _, bounds, _ in layers:
+                    if (bounds is not None and bounds.collidelist(dirty) >= 0
+                            and not any(r.contains(bounds) for r in dirty)):
+                        dirty = merge_rects(dirty + [bounds])
+                        grown = True
+            screen_rect = screen.get_rect()
+            dirty = [r.clip(screen_rect) for r in dirty]
+            dirty = [r for r in dirty if r.width and r.height]
+            area = sum(r.width * r.height for r in dirty)
+            if area > self.MAX_DIRTY_FRACTION * screen_rect.width * screen_rect.height:
+                dirty = None
+
+        if dirty is None:
+            self.full_frames += 1
+            self.dirty_pixels += WIDTH * HEIGHT
+            game.draw_scene(winner, game_over, alpha)
+            pygame.display.flip()
+            game.profiler.mark('flip')
+            return
+
+        # Restore the static layer, then redraw every layer that overlaps, clipped
+        for rect in dirty:
+            screen.blit(self.static, rect, rect)
+            self.dirty_pixels += rect.width * rect.height
+        game.profiler.mark('background')
+        for _, bounds, draw in layers:
+            if bounds is None:
+                continue
+            for rect in dirty:
+                if rect.colliderect(bounds):
+                    screen.set_clip(rect)
+                    draw()
+        screen.set_clip(None)
+        game.profiler.mark('fighters')
+
+        if dirty:
+            pygame.display.update(dirty)
+        game.profiler.mark('flip')
+
+    def stats(self):
+        frames = max(1, self.frames)
+        return {
+            'frames': self.frames,
+            'full_frames': self.full_frames,
+            'dirty_fraction': self.dirty_pixels / (frames * WIDTH * HEIGHT)
+        }
+
+class Game:
+    """The desktop game: window, assets, both fighters and the main loop.
+
+    Importing game.py or creating a Game does nothing but build plain
+    objects. The window opens in open_window(), and the images are loaded
+    (from the asset pack when it is up to date) the first time the
+    background is asked for; run() does both and plays until the window is
+    closed. With profile_startup, the time every startup stage took is
+    printed once the first frame is on screen.
+    """
+    def __init__(self, profile_startup=False):
+        self.profile_startup = profile_startup
+        self.startup_stages = []
+        self._startup_last = IMPORT_START
+        self.mark_startup('imports')
+
+        self.screen = None
+        self.clock = pygame.time.Clock()
+        self.assets = None  # Asset pack, if an up-to-date one was found
+        self._background = None
+
+        # Create players
+        self.player1 = Fighter(200, HEIGHT - 170,  # Adjusted Y position for better ground alignment
+                               {'left': pygame.K_a, 'right': pygame.K_d, 'up': pygame.K_w,
+                                'punch': pygame.K_f, 'kick': pygame.K_g}, 'player1/idle1.png')
+        self.player2 = Fighter(WIDTH - 300, HEIGHT - 170,  # Adjusted Y position for better ground alignment
+                               {'left': pygame.K_LEFT, 'right': pygame.K_RIGHT, 'up': pygame.K_UP,
+                                'punch': pygame.K_k, 'kick': pygame.K_l}, 'player2/idle1.png', character=1)
+        self.match = simulation.MatchState(self.player1.state, self.player2.state)
+        self.hud = HealthBarHUD()
+
+        # Frame profiler: F3 toggles the overlay, F4 saves a Chrome trace
+        self.profiler = FrameProfiler(('wait', 'events', 'simulate', 'background', 'fighters',
+                                       'health_bars', 'hud', 'overlay', 'flip'))
+        # Dirty-rect rendering, enabled by run(dirty_rects=True)
+        self.dirty_renderer = None
+        # Network client, set once connect_in_background() gets through
+        self.client = None
+
+    def mark_startup(self, stage):
+        """Charge the time since the previous mark to a startup stage"""
+        now = time.perf_counter()
+        self.startup_stages.append((stage, now - self._startup_last))
+        self._startup_last = now
+
+    def print_startup(self):
+        print("Startup, from the start of import game:")
+        for stage, seconds in self.startup_stages:
+            print(f"  {stage:<14}{seconds * 1000:8.1f} ms")
+        total = sum(seconds for _, seconds in self.startup_stages)
+        print(f"  {'total':<14}{total * 1000:8.1f} ms")
+
+    def open_window(self):
+        if self.screen is None:
+            pygame.init()
+            self.mark_startup('pygame.init')
+            self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
+            pygame.display.set_caption("Shadow Fighters")
+            self.mark_startup('window')
+        return self.screen
+
+    @property
+    def background(self):
+        if self._background is None:
+            self.load_assets()
+        return self._background
+
+    def load_assets(self):
+        """Background and sprite frames, ready-decoded from the asset pack when it is
+        up to date (python asset_pack.py); otherwise decoded from the sources"""
+        self.open_window()
+        self.assets = asset_pack.open_pack()
+        if self.assets is not None:
+            self._background = self.assets.background()
+            sprites.pack = self.assets
+        else:
+            self._background = asset_pack.decode_background()
+        self.mark_startup('background')
+        for character in range(len(simulation.CHARACTER_NAMES)):
+            sprites.load(character)
+        self.mark_startup('sprites')
+
+    def connect_in_background(self, host='localhost', port=5555):
+        """Try the server on a thread; the game starts offline and follows the
+        server's state from the moment the connection is made"""
+        from client import NetworkClient
+
+        def connect():
+            try:
+                client = NetworkClient(host=host, port=port)
+                if client.connect():
+                    self.client = client
+                else:
+                    print("Failed to connect to server. Playing offline.")
+            except Exception as e:
+                print(f"Error initializing network: {e}")
+
+        threading.Thread(target=connect, daemon=True).start()
+
+    def draw_ground(self):
+        draw_ground(self.screen)
+
+    def draw_controls(self):
+        draw_controls(self.screen)
+
+    def draw_health_bars(self):
+        self.hud.update((self.player1.health, self.player2.health))
+        self.hud.draw(self.screen)
+
+    def check_winner(self):
+        return simulation.check_winner(self.match)
+
+    def reset_game(self):
+        simulation.reset_match(self.match)
+        self.player1.save_position()
+        self.player2.save_position()
+
+    def draw_game_over(self, winner):
+        for text, text_rect in game_over_layout(winner):
+            self.screen.blit(text, text_rect)
+
+    def draw_scene(self, winner, game_over, alpha=1.0):
+        """Draw the whole frame to the screen surface (without pushing it to the display)"""
+        screen = self.screen
+        profiler = self.profiler
+        # Draw background
+        screen.blit(self.background, (0, 0))
         
-        glow_surf = pygame.Surface((400 + i*4, 30 + i*4), pygame.SRCALPHA)
-        pygame.draw.rect(glow_surf, (*border_color2[:3], 50//i), (0, 0, 400 + i*4, 30 + i*4), 2)
-        screen.blit(glow_surf, (WIDTH - 450 - i*2, 20 - i*2))
-    
-    # Draw borders
-    pygame.draw.rect(screen, border_color1, (50, 20, 400, 30), 2)  # P1 border
-    pygame.draw.rect(screen, border_color2, (WIDTH - 450, 20, 400, 30), 2)  # P2 border
-    
-    # Draw player labels with glow
-    font = pygame.font.SysFont('Arial', 24, bold=True)
-    
-    # P1 Label with glow
-    p1_text = font.render("P1", True, (255, 255, 255, 200))
-    for dx, dy in [(-1,-1), (-1,1), (1,-1), (1,1)]:
-        screen.blit(p1_text, (10 + dx, 20 + dy))
-    screen.blit(p1_text, (10, 20))
-    
-    # P2 Label with glow
-    p2_text = font.render("P2", True, (255, 255, 255, 200))
-    for dx, dy in [(-1,-1), (-1,1), (1,-1), (1,1)]:
-        screen.blit(p2_text, (WIDTH - 30 + dx, 20 + dy))
-    screen.blit(p2_text, (WIDTH - 30, 20))
-
-def check_winner():
-    if player1.health <= 0:
-        return "Player 2 Wins!"
-    elif player2.health <= 0:
-        return "Player 1 Wins!"
-    return None
-
-def reset_game():
-    player1.rect.x = 200
-    player1.rect.y = HEIGHT - 150
-    player1.health = 100
-    player2.rect.x = 700
-    player2.rect.y = HEIGHT - 150
-    player2.health = 100
-
-def draw_game(winner, game_over):
-    # Draw background
-    screen.blit(background, (0, 0))
-    
-    # Draw ground
-    draw_ground()
-    
-    # Draw players
-    player1.draw(screen)
-    player2.draw(screen)
-    
-    # Draw UI
-    draw_health_bars()
-    draw_controls()
-    
-    # Draw game over message
-    if game_over:
-        font = pygame.font.SysFont('Arial', 72, bold=True)
-        text = font.render(winner, True, WHITE)
-        text_rect = text.get_rect(center=(WIDTH//2, HEIGHT//2))
-        screen.blit(text, text_rect)
+        # Draw ground
+        draw_ground(screen)
+        profiler.mark('background')
         
-        font = pygame.font.SysFont('Arial', 36)
-        restart_text = font.render("Press R to restart", True, WHITE)
-        restart_rect = restart_text.get_rect(center=(WIDTH//2, HEIGHT//2 + 80))
-        screen.blit(restart_text, restart_rect)
-    
-    pygame.display.flip()
-
-# Create players
-player1 = Fighter(200, HEIGHT - 170,  # Adjusted Y position for better ground alignment
-                 {'left': pygame.K_a, 'right': pygame.K_d, 'up': pygame.K_w,
-                  'punch': pygame.K_f, 'kick': pygame.K_g}, 'player1/idle1.png')
-player2 = Fighter(WIDTH - 300, HEIGHT - 170,  # Adjusted Y position for better ground alignment
-                 {'left': pygame.K_LEFT, 'right': pygame.K_RIGHT, 'up': pygame.K_UP,
-                  'punch': pygame.K_k, 'kick': pygame.K_l}, 'player2/idle1.png')
-
-# Network client
-client = None
-try:
-    from client import NetworkClient
-    client = NetworkClient(host='localhost', port=5555)
-    if not client.connect():
-        print("Failed to connect to server. Starting in offline mode.")
-        client = None
-except Exception as e:
-    print(f"Error initializing network: {e}")
-    client = None
-
-def main():
-    running = True
-    game_over = False
-    winner = None
-    
-    while running:
-        clock.tick(FPS)
+        # Draw players
+        self.player1.draw(screen, alpha)
+        self.player2.draw(screen, alpha)
+        profiler.mark('fighters')
         
-        # Event handling
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    running = False
-                if game_over and event.key == pygame.K_r:
-                    reset_game()
-                    game_over = False
-                    winner = None
+        # Draw UI
+        self.hud.draw(screen)
+        profiler.mark('health_bars')
+        draw_controls(screen)
         
-        if not game_over:
-            # Update players
-            if client and hasattr(client, 'game_state'):
-                p1_state = client.game_state.get('players', {}).get('player1', {})
-                p2_state = client.game_state.get('players', {}).get('player2', {})
-                
-                player1.rect.x = p1_state.get('x', 200)
-                player1.rect.y = p1_state.get('y', 0)
-                player1.health = p1_state.get('health', 100)
-                player1.facing_right = p1_state.get('facing_right', True)
-                player1.is_attacking = p1_state.get('is_attacking', False)
+        # Draw game over message
+        if game_over:
+            self.draw_game_over(winner)
+        profiler.mark('hud')
+        
+        profiler.draw_overlay(screen)
+        profiler.mark('overlay')
+
+    def draw_game(self, winner, game_over, alpha=1.0):
+        self.hud.update((self.player1.health, self.player2.health))
+        if self.dirty_renderer is not None:
+            self.dirty_renderer.draw(winner, game_over, alpha)
+            return
+        
+        self.draw_scene(winner, game_over, alpha)
+        pygame.display.flip()
+        self.profiler.mark('flip')
+
+    def toggle_profiler_overlay(self):
+        self.profiler.overlay = not self.profiler.overlay
+        if self.profiler.overlay:
+            self.profiler.enabled = True
+
+    def save_profile(self):
+        if not self.profiler.enabled:
+            print("Profiler is off; press F3 (or run with --profile) to start recording")
+            return
+        self.profiler.save_chrome_trace(time.strftime('profile-%Y%m%d-%H%M%S.json'))
+
+    def apply_network_state(self):
+        """Copy the server's game_state, interpolated between snapshots, onto both fighters"""
+        game_state = self.client.snapshots.sample()
+        if game_state is None:
+            return
+        player1, player2 = self.player1, self.player2
+        p1_state = game_state.get('players', {}).get('player1', {})
+        p2_state = game_state.get('players', {}).get('player2', {})
+        
+        player1.state.x = p1_state.get('x', 200)
+        player1.state.y = p1_state.get('y', 0)
+        player1.health = p1_state.get('health', 100)
+        player1.facing_right = p1_state.get('facing_right', True)
+        player1.is_attacking = p1_state.get('is_attacking', False)
+        player1.state.action = ACTION_IDS.get(p1_state.get('action'), 0)
+        player1.state.animation_frame = p1_state.get('animation_frame', 0)
+        
+        player2.state.x = p2_state.get('x', 800)
+        player2.state.y = p2_state.get('y', 0)
+        player2.health = p2_state.get('health', 100)
+        player2.facing_right = p2_state.get('facing_right', False)
+        player2.is_attacking = p2_state.get('is_attacking', False)
+        player2.state.action = ACTION_IDS.get(p2_state.get('action'), 0)
+        player2.state.animation_frame = p2_state.get('animation_frame', 0)
+        
+        # The snapshot buffer already interpolated these
+        player1.save_position()
+        player2.save_position()
+
+    def run(self, record_path=None, profile=False, dirty_rects=False):
+        self.open_window()
+        self.load_assets()
+        player1, player2 = self.player1, self.player2
+        match = self.match
+        profiler = self.profiler
+        running = True
+        game_over = False
+        winner = None
+        first_frame = True
+        
+        # Replay recording, one file per match
+        recorder = ReplayRecorder() if record_path else None
+        match_number = 1
+        
+        # Fixed-step scheduler: real time goes into the accumulator, the
+        # simulation consumes it in SIM_DT steps, rendering interpolates the rest
+        accumulator = 0.0
+        previous_time = time.perf_counter()
+        
+        if profile:
+            profiler.enabled = True
+        if dirty_rects:
+            self.dirty_renderer = DirtyRenderer(self)
+        
+        while running:
+            profiler.begin_frame()
+            self.clock.tick(MAX_RENDER_FPS)
+            profiler.mark('wait')
+            now = time.perf_counter()
+            frame_time = min(now - previous_time, MAX_FRAME_TIME)
+            previous_time = now
+            
+            # Event handling
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED) and self.dirty_renderer:
+                    self.dirty_renderer.invalidate()
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        running = False
+                    if event.key == pygame.K_F3:
+                        self.toggle_profiler_overlay()
+                    if event.key == pygame.K_F4:
+                        self.save_profile()
+                    if game_over and event.key == pygame.K_r:
+                        self.reset_game()
+                        game_over = False
+                        winner = None
+                        accumulator = 0.0
+                        if recorder:
+                            recorder.save(numbered_path(record_path, match_number))
+                            recorder = ReplayRecorder()
+                            match_number += 1
+            profiler.mark('events')
+            
+            alpha = 1.0
+            if not game_over:
+                # Update players
+                client = self.client
+                if client and hasattr(client, 'game_state'):
+                    self.apply_network_state()
+                else:
+                    # Slow motion after a hit scales game time, not the frame rate
+                    time_scale = SLOW_MO_FACTOR if match.slow_mo_timer > 0 else 1.0
+                    accumulator += frame_time * time_scale
+                    
+                    steps = 0
+                    keys = pygame.key.get_pressed()
+                    while accumulator >= SIM_DT and steps < MAX_CATCH_UP_STEPS:
+                        player1.save_position()
+                        player2.save_position()
+                        p1_input = player1.read_input(keys)
+                        p2_input = player2.read_input(keys)
+                        simulation.step(match, p1_input, p2_input)
+                        if recorder:
+                            recorder.record(p1_input, p2_input)
+                        accumulator -= SIM_DT
+                        steps += 1
+                        if self.check_winner():
+                            break
+                    
+                    # Too far behind: drop the backlog instead of spiralling
+                    if steps == MAX_CATCH_UP_STEPS:
+                        accumulator = min(accumulator, SIM_DT)
+                    alpha = accumulator / SIM_DT
                 
-                player2.rect.x = p2_state.get('x', 800)
-                player2.rect.y = p2_state.get('y', 0)
-                player2.health = p2_state.get('health', 100)
-                player2.facing_right = p2_state.get('facing_right', False)
-                player2.is_attacking = p2_state.get('is_attacking', False)
-            else:
-                player1.move(player2)
-                player2.move(player1)
+                # Check for winner
+                winner = self.check_winner()
+                if winner:
+                    game_over = True
+                    alpha = 1.0
+            profiler.mark('simulate')
             
-            # Check for winner
-            winner = check_winner()
-            if winner:
-                game_over = True
+            # Draw everything
+            self.draw_game(winner, game_over, alpha)
+            profiler.end_frame()
+            if first_frame:
+                first_frame = False
+                self.mark_startup('first frame')
+                if self.profile_startup:
+                    self.print_startup()
         
-        # Draw everything
-        draw_game(winner, game_over)
-    
-    pygame.quit()
-    sys.exit()
+        if recorder and recorder.frame_count:
+            recorder.save(numbered_path(record_path, match_number))
+        
+        pygame.quit()
+        sys.exit()
+
+def main(record_path=None, profile=False, dirty_rects=False, profile_startup=False, connect=False):
+    game = Game(profile_startup=profile_startup)
+    if connect:
+        game.connect_in_background()
+    game.run(record_path=record_path, profile=profile, dirty_rects=dirty_rects)
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description='Shadow Fighters')
+    parser.add_argument('--record', type=str, default=None, help='Save a replay of each match to this file')
+    parser.add_argument('--profile', action='store_true', help='Record frame phase timings from the start (F3 overlay, F4 trace)')
+    parser.add_argument('--dirty-rects', action='store_true', help='Only redraw and update the parts of the screen that changed')
+    parser.add_argument('--profile-startup', action='store_true', help='Print how long each startup stage took to the first frame')
+    args = parser.parse_args()
+    
+    main(record_path=args.record, profile=args.profile, dirty_rects=args.dirty_rects,
+         profile_startup=args.profile_startup, connect=True)
@@ -2,7 +2,12 @@ import pygame
 import sys
 import math
 import random
+import json
+import time
 from js import document, window
+from presenter import CanvasPresenter
+from profiler import FrameProfiler
+import text_cache
 
 # Initialize Pygame
 pygame.init()
@@ -12,6 +17,7 @@ canvas = document.getElementById("game-canvas")
 WIDTH, HEIGHT = 1000, 600
 screen = pygame.Surface((WIDTH, HEIGHT))
 pygame_screen = pygame.canvas
+presenter = CanvasPresenter(pygame_screen)
 
 # Colors
 WHITE = (255, 255, 255)
@@ -25,6 +31,31 @@ GRAVITY = 0.8
 JUMP_STRENGTH = -15
 PLAYER_SPEED = 5
 
+# Attack frame data shared with the desktop game. index.html copies
+# frame_data.json into the Pyodide filesystem before this script runs.
+# The web build resolves an attack in a single hit, so the per-tick damage
+# is multiplied by the number of active ticks.
+DEFAULT_ATTACKS = {'punch': ((0, -20, 60, 40), 10), 'kick': ((0, -20, 60, 40), 15)}
+
+def load_attacks(path='frame_data.json'):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except Exception:
+        return {}
+    ticks_per_frame = round(1 / data['animation_speed'])
+    attacks = {}
+    for character, moves in data['characters'].items():
+        attacks[character] = {}
+        for action in DEFAULT_ATTACKS:
+            move = moves[action]
+            box = move['hitbox']
+            active_ticks = (move['active'][1] - move['active'][0] + 1) * ticks_per_frame
+            attacks[character][action] = ((box['x'], box['y'], box['w'], box['h']), move['damage'] * active_ticks)
+    return attacks
+
+CHARACTER_ATTACKS = load_attacks()
+
 # Load assets
 def load_image(name, scale=1):
     try:
@@ -40,6 +71,28 @@ def load_image(name, scale=1):
         surf.fill((random.randint(0, 255), random.randint(0, 255), random.randint(0, 255)))
         return surf
 
+# Sprites per fighter name as {action: (facing right, facing left)}, built once
+# and shared by every Fighter, so drawing never creates a Surface.
+# surfaces_created counts the Surfaces made here.
+SPRITES = {}
+surfaces_created = 0
+
+def load_sprites(name):
+    global surfaces_created
+    if name not in SPRITES:
+        # Simple colored rectangles for web version
+        sprites = {}
+        for action, size, color, other_color in (
+                ('idle', (50, 100), (0, 128, 255), (255, 100, 100)),
+                ('punch', (70, 100), (0, 200, 255), (255, 150, 150)),
+                ('kick', (60, 110), (0, 170, 255), (255, 120, 120))):
+            img = pygame.Surface(size)
+            img.fill(color if name == "player1" else other_color)
+            sprites[action] = (img, pygame.transform.flip(img, True, False))
+            surfaces_created += 2
+        SPRITES[name] = sprites
+    return SPRITES[name]
+
 # Player class
 class Fighter:
     def __init__(self, x, y, controls, name):
@@ -53,18 +106,11 @@ class Fighter:
         self.attack_frame = 0
         self.attack_cooldown = 0
         self.name = name
+        self.character = 'player2' if name in ('player2', 'bot', 'Opponent') else 'player1'
         self.load_animations()
     
     def load_animations(self):
-        # Simple colored rectangles for web version
-        self.idle_img = pygame.Surface((50, 100))
-        self.idle_img.fill((0, 128, 255) if self.name == "player1" else (255, 100, 100))
-        
-        self.punch_img = pygame.Surface((70, 100))
-        self.punch_img.fill((0, 200, 255) if self.name == "player1" else (255, 150, 150))
-        
-        self.kick_img = pygame.Surface((60, 110))
-        self.kick_img.fill((0, 170, 255) if self.name == "player1" else (255, 120, 120))
+        self.sprites = load_sprites(self.name)
     
     def move(self, target):
         # Movement logic here (simplified for web)
@@ -106,14 +152,16 @@ class Fighter:
             self.attack_type = attack_type
             
             # Check if attack hits
+            (offset_x, offset_y, width, height), damage = \
+                CHARACTER_ATTACKS.get(self.character, DEFAULT_ATTACKS)[attack_type]
             attack_rect = pygame.Rect(
-                self.rect.right if self.facing_right else self.rect.left - 60,
-                self.rect.centery - 20,
-                60, 40
+                self.rect.right + offset_x if self.facing_right else self.rect.left - offset_x - width,
+                self.rect.centery + offset_y,
+                width, height
             )
             
             if attack_rect.colliderect(target.rect):
-                target.health -= 10 if attack_type == 'punch' else 15
+                target.health -= damage
                 target.health = max(0, target.health)
                 
             self.attack_cooldown = 20
@@ -130,18 +178,12 @@ class Fighter:
         self.move(target)
     
     def draw(self, surface, scroll):
-        # Draw character
+        # Draw character, pre-flipped for the facing
         if self.is_attacking:
-            if self.attack_type == 'punch':
-                img = self.punch_img
-            else:
-                img = self.kick_img
+            action = 'punch' if self.attack_type == 'punch' else 'kick'
         else:
-            img = self.idle_img
-        
-        # Flip image if facing left
-        if not self.facing_right:
-            img = pygame.transform.flip(img, True, False)
+            action = 'idle'
+        img = self.sprites[action][0 if self.facing_right else 1]
         
         surface.blit(img, (self.rect.x - scroll[0], self.rect.y - scroll[1]))
         
@@ -160,6 +202,25 @@ player2 = Fighter(800, HEIGHT - 200,
                   'punch': pygame.K_k, 'kick': pygame.K_l}, 'player2')
 
 # Game loop
+# Frame profiler: F3 toggles the overlay, F4 downloads a Chrome trace
+profiler = FrameProfiler(('events', 'update', 'draw', 'overlay', 'scale', 'flip', 'wait'))
+
+def present():
+    """Scale the finished frame onto the canvas and flip, timing both"""
+    # Screens without their own marks (menu, game over) count as drawing up to here
+    profiler.mark('draw')
+    presenter.present(screen, (canvas.width, canvas.height))
+    profiler.mark('scale')
+    pygame.display.flip()
+    profiler.mark('flip')
+
+def download_profile():
+    trace = json.dumps(profiler.chrome_trace())
+    link = document.createElement('a')
+    link.href = 'data:application/json,' + window.encodeURIComponent(trace)
+    link.download = time.strftime('profile-%Y%m%d-%H%M%S.json')
+    link.click()
+
 def game_loop():
     clock = pygame.time.Clock()
     scroll = [0, 0]
@@ -204,18 +265,21 @@ def game_loop():
             player1.draw(screen, scroll)
         
         # Draw HUD
-        font = pygame.font.SysFont(None, 36)
-        p1_text = font.render(f"P1: {player1.health}", True, (255, 255, 255))
-        p2_text = font.render(f"P2: {player2.health}", True, (255, 255, 255))
+        p1_text = text_cache.render(f"P1: {player1.health}", 36, (255, 255, 255), name=None)
+        p2_text = text_cache.render(f"P2: {player2.health}", 36, (255, 255, 255), name=None)
         screen.blit(p1_text, (20, 20))
         screen.blit(p2_text, (WIDTH - 100, 20))
+        profiler.mark('draw')
+        
+        profiler.draw_overlay(screen)
+        profiler.mark('overlay')
         
         # Draw to canvas
-        pygame_screen.blit(pygame.transform.scale(screen, (canvas.width, canvas.height)), (0, 0))
-        pygame.display.flip()
+        present()
     
     # Main game loop
     while True:
+        profiler.begin_frame()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
@@ -225,10 +289,19 @@ def game_loop():
                 if event.key == pygame.K_ESCAPE:
                     pygame.quit()
                     return
+                if event.key == pygame.K_F3:
+                    profiler.overlay = not profiler.overlay
+                    profiler.enabled = profiler.enabled or profiler.overlay
+                if event.key == pygame.K_F4 and profiler.enabled:
+                    download_profile()
+        profiler.mark('events')
         
         update()
+        profiler.mark('update')
         draw()
         clock.tick(60)
+        profiler.mark('wait')
+        profiler.end_frame()
 
 # Start the game
 game_loop()
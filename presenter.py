@@ -0,0 +1,46 @@
+"""Put the game's fixed-size frame on the browser canvas.
+
+pygame.transform.scale(screen, canvas_size) allocates a new canvas-sized
+Surface and resamples every pixel, every frame. CanvasPresenter scales into a
+surface it keeps (allocated again only when the canvas is resized), scales
+straight into the display when their formats match, and skips scaling
+altogether when the canvas is the frame's size:
+
+    presenter = CanvasPresenter(pygame_screen)
+    presenter.present(screen, (canvas.width, canvas.height))
+"""
+import pygame
+
+
+class CanvasPresenter:
+    def __init__(self, display):
+        self.display = display
+        self._target = None
+        self.resizes = 0
+        self.scaled_frames = 0
+        self.direct_frames = 0
+
+    def _same_format(self, a, b):
+        return a.get_bitsize() == b.get_bitsize() and a.get_masks() == b.get_masks()
+
+    def present(self, frame, size):
+        """Draw frame onto the display at size (the canvas size in pixels)"""
+        size = (int(size[0]), int(size[1]))
+        if size == frame.get_size():
+            self.display.blit(frame, (0, 0))
+            self.direct_frames += 1
+            return
+
+        self.scaled_frames += 1
+        if self.display.get_size() == size and self._same_format(self.display, frame):
+            pygame.transform.scale(frame, size, self.display)
+            return
+        if self._target is None or self._target.get_size() != size:
+            # scale() needs a destination in the source's format
+            self._target = pygame.Surface(size, 0, frame)
+            self.resizes += 1
+        pygame.transform.scale(frame, size, self._target)
+        self.display.blit(self._target, (0, 0))
+
+    def stats(self):
+        return {'resizes': self.resizes, 'scaled_frames': self.scaled_frames, 'direct_frames': self.direct_frames}
@@ -0,0 +1,199 @@
+"""Per-phase frame profiler.
+
+The game loop calls begin_frame() at the top of a frame, mark(phase) at the
+end of each phase and end_frame() once the frame is on screen. Each mark()
+times the stretch since the previous mark, so a phase costs one
+perf_counter_ns() call and a few array stores. Timings go into fixed-size ring
+buffers (nothing is allocated per frame) and, while disabled, every call
+returns straight away.
+
+    profiler = FrameProfiler(('events', 'simulate', 'draw', 'flip'))
+    profiler.enabled = True
+    ...
+    profiler.draw_overlay(screen)        # frame time graph + p50/p95/p99 per phase
+    profiler.save_chrome_trace('trace.json')  # open in chrome://tracing or Perfetto
+
+Like simulation.py this module does not import pygame at load time, so the
+web build and headless tools can use it too.
+"""
+import json
+import time
+from array import array
+
+perf_counter_ns = time.perf_counter_ns
+
+# Frame time graph scale: the 60 Hz budget line sits halfway up
+GRAPH_BUDGET_NS = 1_000_000_000 // 60
+STATS_INTERVAL_NS = 500_000_000  # Refresh the percentile table twice a second
+OVERLAY_WIDTH = 300
+GRAPH_HEIGHT = 60
+ROW_HEIGHT = 16
+
+
+def _percentile(ordered, pct):
+    if not ordered:
+        return 0
+    return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))]
+
+
+class FrameProfiler:
+    def __init__(self, phases, frames=600, events=8192, enabled=False):
+        self.phases = tuple(phases)
+        self._index = {name: i for i, name in enumerate(self.phases)}
+        self.enabled = enabled
+        self.overlay = False
+
+        # Per frame: start time, total time and the summed time of every phase
+        self.frames = frames
+        self._frame_count = 0
+        self._frame_start = array('q', bytes(8 * frames))
+        self._frame_time = array('q', bytes(8 * frames))
+        self._phase_time = array('q', bytes(8 * frames * len(self.phases)))
+        self._zeros = array('q', bytes(8 * len(self.phases)))
+        self._base = 0
+        self._in_frame = False
+        self._last = 0
+
+        # Individual phase spans for the trace export
+        self.events = events
+        self._event_count = 0
+        self._event_phase = array('B', bytes(events))
+        self._event_start = array('q', bytes(8 * events))
+        self._event_time = array('q', bytes(8 * events))
+
+        self._stats = None
+        self._stats_time = 0
+        self._font = None
+        self._panel = None  # Overlay surface, reused while its size stays the same
+
+    def begin_frame(self):
+        if not self.enabled:
+            self._in_frame = False
+            return
+        now = perf_counter_ns()
+        slot = self._frame_count % self.frames
+        self._frame_start[slot] = now
+        self._base = slot * len(self.phases)
+        self._phase_time[self._base:self._base + len(self.phases)] = self._zeros
+        self._last = now
+        self._in_frame = True
+
+    def mark(self, phase):
+        """End `phase`: everything since the previous mark (or begin_frame) is charged to it"""
+        if not self._in_frame:
+            return
+        now = perf_counter_ns()
+        index = self._index[phase]
+        elapsed = now - self._last
+        self._phase_time[self._base + index] += elapsed
+
+        slot = self._event_count % self.events
+        self._event_phase[slot] = index
+        self._event_start[slot] = self._last
+        self._event_time[slot] = elapsed
+        self._event_count += 1
+        self._last = now
+
+    def end_frame(self):
+        if not self._in_frame:
+            return
+        slot = self._frame_count % self.frames
+        self._frame_time[slot] = perf_counter_ns() - self._frame_start[slot]
+        self._frame_count += 1
+        self._in_frame = False
+
+    def reset(self):
+        self._frame_count = 0
+        self._event_count = 0
+        self._stats = None
+
+    def _recorded(self, count, capacity):
+        """Ring buffer slots holding data, oldest first"""
+        if count <= capacity:
+            return range(count)
+        start = count % capacity
+        return [(start + i) % capacity for i in range(capacity)]
+
+    def stats(self):
+        """{phase: (p50, p95, p99)} in milliseconds over the buffered frames, plus 'frame'"""
+        slots = self._recorded(self._frame_count, self.frames)
+        stride = len(self.phases)
+        result = {}
+        for index, name in enumerate(self.phases):
+            ordered = sorted(self._phase_time[slot * stride + index] for slot in slots)
+            result[name] = tuple(_percentile(ordered, pct) / 1e6 for pct in (50, 95, 99))
+        ordered = sorted(self._frame_time[slot] for slot in slots)
+        result['frame'] = tuple(_percentile(ordered, pct) / 1e6 for pct in (50, 95, 99))
+        return result
+
+    def chrome_trace(self):
+        """Buffered phase spans in the Chrome trace event format"""
+        events = []
+        for slot in self._recorded(self._event_count, self.events):
+            events.append({
+                'name': self.phases[self._event_phase[slot]],
+                'ph': 'X', 'pid': 1, 'tid': 1,
+                'ts': self._event_start[slot] / 1000.0,
+                'dur': self._event_time[slot] / 1000.0
+            })
+        for slot in self._recorded(self._frame_count, self.frames):
+            events.append({
+                'name': 'frame', 'ph': 'X', 'pid': 1, 'tid': 0,
+                'ts': self._frame_start[slot] / 1000.0,
+                'dur': self._frame_time[slot] / 1000.0
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+        print(f"Profile trace saved to {path} ({min(self._event_count, self.events)} spans)")
+
+    def overlay_rect(self, x=10, y=60):
+        """(x, y, width, height) of the overlay panel"""
+        # Header row, one row per phase, then the whole frame
+        return (x, y, OVERLAY_WIDTH, GRAPH_HEIGHT + 10 + ROW_HEIGHT * (len(self.phases) + 2))
+
+    def draw_overlay(self, surface, x=10, y=60):
+        """Draw the frame time graph and the per-phase percentile table"""
+        if not self.overlay:
+            return
+        import pygame
+        import text_cache
+        if self._font is None:
+            self._font = text_cache.font('Consolas', 14)
+
+        now = perf_counter_ns()
+        if self._stats is None or now - self._stats_time >= STATS_INTERVAL_NS:
+            self._stats = self._render_stats()
+            self._stats_time = now
+
+        _, _, width, height = self.overlay_rect(x, y)
+        graph_height = GRAPH_HEIGHT
+        if self._panel is None or self._panel.get_size() != (width, height):
+            self._panel = pygame.Surface((width, height), pygame.SRCALPHA)
+        panel = self._panel
+        panel.fill((0, 0, 0, 170))
+
+        # One column per frame, newest on the right; green within budget, red over it
+        count = min(self._frame_count, self.frames, width)
+        first = self._frame_count - count
+        offset = width - count
+        for i in range(count):
+            frame_time = self._frame_time[(first + i) % self.frames]
+            bar = min(graph_height, frame_time * graph_height // (2 * GRAPH_BUDGET_NS))
+            color = (80, 220, 80) if frame_time <= GRAPH_BUDGET_NS else (230, 70, 70)
+            pygame.draw.line(panel, color, (offset + i, graph_height), (offset + i, graph_height - bar))
+        pygame.draw.line(panel, (200, 200, 200), (0, graph_height // 2), (width, graph_height // 2))
+
+        for i, text in enumerate(self._stats):
+            panel.blit(text, (4, graph_height + 6 + ROW_HEIGHT * i))
+        surface.blit(panel, (x, y))
+
+    def _render_stats(self):
+        stats = self.stats()
+        rows = [f"{'phase':<12}{'p50':>8}{'p95':>8}{'p99':>8}  ms"]
+        for name in self.phases + ('frame',):
+            p50, p95, p99 = stats[name]
+            rows.append(f"{name:<12}{p50:>8.2f}{p95:>8.2f}{p99:>8.2f}")
+        return [self._font.render(row, True, (255, 255, 255)) for row in rows]
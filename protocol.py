@@ -0,0 +1,324 @@
+"""Wire formats for server.py and client.py.
+
+Version 1 is the original protocol: one JSON object per line. Version 2
+sends length-prefixed frames: a uint16 payload length, then the payload.
+The messages that repeat every frame are fixed-layout little-endian struct
+records starting with a one-byte message type:
+
+    game_state  type, flags, tick (uint32), server_time (float64), then per
+                player x, y (int16), health, action (uint8),
+                animation_frame (uint16, wraps; idle counts up forever)
+                and a flags byte (facing_right, is_attacking)         32 bytes
+    keys        type, input mask (5 bits)                              2 bytes
+    input       type, player, frame (uint32), input mask               7 bytes
+    game_start  type                                                   1 byte
+    player_disconnected  type, player                                  2 bytes
+    inputs      type, player, flags (relay), first frame (uint32),
+                count, then count input masks for consecutive frames  8+ bytes
+
+Any other message goes in a frame as JSON (its payload starts with '{'), and
+a record of a type the reader doesn't know is skipped without losing its
+place in the stream.
+
+Every connection starts in version 1. The server's init message lists the
+versions it speaks; a client that wants another one answers with a 'hello'
+line naming it, and sends in that version from then on. The server answers
+with a 'protocol' line, after which it sends in that version too. Clients
+that never say hello (or ask for version 1, handy for reading traffic while
+debugging) keep the JSON protocol.
+
+decode() turns payloads back into the same dicts the JSON protocol
+carries, so the code handling messages doesn't know which version was used.
+MessageReader receives straight into one reusable buffer and cuts messages
+out of it in place, however TCP splits or coalesces them. The inputs record
+only travels over UDP (see udp_transport.py), where a datagram holds whole
+frames and decode_frames() reads them.
+"""
+import json
+import struct
+
+import simulation
+
+PROTOCOL_JSON = 1
+PROTOCOL_BINARY = 2
+SUPPORTED_PROTOCOLS = (PROTOCOL_BINARY, PROTOCOL_JSON)  # Most preferred first
+PROTOCOL_NAMES = {'json': PROTOCOL_JSON, 'binary': PROTOCOL_BINARY}
+
+PLAYER_IDS = ('player1', 'player2')
+
+MSG_GAME_STATE = 1
+MSG_KEYS = 2
+MSG_INPUT = 3
+MSG_GAME_START = 4
+MSG_PLAYER_DISCONNECTED = 5
+MSG_INPUTS = 6
+
+_GAME_STATE = struct.Struct('<BBId')
+_FIGHTER = struct.Struct('<hhBBHB')
+_KEYS = struct.Struct('<BB')
+_INPUT = struct.Struct('<BBIB')
+_GAME_START = struct.Struct('<B')
+_PLAYER_DISCONNECTED = struct.Struct('<BB')
+_INPUTS = struct.Struct('<BBBIB')
+_LENGTH = struct.Struct('<H')
+MAX_PAYLOAD = 0xFFFF
+RECV_SIZE = 8192
+MAX_BUFFER = 2 * (MAX_PAYLOAD + _LENGTH.size) + RECV_SIZE  # Room for any partial frame plus a receive
+_JSON_PAYLOAD = ord('{')
+
+_GAME_STARTED = 1
+_FACING_RIGHT = 1
+_IS_ATTACKING = 2
+_RELAY = 1
+INPUT_MASK = (simulation.INPUT_LEFT | simulation.INPUT_RIGHT | simulation.INPUT_UP |
+              simulation.INPUT_PUNCH | simulation.INPUT_KICK)
+
+
+class ProtocolError(ValueError):
+    """A message that can't be encoded or decoded"""
+
+
+def negotiate(offered, supported=SUPPORTED_PROTOCOLS):
+    """The first of our supported versions the other side offered, else JSON"""
+    for version in supported:
+        if version in offered:
+            return version
+    return PROTOCOL_JSON
+
+
+def input_mask(player_input):
+    """Simulation input bitmask for a state-sync client's input message"""
+    mask = 0
+    move = player_input.get('move', 0)
+    if move < 0:
+        mask |= simulation.INPUT_LEFT
+    elif move > 0:
+        mask |= simulation.INPUT_RIGHT
+    if player_input.get('up'):
+        mask |= simulation.INPUT_UP
+    action = player_input.get('action')
+    if action == 'punch':
+        mask |= simulation.INPUT_PUNCH
+    elif action == 'kick':
+        mask |= simulation.INPUT_KICK
+    return mask
+
+
+def _input_message(mask):
+    """The state-sync input message a mask stands for"""
+    player_input = {'action': 'punch' if mask & simulation.INPUT_PUNCH else
+                    'kick' if mask & simulation.INPUT_KICK else 'idle'}
+    if mask & simulation.INPUT_LEFT:
+        player_input['move'] = -simulation.PLAYER_SPEED
+    elif mask & simulation.INPUT_RIGHT:
+        player_input['move'] = simulation.PLAYER_SPEED
+    if mask & simulation.INPUT_UP:
+        player_input['up'] = True
+    return player_input
+
+
+def _encode_game_state(message):
+    game_state = message['game_state']
+    parts = [_GAME_STATE.pack(MSG_GAME_STATE, _GAME_STARTED if game_state.get('game_started') else 0,
+                              message.get('tick', 0), message.get('server_time', 0.0))]
+    for player_id in PLAYER_IDS:
+        player = game_state['players'][player_id]
+        flags = (_FACING_RIGHT if player['facing_right'] else 0) | (_IS_ATTACKING if player['is_attacking'] else 0)
+        parts.append(_FIGHTER.pack(int(player['x']), int(player['y']), max(0, min(255, player['health'])),
+                                   simulation.ACTION_IDS[player['action']], player['animation_frame'] & 0xFFFF, flags))
+    return b''.join(parts)
+
+
+def _decode_game_state(data, offset):
+    _, game_flags, tick, server_time = _GAME_STATE.unpack_from(data, offset)
+    offset += _GAME_STATE.size
+    players = {}
+    for player_id in PLAYER_IDS:
+        x, y, health, action, animation_frame, flags = _FIGHTER.unpack_from(data, offset)
+        offset += _FIGHTER.size
+        players[player_id] = {
+            'x': x, 'y': y, 'health': health,
+            'action': simulation.ACTION_NAMES[action],
+            'facing_right': bool(flags & _FACING_RIGHT),
+            'is_attacking': bool(flags & _IS_ATTACKING),
+            'animation_frame': animation_frame
+        }
+    return {
+        'type': 'game_state',
+        'game_state': {'players': players, 'game_started': bool(game_flags & _GAME_STARTED)},
+        'tick': tick,
+        'server_time': server_time
+    }
+
+
+def encode(message, version=PROTOCOL_JSON):
+    """Bytes to send for message in the given protocol version"""
+    kind = message.get('type')
+    if version == PROTOCOL_JSON or kind in ('init', 'hello', 'protocol', 'error'):
+        # The handshake is always JSON lines, so either side can read it
+        return (json.dumps(message) + '\n').encode()
+    if version != PROTOCOL_BINARY:
+        raise ProtocolError(f"unknown protocol version {version}")
+    payload = _encode_record(message, kind)
+    if len(payload) > MAX_PAYLOAD:
+        raise ProtocolError(f"{kind} message is {len(payload)} bytes, more than a frame holds")
+    return _LENGTH.pack(len(payload)) + payload
+
+
+def _encode_record(message, kind):
+    try:
+        if kind == 'game_state':
+            return _encode_game_state(message)
+        if kind is None:
+            return _KEYS.pack(MSG_KEYS, input_mask(message))
+        if kind == 'input':
+            player = PLAYER_IDS.index(message['player_id']) if 'player_id' in message else 0
+            return _INPUT.pack(MSG_INPUT, player, message['frame'], message['input'] & INPUT_MASK)
+        if kind == 'game_start':
+            return _GAME_START.pack(MSG_GAME_START)
+        if kind == 'player_disconnected':
+            return _PLAYER_DISCONNECTED.pack(MSG_PLAYER_DISCONNECTED, PLAYER_IDS.index(message['player_id']))
+        if kind == 'inputs':
+            player = PLAYER_IDS.index(message['player_id']) if 'player_id' in message else 0
+            inputs = bytes(mask & INPUT_MASK for mask in message['inputs'])
+            return _INPUTS.pack(MSG_INPUTS, player, _RELAY if message.get('relay') else 0,
+                                message['frame'], len(inputs)) + inputs
+    except (KeyError, ValueError, struct.error) as e:
+        raise ProtocolError(f"can't encode {kind} message: {e}") from e
+    return json.dumps(message).encode()
+
+
+def decode(payload):
+    """The message in one frame's payload, or None for a record type we don't know"""
+    try:
+        kind = payload[0]
+        if kind == _JSON_PAYLOAD:
+            return json.loads(bytes(payload))
+        if kind == MSG_GAME_STATE:
+            return _decode_game_state(payload, 0)
+        if kind == MSG_KEYS:
+            return _input_message(payload[1])
+        if kind == MSG_INPUT:
+            _, player, frame, mask = _INPUT.unpack_from(payload)
+            return {'type': 'input', 'player_id': PLAYER_IDS[player], 'frame': frame, 'input': mask}
+        if kind == MSG_GAME_START:
+            return {'type': 'game_start'}
+        if kind == MSG_PLAYER_DISCONNECTED:
+            return {'type': 'player_disconnected', 'player_id': PLAYER_IDS[payload[1]]}
+        if kind == MSG_INPUTS:
+            _, player, flags, frame, count = _INPUTS.unpack_from(payload)
+            inputs = list(payload[_INPUTS.size:_INPUTS.size + count])
+            if len(inputs) != count:
+                raise ValueError(f"{count} inputs announced, {len(inputs)} present")
+            return {'type': 'inputs', 'player_id': PLAYER_IDS[player], 'relay': bool(flags & _RELAY),
+                    'frame': frame, 'inputs': inputs}
+    except (IndexError, ValueError, struct.error) as e:
+        raise ProtocolError(f"malformed message type {payload[0] if len(payload) else None}: {e}") from e
+    return None
+
+
+def decode_frames(data, offset=0):
+    """Every message in data from offset on, which must be whole version 2
+    frames (a datagram); unknown record types are skipped"""
+    messages = []
+    while offset < len(data):
+        if len(data) - offset < _LENGTH.size:
+            raise ProtocolError("truncated frame length")
+        (length,) = _LENGTH.unpack_from(data, offset)
+        offset += _LENGTH.size
+        if length == 0 or len(data) - offset < length:
+            raise ProtocolError(f"frame of {length} bytes with {len(data) - offset} left")
+        message = decode(memoryview(data)[offset:offset + length])
+        offset += length
+        if message is not None:
+            messages.append(message)
+    return messages
+
+
+class MessageReader:
+    """Cuts a received byte stream into messages.
+
+    Data is received straight into one preallocated buffer (recv_into(), or
+    receive_buffer() and received() from an event loop), or copied in with
+    feed(); complete messages are decoded from memoryview slices of it, and
+    the unread tail is moved back to the front only when the free space
+    runs out; the buffer starts small and only grows (up to MAX_BUFFER)
+    for big JSON frames. version is the protocol the peer is sending in; it can be
+    switched between messages, e.g. right after reading a 'hello' or
+    'protocol' line, and the rest of the buffer is read in the new version.
+    """
+    def __init__(self, version=PROTOCOL_JSON, capacity=2 * RECV_SIZE):
+        self.version = version
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.start = 0  # First unread byte
+        self.end = 0  # End of the received data
+
+    def _make_room(self, size, limit=MAX_BUFFER):
+        """Free at least size bytes after the data, moving the unread part down if needed"""
+        if self.start == self.end:
+            self.start = self.end = 0
+        elif len(self.buffer) - self.end < size and self.start > 0:
+            pending = self.end - self.start
+            self.view[:pending] = self.view[self.start:self.end]
+            self.start, self.end = 0, pending
+        if len(self.buffer) - self.end < size:
+            if limit is not None and self.end + size > limit:
+                raise ProtocolError("receive buffer full without a complete message")
+            capacity = max(2 * len(self.buffer), self.end + size)
+            if limit is not None:
+                capacity = min(limit, capacity)
+            buffer = bytearray(capacity)
+            buffer[:self.end] = self.view[:self.end]
+            self.buffer, self.view = buffer, memoryview(buffer)
+
+    def receive_buffer(self, size=RECV_SIZE):
+        """Writable view of the next size bytes of the buffer; say how many
+        were filled with received() (asyncio.BufferedProtocol.get_buffer)"""
+        self._make_room(size)
+        return self.view[self.end:self.end + size]
+
+    def received(self, count):
+        self.end += count
+
+    def recv_into(self, sock, size=RECV_SIZE):
+        """Receive up to size bytes from sock into the buffer; returns the count (0 on EOF)"""
+        count = sock.recv_into(self.receive_buffer(size))
+        self.received(count)
+        return count
+
+    def feed(self, data):
+        """Add received bytes, any amount of them"""
+        self._make_room(len(data), None)
+        self.view[self.end:self.end + len(data)] = data
+        self.end += len(data)
+
+    def messages(self):
+        """Yield every complete message in the buffer; a partial one stays for the next receive"""
+        while self.start < self.end:
+            if self.version == PROTOCOL_JSON:
+                end = self.buffer.find(b'\n', self.start, self.end)
+                if end < 0:
+                    return
+                line = bytes(self.view[self.start:end])
+                self.start = end + 1
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    raise ProtocolError(f"invalid JSON: {line!r}") from e
+            else:
+                if self.end - self.start < _LENGTH.size:
+                    return
+                (length,) = _LENGTH.unpack_from(self.buffer, self.start)
+                payload_start = self.start + _LENGTH.size
+                if self.end - payload_start < length:
+                    return
+                # Consumed before decoding, so a bad message doesn't desync the stream
+                self.start = payload_start + length
+                if length == 0:
+                    raise ProtocolError("empty frame")
+                message = decode(self.view[payload_start:self.start])
+                if message is not None:
+                    yield message
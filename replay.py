@@ -0,0 +1,206 @@
+"""Input-log replays.
+
+A replay is the starting point (always simulation.new_match()) plus one
+input bitmask per player per frame; the simulation is deterministic, so that
+is enough to regenerate every frame.
+
+File layout:
+
+    header  magic b'SFRP', format version (u8), config hash (16 bytes),
+            frame count (u32)
+    body    zlib-compressed, two bytes per frame: player 1 mask, player 2 mask
+
+The config hash covers frame_data.json and the physics constants, so a replay
+recorded against different balance numbers is flagged on load.
+
+Usage:
+    python replay.py match.sfr              # watch at 1x
+    python replay.py match.sfr --headless   # simulate at full speed, print the result
+    python replay.py match.sfr --headless --frame 1200
+"""
+import hashlib
+import os
+import struct
+import time
+import zlib
+
+import simulation
+
+MAGIC = b'SFRP'
+VERSION = 1
+_HEADER = struct.Struct('<4sB16sI')
+
+
+def config_hash():
+    """Hash of everything besides the inputs that decides how a match plays out"""
+    digest = hashlib.sha256()
+    digest.update(repr((
+        simulation.WIDTH, simulation.HEIGHT, simulation.GRAVITY, simulation.JUMP_STRENGTH,
+        simulation.PLAYER_SPEED, simulation.FIGHTER_WIDTH, simulation.FIGHTER_HEIGHT,
+        simulation.P1_SPAWN, simulation.P2_SPAWN
+    )).encode())
+    with open(simulation.frame_data.FRAME_DATA_FILE, 'rb') as f:
+        digest.update(f.read())
+    return digest.digest()[:16]
+
+
+def numbered_path(path, number):
+    """match.sfr -> match-2.sfr for the second match of a session"""
+    if number <= 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}-{number}{ext}"
+
+
+class ReplayRecorder:
+    def __init__(self):
+        self.inputs = bytearray()
+
+    def record(self, p1_input, p2_input):
+        self.inputs.append(p1_input)
+        self.inputs.append(p2_input)
+
+    @property
+    def frame_count(self):
+        return len(self.inputs) // 2
+
+    def save(self, path):
+        header = _HEADER.pack(MAGIC, VERSION, config_hash(), self.frame_count)
+        with open(path, 'wb') as f:
+            f.write(header)
+            f.write(zlib.compress(bytes(self.inputs), 9))
+        print(f"Replay saved to {path} ({self.frame_count} frames)")
+
+
+class Replay:
+    def __init__(self, inputs, config, version=VERSION):
+        self.inputs = inputs
+        self.config = config
+        self.version = version
+
+    @property
+    def frame_count(self):
+        return len(self.inputs) // 2
+
+    def matches_config(self):
+        return self.config == config_hash()
+
+    def frames(self):
+        """Yield (p1_input, p2_input) for every recorded frame"""
+        inputs = self.inputs
+        for i in range(0, len(inputs), 2):
+            yield inputs[i], inputs[i + 1]
+
+    def simulate(self, until=None):
+        """Run the replay headless and return the state after `until` frames (default: all)"""
+        state = simulation.new_match()
+        step = simulation.step
+        inputs = self.inputs
+        end = self.frame_count if until is None else min(until, self.frame_count)
+        for i in range(0, end * 2, 2):
+            step(state, inputs[i], inputs[i + 1])
+        return state
+
+
+def load(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, config, frame_count = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a replay file")
+    if version != VERSION:
+        raise ValueError(f"Unsupported replay version {version}")
+    inputs = zlib.decompress(data[_HEADER.size:])
+    if len(inputs) != frame_count * 2:
+        raise ValueError(f"{path} is truncated: expected {frame_count} frames")
+    return Replay(inputs, config, version)
+
+
+def play(replay):
+    """Watch a replay at 1x in the game window"""
+    import pygame
+    pygame.init()
+    from game import MAX_CATCH_UP_STEPS, MAX_FRAME_TIME, MAX_RENDER_FPS, SIM_DT, Game
+    game = Game()
+    game.open_window()
+
+    state = simulation.new_match()
+    game.player1.state = state.p1
+    game.player2.state = state.p2
+
+    frames = replay.frames()
+    running = True
+    finished = False
+    winner = None
+    # The same fixed-step scheduler and slow motion as Game.run(), so 1x is the live speed
+    accumulator = 0.0
+    previous_time = time.perf_counter()
+    while running:
+        game.clock.tick(MAX_RENDER_FPS)
+        now = time.perf_counter()
+        frame_time = min(now - previous_time, MAX_FRAME_TIME)
+        previous_time = now
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                running = False
+
+        alpha = 1.0
+        if not finished and winner is None:
+            time_scale = simulation.SLOW_MO_FACTOR if state.slow_mo_timer > 0 else 1.0
+            accumulator += frame_time * time_scale
+            steps = 0
+            while accumulator >= SIM_DT and steps < MAX_CATCH_UP_STEPS:
+                inputs = next(frames, None)
+                if inputs is None:
+                    finished = True
+                    break
+                game.player1.save_position()
+                game.player2.save_position()
+                simulation.step(state, *inputs)
+                accumulator -= SIM_DT
+                steps += 1
+                winner = simulation.check_winner(state)
+                if winner:
+                    break
+            if steps == MAX_CATCH_UP_STEPS:
+                accumulator = min(accumulator, SIM_DT)
+            if not finished and winner is None:
+                alpha = accumulator / SIM_DT
+        game.draw_game(winner, winner is not None, alpha)
+
+    pygame.quit()
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Replay a recorded match')
+    parser.add_argument('path', help='Replay file recorded by game.py or client.py')
+    parser.add_argument('--headless', action='store_true', help='Simulate at full speed without a window')
+    parser.add_argument('--frame', type=int, default=None, help='Stop after this many frames (headless)')
+    args = parser.parse_args()
+
+    replay = load(args.path)
+    if not replay.matches_config():
+        print("Warning: replay was recorded with different frame data or physics; it may desync")
+
+    if not args.headless:
+        play(replay)
+        return
+
+    start = time.perf_counter()
+    state = replay.simulate(args.frame)
+    elapsed = time.perf_counter() - start
+    frames = replay.frame_count if args.frame is None else min(args.frame, replay.frame_count)
+    realtime = frames / 60.0
+    print(f"Frame {state.frame}: player1 {state.p1.to_dict()}")
+    print(f"Frame {state.frame}: player2 {state.p2.to_dict()}")
+    print(f"Result: {simulation.check_winner(state) or 'no winner'}")
+    if elapsed > 0:
+        print(f"Simulated {frames} frames in {elapsed * 1000:.1f} ms "
+              f"({realtime / elapsed:.0f}x realtime)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Rollback session for two-player online play.
+
+Each peer runs the full simulation locally. Local input is scheduled
+`input_delay` frames ahead and sent to the other peer; the remote input for
+frames that have not arrived yet is predicted by repeating the last one seen.
+When a real remote input differs from the prediction, the session restores the
+snapshot taken before that frame and re-simulates up to the present.
+
+Pure Python on top of simulation.py, no pygame or sockets.
+"""
+import time
+
+import simulation
+
+
+class RollbackSession:
+    def __init__(self, local_index, input_delay=2, max_rollback=8, recorder=None):
+        """local_index is 0 when this peer controls player 1, 1 for player 2.
+
+        An optional replay.ReplayRecorder receives each frame's inputs once
+        both of them are confirmed.
+        """
+        self.local_index = local_index
+        self.input_delay = input_delay
+        self.max_rollback = max_rollback
+
+        self.state = simulation.new_match()
+        self.frame = 0  # Next frame to simulate
+
+        self.local_inputs = {}
+        self.remote_inputs = {}  # Confirmed remote input per frame
+        self.predicted = {}  # Remote input actually used per simulated frame
+        self.snapshots = {}  # Packed state before each unconfirmed frame was simulated
+        self.last_remote_input = 0
+        self.confirmed_frame = -1  # Every remote input up to here has arrived
+        self.rollback_from = None  # Earliest mispredicted frame
+        self.recorder = recorder
+        self.recorded_frame = -1
+
+        # Counters
+        self.rollbacks = 0
+        self.last_rollback_depth = 0
+        self.max_rollback_depth = 0
+        self.resimulated_frames = 0
+        self.last_resim_time = 0.0
+
+    def start_inputs(self):
+        """Empty local inputs for the first input_delay frames, to send once at start.
+
+        Every frame then gets exactly one input from each peer, even if the
+        two peers were started with different delays.
+        """
+        inputs = [(frame, 0) for frame in range(self.input_delay)]
+        for frame, keys in inputs:
+            self.local_inputs[frame] = keys
+        return inputs
+
+    def add_local_input(self, keys):
+        """Schedule this frame's local input; returns (frame, keys) to send to the peer"""
+        target = self.frame + self.input_delay
+        self.local_inputs[target] = keys
+        return target, keys
+
+    def add_remote_input(self, frame, keys):
+        """Record the peer's input for `frame`, flagging a rollback on misprediction"""
+        if frame <= self.confirmed_frame:
+            return
+        self.remote_inputs[frame] = keys
+
+        # TCP delivers in order, but stay correct if a gap is filled late
+        while self.confirmed_frame + 1 in self.remote_inputs:
+            self.confirmed_frame += 1
+            confirmed = self.confirmed_frame
+            keys = self.remote_inputs[confirmed]
+            self.last_remote_input = keys
+
+            used = self.predicted.get(confirmed)
+            if used is not None and used != keys:
+                if self.rollback_from is None or confirmed < self.rollback_from:
+                    self.rollback_from = confirmed
+
+    def can_advance(self):
+        """False when simulating another frame would exceed the rollback window"""
+        return self.frame - self.confirmed_frame <= self.max_rollback
+
+    def _remote_input(self, frame):
+        keys = self.remote_inputs.get(frame)
+        if keys is None:
+            keys = self.last_remote_input
+        return keys
+
+    def _simulate(self, frame):
+        self.snapshots[frame] = self.state.pack()
+        local = self.local_inputs.get(frame, 0)
+        remote = self._remote_input(frame)
+        self.predicted[frame] = remote
+        if self.local_index == 0:
+            simulation.step(self.state, local, remote)
+        else:
+            simulation.step(self.state, remote, local)
+
+    def _rollback(self):
+        start = self.rollback_from
+        self.rollback_from = None
+        depth = self.frame - start
+        began = time.perf_counter()
+
+        self.state.unpack_from(self.snapshots[start])
+        for frame in range(start, self.frame):
+            self._simulate(frame)
+
+        self.last_resim_time = time.perf_counter() - began
+        self.rollbacks += 1
+        self.last_rollback_depth = depth
+        self.max_rollback_depth = max(self.max_rollback_depth, depth)
+        self.resimulated_frames += depth
+
+    def _record_confirmed(self):
+        last = min(self.confirmed_frame, self.frame - 1)
+        while self.recorded_frame < last:
+            frame = self.recorded_frame + 1
+            local = self.local_inputs.get(frame, 0)
+            remote = self.remote_inputs[frame]
+            if self.local_index == 0:
+                self.recorder.record(local, remote)
+            else:
+                self.recorder.record(remote, local)
+            self.recorded_frame = frame
+
+    def _discard_confirmed(self):
+        """Drop history no rollback can reach any more"""
+        oldest = min(self.confirmed_frame, self.frame - 1)
+        for table in (self.snapshots, self.predicted, self.local_inputs, self.remote_inputs):
+            for frame in [f for f in table if f < oldest]:
+                del table[frame]
+
+    def advance(self):
+        """Correct any misprediction, then simulate one new frame.
+
+        Returns False (and does nothing) while waiting for the peer to catch up.
+        """
+        if self.rollback_from is not None:
+            self._rollback()
+        if not self.can_advance():
+            return False
+        self._simulate(self.frame)
+        self.frame += 1
+        if self.recorder is not None:
+            self._record_confirmed()
+        self._discard_confirmed()
+        return True
+
+    def stats(self):
+        return {
+            'frame': self.frame,
+            'confirmed_frame': self.confirmed_frame,
+            'rollbacks': self.rollbacks,
+            'last_rollback_depth': self.last_rollback_depth,
+            'max_rollback_depth': self.max_rollback_depth,
+            'resimulated_frames': self.resimulated_frames,
+            'last_resim_ms': self.last_resim_time * 1000
+        }
@@ -1,31 +1,115 @@
 import socket
-import json
 import threading
 import time
 
+import protocol
+import simulation
+import udp_transport
+from protocol import PLAYER_IDS, input_mask
+
+TICK_RATE = 60  # Authoritative simulation steps (and snapshots) per second
+MAX_CATCH_UP_TICKS = 5  # Further behind than this, the backlog is dropped
+# Presses that must not be lost when several inputs arrive within one tick
+PRESS_BITS = simulation.INPUT_UP | simulation.INPUT_PUNCH | simulation.INPUT_KICK
+
+
+class Match:
+    """One authoritative match: the simulation and the input each player is holding.
+
+    Client inputs only update the held input; presses are latched until the
+    next step so a tap shorter than a tick still lands. step() advances the
+    simulation once with those inputs and returns the game_state message
+    for that tick. Health, hits and gravity are the match's own; whatever
+    state a client claims is ignored.
+    """
+    def __init__(self):
+        self.state = simulation.new_match()
+        self.started = False
+        self.held_inputs = {player_id: 0 for player_id in PLAYER_IDS}
+        self.pressed = {player_id: 0 for player_id in PLAYER_IDS}
+        self.tick_count = 0
+        self.inputs_received = 0
+
+    def game_state(self):
+        game_state = self.state.to_dict()
+        game_state['game_started'] = self.started
+        return game_state
+
+    def queue_input(self, player_id, player_input):
+        """Record a client's input; the next step applies it"""
+        self.queue_mask(player_id, input_mask(player_input))
+
+    def queue_mask(self, player_id, mask, late=False):
+        """queue_input() for an input already turned into a simulation mask. A
+        late one arrived after a newer input: its presses land, the newer one stays held."""
+        if not late:
+            self.held_inputs[player_id] = mask
+        self.pressed[player_id] |= mask & PRESS_BITS
+        self.inputs_received += 1
+
+    def drop_player(self, player_id):
+        """A player left: they stop moving and lose"""
+        self.held_inputs[player_id] = 0
+        fighter = self.state.p1 if player_id == 'player1' else self.state.p2
+        fighter.health = 0
+
+    def step(self, server_time):
+        """Advance one tick; returns its game_state message. server_time lets
+        clients space snapshots by when they were sent rather than received."""
+        inputs = []
+        for player_id in PLAYER_IDS:
+            inputs.append(self.held_inputs[player_id] | self.pressed[player_id])
+            self.pressed[player_id] = 0
+        simulation.step(self.state, *inputs)
+        self.tick_count += 1
+        return {
+            'type': 'game_state',
+            'game_state': self.game_state(),
+            'tick': self.tick_count,
+            'server_time': server_time
+        }
+
+
 class GameServer:
-    def __init__(self, host='0.0.0.0', port=5555):
+    """Authoritative two-player server, one thread per client.
+
+    A tick thread steps the Match TICK_RATE times a second, encodes the
+    resulting game_state once and sends the same bytes to every client, so
+    outbound traffic is one snapshot per client per tick however fast the
+    clients send. It hosts a single match; async_server.py serves the same
+    protocol from one event loop with a room per pair of players, and
+    sharded_server.py spreads those rooms over several processes.
+
+    Each connection negotiates its wire format (see protocol.py); messages
+    are encoded once per format in use, not once per client. With a
+    udp_port, clients that ask for it get snapshots and relayed inputs over
+    UDP, and send their inputs that way (see udp_transport.py).
+    """
+    def __init__(self, host='0.0.0.0', port=5555, tick_rate=TICK_RATE, udp_port=None):
         self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # Disable Nagle's algorithm
         self.server.bind((host, port))
         self.server.listen(2)  # Allow 2 players
         self.clients = []
-        self.game_state = {
-            'players': {
-                'player1': {
-                    'x': 200, 'y': 0, 'health': 100, 'action': 'idle',
-                    'facing_right': True, 'is_attacking': False, 'animation_frame': 0
-                },
-                'player2': {
-                    'x': 800, 'y': 0, 'health': 100, 'action': 'idle',
-                    'facing_right': False, 'is_attacking': False, 'animation_frame': 0
-                }
-            },
-            'game_started': False
-        }
+        self.protocols = {}  # Connection -> the protocol version it is sent
+        self.send_lock = threading.Lock()  # Keeps messages to a socket from interleaving
+        self.match = Match()
+        self.game_state = self.match.game_state()
         self.lock = threading.Lock()
         self.player_count = 0
-        print(f"Server started on {host}:{port}")
+        self.running = False
+        self.tick_rate = tick_rate
+        self.bytes_sent = 0
+        self.tick_time = 0.0
+        self.udp = None
+        self.udp_peers = {}  # token -> (connection, player_id)
+        self.udp_clients = {}  # Connection -> udp_transport.UdpPeer
+        print(f"Server started on {host}:{port} ({tick_rate} ticks/s)")
+        if udp_port is not None:
+            self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.udp.bind((host, udp_port))
+            self.udp_port = self.udp.getsockname()[1]
+            print(f"UDP on {host}:{self.udp_port}")
 
     def handle_client(self, conn, addr):
         print(f"New connection from {addr}")
@@ -35,35 +119,52 @@ class GameServer:
             self.player_count += 1
             player_id = f'player{min(self.player_count, 2)}'  # Only allow 2 players
             if self.player_count > 2:
-                conn.send(json.dumps({'error': 'Server is full'}).encode())
+                conn.sendall(protocol.encode({'type': 'error', 'error': 'Server is full'}))
                 conn.close()
                 return
         
         try:
-            # Send initial game state and player ID
-            conn.send(json.dumps({
-                'type': 'init',
-                'player_id': player_id,
-                'game_state': self.game_state
-            }).encode())
+            # Send initial game state and player ID, always as JSON
+            with self.send_lock:
+                conn.sendall(protocol.encode({
+                    'type': 'init',
+                    'player_id': player_id,
+                    'game_state': self.game_state,
+                    'server_time': time.perf_counter(),
+                    'protocols': list(protocol.SUPPORTED_PROTOCOLS)
+                }))
             
             # If this is the second player, start the game
             if self.player_count == 2:
                 self.broadcast({'type': 'game_start'})
-                self.game_state['game_started'] = True
+                self.match.started = True
             
+            reader = protocol.MessageReader()
             while True:
                 try:
-                    data = conn.recv(4096).decode()
-                    if not data:
+                    # Straight into the reader's buffer; a partial message waits for the next recv
+                    if not reader.recv_into(conn):
                         break
-                        
-                    # Update game state based on player input
-                    player_input = json.loads(data)
-                    self.update_game_state(player_id, player_input)
                     
-                except json.JSONDecodeError:
-                    print(f"Invalid JSON from {addr}")
+                    for player_input in reader.messages():
+                        if player_input.get('type') == 'hello':
+                            # The client sends in its chosen version from here on
+                            reader.version = self.set_protocol(conn, player_id, player_input)
+                        elif player_input.get('type') == 'input':
+                            # Rollback clients simulate locally, just pass the input on
+                            self.relay(conn, {
+                                'type': 'input',
+                                'player_id': player_id,
+                                'frame': player_input['frame'],
+                                'input': player_input['input']
+                            })
+                        else:
+                            # Applied on the next tick
+                            with self.lock:
+                                self.match.queue_input(player_id, player_input)
+                    
+                except protocol.ProtocolError as e:
+                    print(f"Invalid message from {addr}: {e}")
                     break
                 except ConnectionResetError:
                     break
@@ -73,47 +174,145 @@ class GameServer:
         finally:
             print(f"Client {addr} disconnected")
             with self.lock:
-                if player_id in ['player1', 'player2']:
+                dropped = player_id in PLAYER_IDS
+                if dropped:
                     self.player_count -= 1
-                    self.game_state['players'][player_id]['health'] = 0
-                    self.broadcast({
-                        'type': 'player_disconnected',
-                        'player_id': player_id
-                    })
+                    self.match.drop_player(player_id)
+            # Outside self.lock, like tick(): a slow peer must not hold up the match
+            if dropped:
+                self.broadcast({
+                    'type': 'player_disconnected',
+                    'player_id': player_id
+                })
+            with self.send_lock:
+                self.protocols.pop(conn, None)
+                peer = self.udp_clients.pop(conn, None)
+                if peer is not None:
+                    del self.udp_peers[peer.token]
             conn.close()
     
-    def update_game_state(self, player_id, player_input):
+    def set_protocol(self, conn, player_id, hello):
+        """Answer a client's hello; returns the version both sides use from now on"""
+        version = protocol.negotiate((hello.get('protocol', protocol.PROTOCOL_JSON),))
+        reply = {'type': 'protocol', 'version': version}
+        peer = None
+        if hello.get('transport') == 'udp' and version == protocol.PROTOCOL_BINARY and self.udp is not None:
+            peer = udp_transport.UdpPeer(udp_transport.new_token())
+            reply.update(udp_port=self.udp_port, token=peer.token)
+        with self.send_lock:
+            conn.sendall(protocol.encode(reply))
+            self.protocols[conn] = version
+            if peer is not None and conn not in self.udp_clients:
+                self.udp_peers[peer.token] = (conn, player_id)
+                self.udp_clients[conn] = peer
+        return version
+
+    def receive_udp(self):
+        while self.running:
+            try:
+                data, address = self.udp.recvfrom(2048)
+            except OSError:
+                break
+            with self.send_lock:
+                entry = self.udp_peers.get(udp_transport.packet_token(data))
+                if entry is None:
+                    continue
+                conn, player_id = entry
+                inputs = self.udp_clients[conn].receive(data, address)
+            for frame, mask, relay, late in inputs:
+                if relay:
+                    # Only to UDP clients: the TCP copy of the input goes to everyone the usual way
+                    self.relay_datagram(conn, {'type': 'input', 'player_id': player_id, 'frame': frame, 'input': mask})
+                else:
+                    # Applied on the next tick, in frame order
+                    with self.lock:
+                        self.match.queue_mask(player_id, mask, late)
+
+    def tick(self):
+        """Step the match once and send the snapshot to every client"""
+        start = time.perf_counter()
         with self.lock:
-            if 'move' in player_input:
-                self.game_state['players'][player_id]['x'] += player_input['move']
-            if 'action' in player_input:
-                self.game_state['players'][player_id]['action'] = player_input['action']
-            if 'facing_right' in player_input:
-                self.game_state['players'][player_id]['facing_right'] = player_input['facing_right']
-            if 'animation_frame' in player_input:
-                self.game_state['players'][player_id]['animation_frame'] = player_input['animation_frame']
-            if 'health' in player_input:
-                self.game_state['players'][player_id]['health'] = player_input['health']
-            if 'is_attacking' in player_input:
-                self.game_state['players'][player_id]['is_attacking'] = player_input['is_attacking']
-            
-            # Broadcast updated game state to all clients
-            self.broadcast({
-                'type': 'game_state',
-                'game_state': self.game_state
-            })
-    
+            message = self.match.step(start)
+            self.game_state = message['game_state']
+
+        # Encoded once per protocol in use
+        self.broadcast(message)
+        self.tick_time += time.perf_counter() - start
+
+    def run_ticks(self):
+        interval = 1.0 / self.tick_rate
+        next_tick = time.perf_counter()
+        while self.running:
+            self.tick()
+            next_tick += interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif -delay > interval * MAX_CATCH_UP_TICKS:
+                next_tick = time.perf_counter()
+
+    def stats(self):
+        ticks = max(1, self.match.tick_count)
+        return {
+            'ticks': self.match.tick_count,
+            'inputs_received': self.match.inputs_received,
+            'bytes_sent': self.bytes_sent,
+            'tick_us': self.tick_time / ticks * 1e6
+        }
+
     def broadcast(self, data):
         """Send data to all connected clients"""
-        message = json.dumps(data).encode()
-        for client, _ in self.clients:
-            try:
-                client.send(message)
-            except:
-                continue
+        self.relay(None, data)
+    
+    def relay(self, sender, data):
+        """Send data to every connected client except the sender"""
+        encoded = {}
+        with self.send_lock:
+            for client, _ in self.clients:
+                if client is sender:
+                    continue
+                peer = self.udp_clients.get(client)
+                if peer is not None and peer.address is not None and data.get('type') == 'game_state':
+                    self.send_datagram(peer, data, encoded)
+                    continue
+                version = self.protocols.get(client, protocol.PROTOCOL_JSON)
+                if version not in encoded:
+                    encoded[version] = protocol.encode(data, version)
+                try:
+                    client.sendall(encoded[version])
+                    self.bytes_sent += len(encoded[version])
+                except:
+                    continue
     
+    def relay_datagram(self, sender, data):
+        """Send data to every UDP client except the sender"""
+        encoded = {}
+        with self.send_lock:
+            for client, peer in self.udp_clients.items():
+                if client is not sender and peer.address is not None:
+                    self.send_datagram(peer, data, encoded)
+
+    def send_datagram(self, peer, data, encoded):
+        """Send a snapshot or relayed input to a UDP client; called holding send_lock"""
+        if data['type'] == 'input':
+            peer.relay.add(data['frame'], data['input'], data['player_id'])
+            packet = peer.packet()
+        else:
+            if protocol.PROTOCOL_BINARY not in encoded:
+                encoded[protocol.PROTOCOL_BINARY] = protocol.encode(data, protocol.PROTOCOL_BINARY)
+            packet = peer.packet(encoded[protocol.PROTOCOL_BINARY])
+        try:
+            self.udp.sendto(packet, peer.address)
+            self.bytes_sent += len(packet)
+        except OSError:
+            pass
+
     def start(self):
         print("Waiting for connections...")
+        self.running = True
+        threading.Thread(target=self.run_ticks, daemon=True).start()
+        if self.udp is not None:
+            threading.Thread(target=self.receive_udp, daemon=True).start()
         try:
             while True:
                 conn, addr = self.server.accept()
@@ -127,9 +326,13 @@ class GameServer:
         except KeyboardInterrupt:
             print("\nShutting down server...")
         finally:
+            self.running = False
+            print(f"Server stats: {self.stats()}")
             for client, _ in self.clients:
                 client.close()
             self.server.close()
+            if self.udp is not None:
+                self.udp.close()
 
 if __name__ == "__main__":
     import argparse
@@ -137,7 +340,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Game Server')
     parser.add_argument('--host', type=str, default='0.0.0.0', help='Host IP to bind to')
     parser.add_argument('--port', type=int, default=5555, help='Port to listen on')
+    parser.add_argument('--tick-rate', type=int, default=TICK_RATE, help=f'Simulation ticks per second (default {TICK_RATE})')
+    parser.add_argument('--udp-port', type=int, default=None,
+                        help='Also serve inputs and snapshots over UDP on this port, for clients run with --transport udp')
     args = parser.parse_args()
     
-    server = GameServer(host=args.host, port=args.port)
+    server = GameServer(host=args.host, port=args.port, tick_rate=args.tick_rate, udp_port=args.udp_port)
     server.start()
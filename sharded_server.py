@@ -0,0 +1,257 @@
+"""AsyncGameServer rooms spread over worker processes, one per core by default.
+
+    python sharded_server.py --host 0.0.0.0 --port 5555 --workers 4
+
+The parent process is the lobby's dispatcher: it accepts every connection
+and hands the socket (socket.send_fds over a Unix socket pair) to a worker,
+which serves it exactly as AsyncGameServer would. A connection goes to a
+worker with a player waiting for an opponent, so both players of a match
+end up in the same process; otherwise to the worker with the fewest rooms.
+After every handoff and departure a worker reports its room count and
+waiting players back. SO_REUSEPORT would let the workers accept on their
+own, but the kernel spreads connections by address, splitting pairs of
+players across processes.
+
+Once handed off, a connection never touches the dispatcher again, so it
+only costs an accept and a sendmsg per player. Unix only, and the workers
+are spawned, so a script starting a ShardedServer needs the usual
+if __name__ == "__main__": guard.
+"""
+import asyncio
+import multiprocessing
+import os
+import socket
+import struct
+import time
+
+from async_server import AsyncGameServer, Connection
+from server import TICK_RATE
+
+REPORT = struct.Struct('<III')  # Worker -> dispatcher: connections taken, rooms, players waiting
+STATS = ('ticks', 'inputs_received', 'bytes_sent', 'tick_time', 'cpu')  # Per worker, in shared memory
+BACKLOG = 1024
+
+
+class Worker(AsyncGameServer):
+    """An AsyncGameServer that takes its connections from the dispatcher instead of listening"""
+
+    def __init__(self, channel, shared, index, host='0.0.0.0', tick_rate=TICK_RATE, udp_port=None):
+        super().__init__(host, tick_rate=tick_rate, udp_port=udp_port)
+        self.channel = channel
+        self.shared = shared
+        self.offset = index * len(STATS)
+        self.taken = 0
+        self.closed = None
+
+    async def serve(self):
+        """Serve handed-off connections until the dispatcher goes away"""
+        loop = asyncio.get_running_loop()
+        self.closed = asyncio.Event()
+        self.channel.setblocking(False)
+        loop.add_reader(self.channel, self.take_connections)
+        await self.open_udp()
+        self.tick_task = asyncio.create_task(self.run_ticks())
+        await self.closed.wait()
+        self.tick_task.cancel()
+
+    def take_connections(self):
+        try:
+            data, fds, _, _ = socket.recv_fds(self.channel, 1, 1)
+        except BlockingIOError:
+            return
+        except OSError:
+            data, fds = b'', []
+        if not data:
+            self.closed.set()  # The dispatcher is gone
+            return
+        for fd in fds:
+            asyncio.create_task(self.adopt(socket.socket(fileno=fd)))
+
+    async def adopt(self, sock):
+        try:
+            await asyncio.get_running_loop().connect_accepted_socket(lambda: Connection(self), sock)
+        except OSError:
+            sock.close()
+        finally:
+            self.taken += 1
+            self.report()
+
+    def disconnect(self, conn):
+        super().disconnect(conn)
+        self.report()
+
+    def report(self):
+        waiting = len(self.lobby.players) if self.lobby else 0
+        try:
+            self.channel.send(REPORT.pack(self.taken, len(self.rooms), waiting))
+        except BlockingIOError:
+            pass  # The dispatcher is behind; the next report catches it up
+        except OSError:
+            self.closed.set()  # The dispatcher is gone
+
+    def tick(self):
+        super().tick()
+        self.shared[self.offset:self.offset + len(STATS)] = [
+            self.ticks, self.inputs_received, self.bytes_sent, self.tick_time, time.process_time()]
+
+
+def run_worker(channel, shared, index, host, tick_rate, udp_port):
+    try:
+        asyncio.run(Worker(channel, shared, index, host, tick_rate, udp_port).serve())
+    except KeyboardInterrupt:
+        pass
+
+
+class ShardedServer:
+    """Dispatcher handing connections to worker processes; see the module docstring"""
+
+    def __init__(self, host='0.0.0.0', port=5555, tick_rate=TICK_RATE, workers=None, udp_port=None):
+        self.host = host
+        self.port = port
+        self.tick_rate = tick_rate
+        self.udp_port = udp_port  # Worker n takes udp_port + n (any free port for 0)
+        self.workers = workers or os.cpu_count()
+        self.context = multiprocessing.get_context('spawn')
+        self.shared = self.context.RawArray('d', self.workers * len(STATS))
+        self.listener = None
+        self.accept_task = None
+        self.processes = []
+        self.channels = []
+        # The dispatcher's view of each worker, from its reports and the handoffs since
+        self.alive = [True] * self.workers
+        self.sent = [0] * self.workers
+        self.rooms = [0] * self.workers
+        self.waiting = [0] * self.workers
+
+    async def start_serving(self):
+        """Start the workers and listen; returns once the port is bound (port 0 picks a free one)"""
+        loop = asyncio.get_running_loop()
+        for index in range(self.workers):
+            ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            udp_port = self.udp_port + index if self.udp_port else self.udp_port
+            process = self.context.Process(target=run_worker, daemon=True,
+                                           args=(theirs, self.shared, index, self.host, self.tick_rate, udp_port))
+            process.start()
+            theirs.close()
+            ours.setblocking(False)
+            loop.add_reader(ours, self.read_report, index)
+            self.processes.append(process)
+            self.channels.append(ours)
+
+        self.listener = socket.create_server((self.host, self.port), backlog=BACKLOG)
+        self.listener.setblocking(False)
+        self.port = self.listener.getsockname()[1]
+        self.accept_task = asyncio.create_task(self.accept())
+        print(f"Server started on {self.host}:{self.port} ({self.tick_rate} ticks/s, {self.workers} workers)")
+
+    async def serve_forever(self):
+        await self.start_serving()
+        print("Waiting for connections...")
+        try:
+            await self.accept_task
+        finally:
+            print(f"Server stats: {self.stats()}")
+            for process in self.processes:
+                process.terminate()
+
+    async def accept(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            conn, _ = await loop.sock_accept(self.listener)
+            with conn:
+                while True:
+                    index = self.pick_worker()
+                    if index is None:
+                        print("No workers left, closing")
+                        return
+                    try:
+                        await self.hand_off(index, conn)
+                        break
+                    except OSError:
+                        self.worker_gone(index)  # Died since its last report; try another
+            self.sent[index] += 1
+            if self.waiting[index]:
+                self.waiting[index] -= 1
+            else:
+                self.waiting[index] = 1
+                self.rooms[index] += 1
+
+    async def hand_off(self, index, conn):
+        """Pass conn's socket to a worker, waiting (not blocking the loop) while its channel is full"""
+        loop = asyncio.get_running_loop()
+        channel = self.channels[index]
+        while True:
+            try:
+                socket.send_fds(channel, [b'C'], [conn.fileno()])
+                return
+            except BlockingIOError:
+                writable = loop.create_future()
+                loop.add_writer(channel, lambda: writable.done() or writable.set_result(None))
+                try:
+                    await writable
+                finally:
+                    loop.remove_writer(channel)
+
+    def pick_worker(self):
+        """A worker with a player waiting for an opponent, else the one with the fewest rooms"""
+        candidates = [index for index in range(self.workers) if self.alive[index]]
+        if not candidates:
+            return None
+        for index in candidates:
+            if self.waiting[index]:
+                return index
+        return min(candidates, key=lambda index: self.rooms[index])
+
+    def read_report(self, index):
+        try:
+            data = self.channels[index].recv(REPORT.size)
+        except OSError:
+            data = b''
+        if not data:
+            self.worker_gone(index)
+            return
+        taken, rooms, waiting = REPORT.unpack(data)
+        # Reports sent before the worker took every handoff are already out of date
+        if taken == self.sent[index]:
+            self.rooms[index] = rooms
+            self.waiting[index] = waiting
+
+    def worker_gone(self, index):
+        if self.alive[index]:
+            print(f"Worker {index} exited")
+            asyncio.get_running_loop().remove_reader(self.channels[index])
+            self.alive[index] = False
+
+    def stats(self):
+        values = list(self.shared)
+        totals = {name: sum(values[i::len(STATS)]) for i, name in enumerate(STATS)}
+        ticks = int(totals['ticks'])
+        return {
+            'ticks': ticks,
+            'inputs_received': int(totals['inputs_received']),
+            'bytes_sent': int(totals['bytes_sent']),
+            'tick_us': totals['tick_time'] / max(1, ticks) * 1e6,
+            'rooms': sum(self.rooms),
+            'workers': self.workers,
+            'worker_cpu': totals['cpu']
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Game Server (asyncio, one process per core)')
+    parser.add_argument('--host', type=str, default='0.0.0.0', help='Host IP to bind to')
+    parser.add_argument('--port', type=int, default=5555, help='Port to listen on')
+    parser.add_argument('--tick-rate', type=int, default=TICK_RATE, help=f'Simulation ticks per second (default {TICK_RATE})')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes (default: one per core)')
+    parser.add_argument('--udp-port', type=int, default=None,
+                        help='Serve UDP clients too, worker n on this port + n (0 picks free ports)')
+    args = parser.parse_args()
+
+    server = ShardedServer(host=args.host, port=args.port, tick_rate=args.tick_rate, workers=args.workers,
+                           udp_port=args.udp_port)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("\nShutting down server...")
@@ -3,7 +3,7 @@ echo Installing required packages...
 pip install pyinstaller pygame
 
 echo Creating client executable...
-pyinstaller --onefile --windowed --name="FightingGame" --add-data="player1;player1" --add-data="player2;player2" --add-data="background.jpg;." --hidden-import=pygame --noconsole client.py
+pyinstaller --onefile --windowed --name="FightingGame" --add-data="player1;player1" --add-data="player2;player2" --add-data="background.jpg;." --add-data="frame_data.json;." --hidden-import=pygame --noconsole client.py
 
 if exist "dist\\FightingGame.exe" (
     echo Copying game files...
@@ -12,6 +12,7 @@ if exist "dist\\FightingGame.exe" (
     xcopy /E /I /Y "player1" "FightingGame\\player1"
     xcopy /E /I /Y "player2" "FightingGame\\player2"
     copy "background.jpg" "FightingGame\\"
+    copy "frame_data.json" "FightingGame\\"
     
     echo.
     echo Build successful!
@@ -0,0 +1,296 @@
+"""Headless simulation core for Shadow Fighters.
+
+Everything that decides the outcome of a match lives here: movement, gravity,
+attack windows, hits and health. The module never imports pygame, so it can be
+stepped without a display by the desktop game, the servers and bots alike.
+
+Player input for one tick is a small bitmask (see INPUT_* below) instead of a
+pygame key state.
+"""
+import struct
+
+import frame_data
+
+# Arena constants (must match the renderer in game.py)
+WIDTH, HEIGHT = 1000, 600
+GROUND_Y = HEIGHT - 50
+GRAVITY = 0.8
+JUMP_STRENGTH = -15
+PLAYER_SPEED = 5
+
+# Fighter body size (the idle frame size used for collision)
+FIGHTER_WIDTH, FIGHTER_HEIGHT = 80, 120
+
+# Spawn points
+P1_SPAWN = (200, HEIGHT - 170)
+P2_SPAWN = (WIDTH - 300, HEIGHT - 170)
+
+# Slow motion settings (each move's hitstop in frame_data.json sets its duration)
+SLOW_MO_FACTOR = 0.5  # 50% speed
+
+# Input bitmask
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_UP = 4
+INPUT_PUNCH = 8
+INPUT_KICK = 16
+
+# Actions
+ACTION_IDLE = 0
+ACTION_PUNCH = 1
+ACTION_KICK = 2
+ACTION_NAMES = ("idle", "punch", "kick")
+ACTION_IDS = {name: i for i, name in enumerate(ACTION_NAMES)}
+
+# Move tables from frame_data.json, indexed [character][action]:
+# ACTION_FRAMES holds animation lengths, MOVES holds None or
+# (active_start, active_end, x, y, w, h, damage, hitstop)
+FRAME_DATA = frame_data.load()
+ANIMATION_SPEED = FRAME_DATA['animation_speed']
+CHARACTER_NAMES, ACTION_FRAMES, MOVES = frame_data.build_tables(FRAME_DATA, ACTION_NAMES)
+
+
+def _round(value):
+    """Round half away from zero, the way pygame.Rect stores float coordinates"""
+    if value >= 0:
+        return int(value + 0.5)
+    return -int(0.5 - value)
+
+
+# Fixed snapshot layout of one fighter:
+# x, y, vel_y, animation_cooldown, animation_frame, health, action,
+# jumping, facing_right, is_attacking, attack_frame_active
+_FIGHTER_FORMAT = 'iiddiBB????'
+_FIGHTER_LAYOUT = struct.Struct('<' + _FIGHTER_FORMAT)
+# frame, slow_mo_timer, then player 1 and player 2
+_MATCH_LAYOUT = struct.Struct('<IB' + _FIGHTER_FORMAT * 2)
+
+
+class FighterState:
+    """Simulation state of one fighter, free of any render assets"""
+
+    __slots__ = (
+        'x', 'y', 'vel_y', 'jumping', 'health', 'facing_right', 'action',
+        'animation_frame', 'animation_cooldown', 'is_attacking', 'attack_frame_active',
+        'character'
+    )
+
+    SIZE = _FIGHTER_LAYOUT.size
+
+    def __init__(self, x, y, facing_right=None, character=0):
+        # Index into CHARACTER_NAMES; fixed for the match, so not part of pack()
+        self.character = character
+        self.x = x
+        self.y = y
+        self.vel_y = 0
+        self.jumping = False
+        self.health = 100
+        self.facing_right = x < WIDTH // 2 if facing_right is None else facing_right
+        self.action = ACTION_IDLE
+        self.animation_frame = 0
+        self.animation_cooldown = 0
+        self.is_attacking = False
+        self.attack_frame_active = False
+
+    def _fields(self):
+        return (self.x, self.y, self.vel_y, self.animation_cooldown, self.animation_frame,
+                self.health, self.action, self.jumping, self.facing_right,
+                self.is_attacking, self.attack_frame_active)
+
+    def _set_fields(self, values):
+        (self.x, self.y, self.vel_y, self.animation_cooldown, self.animation_frame,
+         self.health, self.action, self.jumping, self.facing_right,
+         self.is_attacking, self.attack_frame_active) = values
+
+    def pack(self):
+        """Serialize to a fixed-size bytes blob (SIZE bytes)"""
+        return _FIGHTER_LAYOUT.pack(*self._fields())
+
+    def pack_into(self, buffer, offset=0):
+        _FIGHTER_LAYOUT.pack_into(buffer, offset, *self._fields())
+
+    def unpack_from(self, buffer, offset=0):
+        """Restore in place from a blob written by pack() or pack_into()"""
+        self._set_fields(_FIGHTER_LAYOUT.unpack_from(buffer, offset))
+        return self
+
+    def copy(self):
+        other = FighterState.__new__(FighterState)
+        other.character = self.character
+        other._set_fields(self._fields())
+        return other
+
+    def to_dict(self):
+        """Serialize to the dict layout used by the TCP server's game_state"""
+        return {
+            'x': self.x, 'y': self.y, 'health': self.health,
+            'action': ACTION_NAMES[self.action],
+            'facing_right': self.facing_right,
+            'is_attacking': self.is_attacking,
+            'animation_frame': self.animation_frame
+        }
+
+
+class MatchState:
+    """Both fighters plus the match-wide timers"""
+
+    __slots__ = ('p1', 'p2', 'frame', 'slow_mo_timer')
+
+    SIZE = _MATCH_LAYOUT.size
+
+    def __init__(self, p1=None, p2=None):
+        self.p1 = p1 if p1 is not None else FighterState(*P1_SPAWN)
+        self.p2 = p2 if p2 is not None else FighterState(*P2_SPAWN, character=1)
+        self.frame = 0
+        self.slow_mo_timer = 0
+
+    def pack(self):
+        """Serialize the whole match to a fixed-size bytes blob (SIZE bytes)"""
+        return _MATCH_LAYOUT.pack(self.frame, self.slow_mo_timer,
+                                  *self.p1._fields(), *self.p2._fields())
+
+    def pack_into(self, buffer, offset=0):
+        _MATCH_LAYOUT.pack_into(buffer, offset, self.frame, self.slow_mo_timer,
+                                *self.p1._fields(), *self.p2._fields())
+
+    def unpack_from(self, buffer, offset=0):
+        """Restore in place, keeping the same FighterState objects"""
+        values = _MATCH_LAYOUT.unpack_from(buffer, offset)
+        self.frame = values[0]
+        self.slow_mo_timer = values[1]
+        self.p1._set_fields(values[2:13])
+        self.p2._set_fields(values[13:])
+        return self
+
+    def copy(self):
+        other = MatchState(self.p1.copy(), self.p2.copy())
+        other.frame = self.frame
+        other.slow_mo_timer = self.slow_mo_timer
+        return other
+
+    def to_dict(self):
+        return {
+            'players': {
+                'player1': self.p1.to_dict(),
+                'player2': self.p2.to_dict()
+            }
+        }
+
+
+def new_match():
+    """Create a match with both fighters at their spawn points"""
+    return MatchState()
+
+
+_NEW_MATCH = MatchState().pack()
+
+
+def reset_match(state):
+    """Put the match back exactly as new_match() creates it, in place"""
+    return state.unpack_from(_NEW_MATCH)
+
+
+def check_winner(state):
+    if state.p1.health <= 0:
+        return "Player 2 Wins!"
+    elif state.p2.health <= 0:
+        return "Player 1 Wins!"
+    return None
+
+
+def _update_animation(fighter, other, state):
+    """Advance the animation and resolve the active frame of an attack"""
+    fighter.animation_cooldown += ANIMATION_SPEED
+
+    action = fighter.action
+    move = MOVES[fighter.character][action]
+    if move is not None and move[0] <= fighter.animation_frame <= move[1]:
+        fighter.attack_frame_active = True
+        _, _, offset_x, offset_y, width, height, damage, hitstop = move
+        if fighter.facing_right:
+            left = fighter.x + FIGHTER_WIDTH + offset_x
+        else:
+            left = fighter.x - offset_x - width
+        top = fighter.y + FIGHTER_HEIGHT // 2 + offset_y
+        # Same overlap test as pygame.Rect.colliderect
+        if (left < other.x + FIGHTER_WIDTH and other.x < left + width and
+                top < other.y + FIGHTER_HEIGHT and other.y < top + height and
+                not other.is_attacking):
+            other.health = max(0, other.health - damage)
+            state.slow_mo_timer = hitstop
+    else:
+        fighter.attack_frame_active = False
+
+    if fighter.animation_cooldown >= 1:
+        fighter.animation_cooldown = 0
+        fighter.animation_frame += 1
+
+        # Check if animation is complete
+        if action != ACTION_IDLE and fighter.animation_frame >= ACTION_FRAMES[fighter.character][action]:
+            fighter.action = ACTION_IDLE
+            fighter.animation_frame = 0
+            fighter.is_attacking = False
+
+
+def step_fighter(fighter, keys, other, state):
+    """Advance one fighter by a single tick given its input bitmask"""
+    dx = 0
+    idle = fighter.action == ACTION_IDLE
+
+    # Movement - only if not in the middle of an attack
+    if idle:
+        if keys & INPUT_LEFT:
+            dx = -PLAYER_SPEED
+            fighter.facing_right = False
+        if keys & INPUT_RIGHT:
+            dx = PLAYER_SPEED
+            fighter.facing_right = True
+
+        # Jumping
+        if keys & INPUT_UP and not fighter.jumping:
+            fighter.vel_y = JUMP_STRENGTH
+            fighter.jumping = True
+
+    # Apply gravity
+    fighter.vel_y += GRAVITY
+    dy = fighter.vel_y
+
+    # Handle attacks
+    if idle:
+        if keys & INPUT_PUNCH:
+            fighter.action = ACTION_PUNCH
+            fighter.animation_frame = 0
+            fighter.is_attacking = True
+        elif keys & INPUT_KICK:
+            fighter.action = ACTION_KICK
+            fighter.animation_frame = 0
+            fighter.is_attacking = True
+
+    # Update position with collision detection
+    if 0 <= fighter.x + dx <= WIDTH - FIGHTER_WIDTH:
+        fighter.x += dx
+
+    # Ground collision
+    if fighter.y + FIGHTER_HEIGHT + dy > GROUND_Y:
+        fighter.y = GROUND_Y - FIGHTER_HEIGHT
+        fighter.vel_y = 0
+        fighter.jumping = False
+    else:
+        fighter.y = _round(fighter.y + dy)
+
+    _update_animation(fighter, other, state)
+
+
+def step(state, p1_input, p2_input):
+    """Advance the match by one tick and return it.
+
+    The state is updated in place; take a copy() first to keep the old one.
+    Player 1 moves first, so its hits land before player 2 reacts, exactly
+    like the original per-frame Fighter.move() ordering.
+    """
+    if state.slow_mo_timer > 0:
+        state.slow_mo_timer -= 1
+    step_fighter(state.p1, p1_input, state.p2, state)
+    step_fighter(state.p2, p2_input, state.p1, state)
+    state.frame += 1
+    return state
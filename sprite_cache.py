@@ -0,0 +1,141 @@
+"""Animation frames for every character, loaded once and pre-flipped.
+
+frames(character, action, facing_right) returns a tuple of surfaces shared by
+every Fighter, so drawing never copies or flips anything, and pivots() the
+point of each frame that sits on the fighter's bottom centre. Characters are
+indexed like simulation.CHARACTER_NAMES, which are also the sprite folders.
+
+With an asset pack (see asset_pack.py) set as .pack, frames are wrapped
+straight out of it without decoding anything. Otherwise, if a folder has an
+atlas (written by `python create_sprites.py --atlas`), the whole character is
+one image decode and one flip; every frame is a subsurface of those two.
+Failing both, each frame is loaded from its own PNG.
+
+surfaces_created counts every Surface the cache has made; it stays put
+while the game is only drawing.
+"""
+import json
+import os
+
+import pygame
+
+import simulation
+
+# Frame count and scaled size of each action's animation, indexed by action id
+ANIMATIONS = {
+    simulation.ACTION_IDLE: (2, (80, 120)),
+    simulation.ACTION_PUNCH: (3, (100, 120)),
+    simulation.ACTION_KICK: (3, (100, 140)),
+}
+
+ATLAS_INDEX = 'atlas.json'
+
+
+class SpriteCache:
+    def __init__(self, animations=ANIMATIONS):
+        self.animations = animations
+        self._frames = {}  # (character, action) -> (facing right frames, facing left frames)
+        self._pivots = {}  # same keys, (x, y) per frame
+        self.surfaces_created = 0
+        self.pack = None
+
+    def _load_action(self, folder, action, frame_count, size):
+        frames = []
+        try:
+            # Try to load the actual sprite frames
+            for i in range(1, frame_count + 1):
+                frame = pygame.image.load(f"{folder}/{action}{i}.png").convert_alpha()
+                frames.append(pygame.transform.scale(frame, size))
+                self.surfaces_created += 3
+        except Exception as e:
+            print(f"Error loading {folder} {action} frames: {e}")
+            # Fallback to simple colored rectangles if loading fails
+            frames = []
+            for i in range(frame_count):
+                frame = pygame.Surface(size, pygame.SRCALPHA)
+                color = (255, 0, 0) if '1' in folder else (0, 0, 255)
+                pygame.draw.rect(frame, color, (0, 0, size[0], size[1]))
+                frames.append(frame)
+                self.surfaces_created += 1
+        return tuple(frames)
+
+    def _load_pack(self, character, folder):
+        animations = self.pack.animations(folder)
+        if animations is None:
+            return False
+        for action in self.animations:
+            right, left, right_pivots, left_pivots = animations[action]
+            self.surfaces_created += len(right) + len(left)
+            self._frames[character, action] = (right, left)
+            self._pivots[character, action] = (right_pivots, left_pivots)
+        return True
+
+    def _load_atlas(self, character, folder):
+        """Load a character from its atlas; False if there is none or it doesn't fit"""
+        path = os.path.join(folder, ATLAS_INDEX)
+        if not os.path.exists(path):
+            return False
+        with open(path) as f:
+            index = json.load(f)
+        for action, (frame_count, size) in self.animations.items():
+            entries = index['frames'].get(simulation.ACTION_NAMES[action], [])
+            if len(entries) != frame_count or any((e['w'], e['h']) != size for e in entries):
+                print(f"{path} does not match the animation sizes; rebuild it with create_sprites.py --atlas-only")
+                return False
+
+        atlas = pygame.image.load(os.path.join(folder, index['image'])).convert_alpha()
+        flipped = pygame.transform.flip(atlas, True, False)
+        self.surfaces_created += 2
+        width = atlas.get_width()
+        for action in self.animations:
+            entries = index['frames'][simulation.ACTION_NAMES[action]]
+            right = tuple(atlas.subsurface((e['x'], e['y'], e['w'], e['h'])) for e in entries)
+            # Mirroring the atlas mirrors every rect in it too
+            left = tuple(flipped.subsurface((width - e['x'] - e['w'], e['y'], e['w'], e['h'])) for e in entries)
+            self.surfaces_created += len(right) + len(left)
+            self._frames[character, action] = (right, left)
+            self._pivots[character, action] = (
+                tuple(tuple(e['pivot']) for e in entries),
+                tuple((e['w'] - e['pivot'][0], e['pivot'][1]) for e in entries)
+            )
+        return True
+
+    def load(self, character):
+        """Load and flip every animation of a character, unless already cached"""
+        if (character, simulation.ACTION_IDLE) in self._frames:
+            return
+        folder = simulation.CHARACTER_NAMES[character]
+        if self.pack is not None and self._load_pack(character, folder):
+            return
+        if self._load_atlas(character, folder):
+            return
+        for action, (frame_count, size) in self.animations.items():
+            right = self._load_action(folder, simulation.ACTION_NAMES[action], frame_count, size)
+            left = tuple(pygame.transform.flip(frame, True, False) for frame in right)
+            self.surfaces_created += len(left)
+            self._frames[character, action] = (right, left)
+            # Frames are anchored by their bottom centre
+            pivots = tuple((size[0] // 2, size[1]) for _ in right)
+            self._pivots[character, action] = (pivots, pivots)
+
+    def frames(self, character, action, facing_right):
+        entry = self._frames.get((character, action))
+        if entry is None:
+            self.load(character)
+            entry = self._frames[character, action]
+        return entry[0] if facing_right else entry[1]
+
+    def pivots(self, character, action, facing_right):
+        entry = self._pivots.get((character, action))
+        if entry is None:
+            self.load(character)
+            entry = self._pivots[character, action]
+        return entry[0] if facing_right else entry[1]
+
+    def clear(self):
+        self._frames.clear()
+        self._pivots.clear()
+
+
+# Shared by every Fighter
+sprites = SpriteCache()
@@ -0,0 +1,317 @@
+"""UDP for the per-frame traffic, alongside the TCP connection.
+
+Over TCP one lost segment holds back everything sent after it until the
+retransmission arrives, which shows as the game freezing on a lossy link.
+With the UDP transport the TCP connection stays up as the reliable channel
+for the handshake and control messages (init, protocol, game_start,
+player_disconnected) and for noticing disconnects, while inputs and
+snapshots go as datagrams:
+
+    header      token (uint32), sequence (uint16), ack (uint16),
+                ack_bits (uint32)                                     12 bytes
+    records     protocol.py version 2 frames: a game_state snapshot and/or
+                an inputs record
+
+Nothing is retransmitted. A snapshot is the whole state, so a lost one is
+simply superseded by the next. Inputs are sent redundantly instead: every
+packet repeats each input frame the other side hasn't acknowledged yet, up
+to REDUNDANCY of them, so a lost packet's inputs arrive with the next one.
+A state-sync client can afford to lose an input to a longer outage, but a
+rollback session needs every frame, so rollback inputs also keep going
+over TCP: whichever copy arrives first is used, and the TCP one fills any
+gap the redundancy couldn't.
+ack is the newest sequence received from the other side and bit n of
+ack_bits stands for ack - 1 - n, so every packet acknowledges the last 32;
+the top bit (ACK_VALID) says ack means anything, which it doesn't before
+the first packet from the other side has arrived.
+a packet the acknowledgements have moved past counts as lost. Each input
+frame is taken once, by frame number, so duplicates are ignored, and a
+frame reordered behind newer ones is still taken as long as it is within
+FRAME_WINDOW of the newest (the server latches its presses but keeps the
+newer input held). A snapshot older than one already received is dropped.
+
+A client asks for UDP in its hello ('transport': 'udp', binary protocol
+only); a server with UDP enabled answers with the port and a token that
+goes in every packet. Until the server has had a packet from the client it
+keeps sending over TCP, so a client whose UDP is blocked still plays.
+
+LinkSimulator drops and delays datagrams to try lossy links locally
+(client.py --sim-loss / --sim-latency / --sim-jitter).
+"""
+import heapq
+import random
+import secrets
+import struct
+import threading
+import time
+from collections import deque
+
+import protocol
+
+PACKET = struct.Struct('<IHHI')
+SEQUENCE_MODULO = 1 << 16
+ACK_BITS = 31
+ACK_VALID = 1 << ACK_BITS  # In ack_bits: something has been received, so ack is real
+MAX_IN_FLIGHT = 256  # Unacknowledged packets remembered, for when nothing comes back
+REDUNDANCY = 8  # Most input frames repeated per packet
+FRAME_WINDOW = 32  # How far behind the newest input frame a late one is still taken
+
+
+def new_token():
+    return secrets.randbits(32)
+
+
+def packet_token(data):
+    """The token a datagram claims, or None if it's too short to be a packet"""
+    if len(data) < PACKET.size:
+        return None
+    return PACKET.unpack_from(data)[0]
+
+
+def sequence_newer(a, b):
+    """Whether sequence a comes after b, allowing for wrap-around"""
+    return a != b and (a - b) % SEQUENCE_MODULO < SEQUENCE_MODULO // 2
+
+
+class PacketChannel:
+    """Sequence numbers and acknowledgements for the packets exchanged with one peer.
+
+    Each packet sent records the newest input frame it carried; when the
+    peer acknowledges the packet, acked_frame moves up to that frame, and
+    the sender's InputWindow can stop repeating everything up to it.
+    """
+    def __init__(self):
+        self.sequence = 0  # Next to send
+        self.remote_sequence = None  # Newest received
+        self.received_bits = 0  # Bit n: remote_sequence - 1 - n was received too
+        self.in_flight = {}  # sequence -> (send time, newest input frame carried or None)
+        self.acked_frame = -1
+        self.rtt = None
+        self.sent = 0
+        self.received = 0
+        self.duplicates = 0
+        self.lost = 0
+
+    def header(self, token, frame=None):
+        """Header for the next packet; frame is the newest input frame it carries"""
+        sequence = self.sequence
+        self.sequence = (sequence + 1) % SEQUENCE_MODULO
+        if self.in_flight.pop((sequence - MAX_IN_FLIGHT) % SEQUENCE_MODULO, None) is not None:
+            self.lost += 1
+        self.in_flight[sequence] = (time.perf_counter(), frame)
+        self.sent += 1
+        if self.remote_sequence is None:
+            return PACKET.pack(token, sequence, 0, 0)  # No ACK_VALID: nothing is acknowledged
+        return PACKET.pack(token, sequence, self.remote_sequence, ACK_VALID | self.received_bits)
+
+    def receive(self, data):
+        """Take a received packet's header: returns None for a duplicate, else
+        whether it is the newest packet so far"""
+        _, sequence, ack, ack_bits = PACKET.unpack_from(data)
+        if self.remote_sequence is None or sequence_newer(sequence, self.remote_sequence):
+            if self.remote_sequence is not None:
+                shift = (sequence - self.remote_sequence) % SEQUENCE_MODULO
+                self.received_bits = ((self.received_bits << shift) | (1 << (shift - 1))) & (ACK_VALID - 1)
+            self.remote_sequence = sequence
+            newest = True
+        else:
+            age = (self.remote_sequence - sequence) % SEQUENCE_MODULO
+            if age == 0 or (age <= ACK_BITS and self.received_bits & (1 << (age - 1))):
+                self.duplicates += 1
+                return None
+            if age <= ACK_BITS:
+                self.received_bits |= 1 << (age - 1)
+            newest = False
+        self.received += 1
+        if not ack_bits & ACK_VALID:
+            return newest  # The peer hasn't received anything yet
+
+        now = time.perf_counter()
+        for n in range(-1, ACK_BITS):
+            if n >= 0 and not ack_bits & (1 << n):
+                continue
+            acked = self.in_flight.pop((ack - 1 - n) % SEQUENCE_MODULO, None)
+            if acked is None:
+                continue
+            sent_at, frame = acked
+            if frame is not None and frame > self.acked_frame:
+                self.acked_frame = frame
+            if n == -1:
+                sample = now - sent_at
+                self.rtt = sample if self.rtt is None else 0.9 * self.rtt + 0.1 * sample
+
+        # Packets the ack bitfield has moved past can't be acknowledged any more
+        # (in_flight is in send order)
+        oldest_ackable = (ack - ACK_BITS) % SEQUENCE_MODULO
+        while self.in_flight:
+            sequence = next(iter(self.in_flight))
+            if not sequence_newer(oldest_ackable, sequence):
+                break
+            del self.in_flight[sequence]
+            self.lost += 1
+        return newest
+
+    def stats(self):
+        return {
+            'sent': self.sent,
+            'received': self.received,
+            'duplicates': self.duplicates,
+            'lost': self.lost,
+            'rtt_ms': None if self.rtt is None else self.rtt * 1000
+        }
+
+
+class InputWindow:
+    """The input frames the peer hasn't acknowledged, at most size of the newest"""
+
+    def __init__(self, size=REDUNDANCY):
+        self.inputs = deque(maxlen=size)  # (frame, mask), consecutive frames
+        self.player_id = None
+
+    def add(self, frame, mask, player_id=None):
+        if self.inputs and frame != self.inputs[-1][0] + 1:
+            if frame <= self.inputs[-1][0]:
+                return
+            self.inputs.clear()  # A gap: the record only holds consecutive frames
+        self.inputs.append((frame, mask))
+        self.player_id = player_id
+
+    def ack(self, frame):
+        while self.inputs and self.inputs[0][0] <= frame:
+            self.inputs.popleft()
+
+    def newest(self):
+        return self.inputs[-1][0] if self.inputs else None
+
+    def record(self, relay=False):
+        """The encoded inputs record, or nothing when every frame is acknowledged"""
+        if not self.inputs:
+            return b''
+        message = {'type': 'inputs', 'relay': relay, 'frame': self.inputs[0][0],
+                   'inputs': [mask for _, mask in self.inputs]}
+        if self.player_id is not None:
+            message['player_id'] = self.player_id
+        return protocol.encode(message, protocol.PROTOCOL_BINARY)
+
+
+class ReceivedFrames:
+    """Which input frames have been taken: the newest, and which of the
+    FRAME_WINDOW before it, like the ack bits do for packets"""
+
+    def __init__(self):
+        self.newest = -1
+        self.bits = 0  # Bit n: frame newest - 1 - n was taken
+        self.taken = 0
+
+    def take(self, frame):
+        """Whether frame is new (and now taken); False for a duplicate or one too old"""
+        age = self.newest - frame
+        if age < 0:
+            shift = -age
+            if shift > FRAME_WINDOW:
+                self.bits = 0
+            else:
+                self.bits = ((self.bits << shift) | (1 << (shift - 1))) & ((1 << FRAME_WINDOW) - 1)
+            self.newest = frame
+        elif age == 0 or age > FRAME_WINDOW or self.bits & (1 << (age - 1)):
+            return False
+        else:
+            self.bits |= 1 << (age - 1)
+        self.taken += 1
+        return True
+
+    def missing(self):
+        """Frames up to the newest not taken (the last FRAME_WINDOW of them may still come)"""
+        return self.newest + 1 - self.taken
+
+
+def new_inputs(message, frames):
+    """(frame, mask, late) for the frames of an inputs message not taken
+    before; late ones arrived after a newer frame"""
+    first = message['frame']
+    fresh = []
+    for i, mask in enumerate(message['inputs']):
+        if frames.take(first + i):
+            fresh.append((first + i, mask, first + i < frames.newest))
+    return fresh
+
+
+class UdpPeer:
+    """Server side of one client's UDP traffic"""
+
+    def __init__(self, token, redundancy=REDUNDANCY):
+        self.token = token
+        self.address = None  # Where the client's packets come from; None until the first
+        self.channel = PacketChannel()
+        self.relay = InputWindow(redundancy)  # The opponent's rollback inputs, sent on
+        self.frames = ReceivedFrames()  # The client's own input frames taken
+
+    def receive(self, data, address):
+        """Take a packet from the client; returns its new (frame, mask, relay, late) inputs"""
+        try:
+            messages = protocol.decode_frames(data, PACKET.size)
+            newest = self.channel.receive(data)
+        except (struct.error, protocol.ProtocolError):
+            return []
+        if newest is None:
+            return []
+        self.address = address  # Follows the client if a NAT rebinds it
+        self.relay.ack(self.channel.acked_frame)
+        inputs = []
+        for message in messages:
+            if message.get('type') != 'inputs':
+                continue
+            inputs.extend((frame, mask, message['relay'], late)
+                          for frame, mask, late in new_inputs(message, self.frames))
+        return inputs
+
+    def packet(self, records=b''):
+        """A packet with records (encoded frames) and any unacknowledged relayed inputs"""
+        relayed = self.relay.record(relay=True)
+        return self.channel.header(self.token, self.relay.newest()) + records + relayed
+
+
+class LinkSimulator:
+    """Makes delivery lossy: each call is dropped with probability loss, or
+    else run after latency plus or minus jitter seconds, so jitter reorders
+    too. Wrap datagram sends and receives in it to try a bad link locally."""
+
+    def __init__(self, loss=0.0, latency=0.0, jitter=0.0, seed=None):
+        self.loss = loss
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.queue = []  # (due time, order, function, args)
+        self.order = 0
+        self.condition = threading.Condition()
+        self.thread = None
+        self.dropped = 0
+        self.delivered = 0
+
+    def __call__(self, function, *args):
+        with self.condition:
+            if self.rng.random() < self.loss:
+                self.dropped += 1
+                return
+            self.delivered += 1
+            delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+            if delay > 0:
+                heapq.heappush(self.queue, (time.perf_counter() + delay, self.order, function, args))
+                self.order += 1
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.run, daemon=True)
+                    self.thread.start()
+                self.condition.notify()
+                return
+        function(*args)
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.queue or self.queue[0][0] > time.perf_counter():
+                    self.condition.wait(self.queue[0][0] - time.perf_counter() if self.queue else None)
+                _, _, function, args = heapq.heappop(self.queue)
+            try:
+                function(*args)
+            except OSError:
+                pass  # The socket closed while the datagram was on its way